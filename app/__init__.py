@@ -45,6 +45,8 @@ def create_app(config=DevelopmentConfig):
     from app.routes.payment import payment_bp
     from app.routes.messages import messages_bp
     from app.routes.main import main_bp
+    from app.routes.media import media_bp
+    from app.routes.assets import assets_bp
 
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(products_bp, url_prefix='/products')
@@ -55,11 +57,20 @@ def create_app(config=DevelopmentConfig):
     app.register_blueprint(payment_bp, url_prefix='/payment')
     app.register_blueprint(messages_bp, url_prefix='/messages')
     app.register_blueprint(main_bp)
+    app.register_blueprint(media_bp, url_prefix='/media')
+    app.register_blueprint(assets_bp, url_prefix='/assets')
 
     # ─── Socket.IO Events ─────────────────────────────────────────────────────
 
     from app import socketio_events
 
+    # ─── Model Hooks & CLI ────────────────────────────────────────────────────
+
+    from app.utils import ratings  # keeps rating aggregates in step with reviews
+    from app.utils import uploads  # removes uploads no row refers to any more
+    from app.commands import register_commands
+    register_commands(app)
+
     # ─── Context Processors ───────────────────────────────────────────────────
 
     from app.locales import get_locale
@@ -76,11 +87,7 @@ def create_app(config=DevelopmentConfig):
         unread_count = 0
         if current_user.is_authenticated:
             from app.models.message import Conversation
-            conversations = Conversation.query.filter(
-                (Conversation.buyer_id == current_user.id) | 
-                (Conversation.farmer_id == current_user.id)
-            ).all()
-            unread_count = sum(c.unread_count(current_user.id) for c in conversations)
+            unread_count = sum(Conversation.unread_counts(current_user.id).values())
         
         return {
             't': get_locale(lang),
@@ -89,11 +96,53 @@ def create_app(config=DevelopmentConfig):
             'unread_messages': unread_count
         }
 
+    from app.utils.pagination import url_with
+    from app.utils.images import image_url, image_srcset
+    from app.utils.assets import asset_url
+    from app.utils.geo import distance_km
+    app.add_template_global(url_with)
+    app.add_template_global(asset_url)
+    app.add_template_global(image_url)
+    app.add_template_global(image_srcset)
+    app.add_template_global(distance_km)
+
+    from app.utils import search_cache, page_cache, assets, catalog_snapshot
+    search_cache.configure(app)
+    catalog_snapshot.configure(app)
+    page_cache.configure(app)
+    assets.configure(app)
+
+    from app.utils.view_counter import view_counter
+    from app.utils.farmer_ranking import farmer_ranker
+    from app.utils.write_queue import write_queue
+    from app.utils.stock import reservation_sweeper
+    write_queue.init_app(app)
+    view_counter.init_app(app)
+    farmer_ranker.init_app(app)
+    reservation_sweeper.init_app(app)
+
     # ─── Database Initialization ──────────────────────────────────────────────
 
     with app.app_context():
         db.create_all()
+        from app.database.connection import add_missing_columns, add_missing_indexes, \
+            backfill_order_item_farmers
+        add_missing_columns()
+        add_missing_indexes()
+        backfill_order_item_farmers()
         from app.utils.helpers import seed_categories
         seed_categories()
+        from app.utils.search_index import init_search_index
+        init_search_index()
+        from app.utils.trigram_index import init_trigram_index
+        init_trigram_index()
+        from app.utils.copurchase import init_copurchase_index
+        init_copurchase_index()
+        from app.utils.farmer_ranking import init_farmer_rankings
+        init_farmer_rankings()
+        from app.utils.sales_rollup import init_sales_rollup
+        init_sales_rollup()
+        from app.utils.geo import init_geo_index
+        init_geo_index()
 
     return app
\ No newline at end of file
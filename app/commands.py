@@ -0,0 +1,138 @@
+import click
+from flask.cli import with_appcontext
+
+# ─── CLI Commands ─────────────────────────────────────────────────────────────
+#
+# Maintenance tasks run with `flask --app run <command>`.
+
+
+@click.command('backfill-ratings')
+@with_appcontext
+def backfill_ratings_command():
+    """Recompute product and farmer rating aggregates from reviews."""
+    from app.utils.ratings import backfill_ratings
+    products, farmers = backfill_ratings()
+    click.echo(f'Rating aggregates rebuilt for {products} products and {farmers} farmers.')
+
+
+@click.command('generate-image-variants')
+@with_appcontext
+def generate_image_variants_command():
+    """Create thumbnails and WebP copies for uploads that have none yet."""
+    import os
+    from flask import current_app
+    from app import db
+    from app.models.product import Product
+    from app.models.user import User
+    from app.utils.images import make_variants, ImageTooLarge
+
+    root = current_app.config['UPLOAD_FOLDER']
+    done = 0
+    for model, column, variants in ((Product, 'image', 'image_variants'),
+                                    (User, 'profile_image', 'profile_image_variants')):
+        for obj in model.query.filter(getattr(model, variants).is_(None)):
+            path = getattr(obj, column)
+            if path and os.path.isfile(os.path.join(root, path)):
+                try:
+                    setattr(obj, variants, make_variants(path))
+                except ImageTooLarge as e:
+                    click.echo(f'Skipped: {e}')
+                    continue
+                done += getattr(obj, variants) is not None
+        db.session.commit()
+    click.echo(f'Image derivatives generated for {done} uploads.')
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress static files into static/dist."""
+    from flask import current_app
+    from app.utils.assets import build_assets
+    files = build_assets(current_app.static_folder)
+    click.echo(f'Built {len(files)} assets into static/dist.')
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Repopulate the full-text product index from the products table."""
+    from app.utils.search_index import is_enabled, rebuild_search_index
+    from app.utils.search_cache import cache
+    if not is_enabled():
+        click.echo('The full-text index is only used with SQLite; nothing to rebuild.')
+        return
+    rows = rebuild_search_index()
+    cache.clear()
+    click.echo(f'Search index rebuilt: {rows} products.')
+
+
+@click.command('rebuild-copurchase')
+@with_appcontext
+def rebuild_copurchase_command():
+    """Recount co-purchased product pairs from all order items."""
+    from app.utils.copurchase import rebuild_copurchase_index
+    products = rebuild_copurchase_index()
+    click.echo(f'Co-purchase lists rebuilt for {products} products.')
+
+
+@click.command('refresh-farmer-rankings')
+@with_appcontext
+def refresh_farmer_rankings_command():
+    """Re-score every active farmer."""
+    from app.utils.farmer_ranking import refresh_rankings
+    farmers = refresh_rankings()
+    click.echo(f'Rankings refreshed for {farmers} farmers.')
+
+
+@click.command('rebuild-sales-rollup')
+@with_appcontext
+def rebuild_sales_rollup_command():
+    """Recompute the daily sales rollup behind the farmer dashboard."""
+    from app.utils.sales_rollup import rebuild_sales_rollup
+    rows = rebuild_sales_rollup()
+    click.echo(f'Sales rollup rebuilt: {rows} rows.')
+
+
+@click.command('geocode-locations')
+@click.option('--all', 'everything', is_flag=True, help='Re-place every row, not just unplaced ones.')
+@with_appcontext
+def geocode_locations_command(everything):
+    """Place users and products on the map from their address/location text."""
+    from app.utils.geo import locate_missing
+    users, products = locate_missing(everything)
+    click.echo(f'Placed {users} users and {products} products.')
+
+
+@click.command('prune-carts')
+@click.option('--days', default=30, show_default=True, help='Age of visitor carts to delete.')
+@with_appcontext
+def prune_carts_command(days):
+    """Delete carts of visitors who never logged in and have not been back."""
+    from app.utils.cart_store import prune_visitor_carts
+    lines = prune_visitor_carts(days)
+    click.echo(f'Removed {lines} cart lines.')
+
+
+@click.command('release-expired-reservations')
+@with_appcontext
+def release_expired_reservations_command():
+    """Return the stock of checkout holds that have run out."""
+    from app import db
+    from app.utils.stock import release_expired
+    released = release_expired()
+    db.session.commit()
+    click.echo(f'Released {released} reservations.')
+
+
+def register_commands(app):
+    app.cli.add_command(backfill_ratings_command)
+    app.cli.add_command(refresh_farmer_rankings_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(rebuild_copurchase_command)
+    app.cli.add_command(rebuild_sales_rollup_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(generate_image_variants_command)
+    app.cli.add_command(geocode_locations_command)
+    app.cli.add_command(prune_carts_command)
+    app.cli.add_command(release_expired_reservations_command)
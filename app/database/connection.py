@@ -1,3 +1,4 @@
+from sqlalchemy import inspect, text
 from app import db
 
 def get_db():
@@ -6,4 +7,61 @@ def get_db():
 def init_db(app):
     with app.app_context():
         db.create_all()
-        
\ No newline at end of file
+
+def add_missing_columns():
+    """ALTER existing tables to add model columns that ``create_all`` skips.
+
+    New columns must be nullable or carry a ``server_default``. Returns the
+    list of ``table.column`` names that were added.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} ' \
+                      f'{column.type.compile(dialect=db.engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f' DEFAULT {column.server_default.arg}'
+                if not column.nullable and column.server_default is not None:
+                    ddl += ' NOT NULL'
+                conn.execute(text(ddl))
+                added.append(f'{table.name}.{column.name}')
+    return added
+
+def add_missing_indexes():
+    """CREATE model indexes that ``create_all`` skips on tables that already existed.
+
+    Returns the names of the indexes that were created.
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {ix['name'] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in present:
+                    index.create(conn)
+                    added.append(index.name)
+    return added
+
+def backfill_order_item_farmers():
+    """Copy each product's farmer onto order lines written before order_items.farmer_id existed.
+
+    Returns the number of lines filled in.
+    """
+    with db.engine.begin() as conn:
+        return conn.execute(text(
+            "UPDATE order_items SET farmer_id = "
+            "(SELECT farmer_id FROM products WHERE products.id = order_items.product_id) "
+            "WHERE farmer_id IS NULL"
+        )).rowcount
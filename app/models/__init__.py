@@ -3,4 +3,9 @@ from app.models.product import Product
 from app.models.order import Order, OrderItem
 from app.models.review import Review
 from app.models.category import Category
-from app.models.message import Conversation, Message
\ No newline at end of file
+from app.models.message import Conversation, Message
+from app.models.search import SearchTerm, SearchTrigram
+from app.models.recommendation import CoPurchase
+from app.models.ranking import FarmerRanking
+from app.models.cart import CartItem, StockReservation
+from app.models.sales import SalesDaily
@@ -0,0 +1,28 @@
+from app import db
+from datetime import datetime
+
+class CartItem(db.Model):
+    """One line of a shopping cart, kept server-side by utils/cart_store.py."""
+    __tablename__ = 'cart_items'
+
+    cart_key = db.Column(db.String(40), primary_key=True)  # 'u:<user id>' or 's:<session token>'
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<CartItem {self.cart_key} #{self.product_id} x{self.quantity}>'
+
+
+class StockReservation(db.Model):
+    """Stock set aside for a buyer's checkout until ``expires_at`` (utils/stock.py)."""
+    __tablename__ = 'stock_reservations'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<StockReservation user {self.user_id} #{self.product_id} x{self.quantity}>'
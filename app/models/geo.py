@@ -0,0 +1,32 @@
+import math
+from sqlalchemy.orm import declared_attr
+from app import db
+
+GRID_DEGREES = 0.1  # grid cell size, about 11 km
+
+
+class GeoPoint:
+    """Latitude/longitude plus the grid cell used to answer radius queries (app.utils.geo)."""
+
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    grid_lat = db.Column(db.Integer)
+    grid_lng = db.Column(db.Integer)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (db.Index(f'ix_{cls.__tablename__}_grid', 'grid_lat', 'grid_lng'),)
+
+    def set_point(self, point):
+        if point is None:
+            self.latitude = self.longitude = self.grid_lat = self.grid_lng = None
+            return
+        self.latitude, self.longitude = point
+        self.grid_lat = math.floor(self.latitude / GRID_DEGREES)
+        self.grid_lng = math.floor(self.longitude / GRID_DEGREES)
+
+    @property
+    def point(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
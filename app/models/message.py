@@ -28,6 +28,27 @@ class Conversation(db.Model):
     def last_message(self):
         """Get the most recent message."""
         return self.messages.order_by(Message.created_at.desc()).first()
+
+    @staticmethod
+    def unread_counts(user_id):
+        """Unread message count per conversation for a user, in one grouped query."""
+        rows = db.session.query(Message.conversation_id, db.func.count(Message.id))\
+            .join(Conversation, Conversation.id == Message.conversation_id)\
+            .filter((Conversation.buyer_id == user_id) | (Conversation.farmer_id == user_id))\
+            .filter(Message.is_read == False, Message.sender_id != user_id)\
+            .group_by(Message.conversation_id).all()
+        return dict(rows)
+
+    @staticmethod
+    def last_messages(conversation_ids):
+        """Most recent message of each conversation, in one query."""
+        if not conversation_ids:
+            return {}
+        latest = db.session.query(db.func.max(Message.id).label('id'))\
+            .filter(Message.conversation_id.in_(conversation_ids))\
+            .group_by(Message.conversation_id).subquery()
+        rows = Message.query.join(latest, Message.id == latest.c.id).all()
+        return {m.conversation_id: m for m in rows}
     
     def __repr__(self):
         return f'<Conversation #{self.id}>'
@@ -45,6 +66,17 @@ class Message(db.Model):
     
     # Relationships
     sender = db.relationship('User', backref='sent_messages')
+
+    @staticmethod
+    def post(conversation_id, sender_id, text):
+        """Write operation: add a message and touch its conversation; returns (id, created_at)."""
+        message = Message(conversation_id=conversation_id, sender_id=sender_id, message=text,
+                          created_at=datetime.utcnow())
+        db.session.add(message)
+        Conversation.query.filter_by(id=conversation_id)\
+                          .update({'last_message_at': message.created_at}, synchronize_session=False)
+        db.session.flush()
+        return message.id, message.created_at
     
     def __repr__(self):
         return f'<Message #{self.id}>'
\ No newline at end of file
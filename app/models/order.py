@@ -3,11 +3,15 @@ from datetime import datetime
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_buyer', 'buyer_id', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     status = db.Column(db.String(30), default='pending')
     # Status: pending, confirmed, processing, shipped, delivered, cancelled, refunded
+    CLOSED_STATUSES = ('cancelled', 'refunded')  # stock already returned; final
     total_amount = db.Column(db.Float, nullable=False)
     delivery_fee = db.Column(db.Float, default=0)
     shipping_address = db.Column(db.Text, nullable=False)
@@ -25,20 +29,50 @@ class Order(db.Model):
     def item_count(self):
         return sum(item.quantity for item in self.items)
 
+    @staticmethod
+    def farmer_order_ids(farmer_id):
+        """Query of the ids of orders with lines from a farmer, newest first.
+
+        Order ids follow creation order, so this walks ix_order_items_farmer
+        backwards instead of sorting the farmer's orders by date.
+        """
+        return db.session.query(OrderItem.order_id).filter(OrderItem.farmer_id == farmer_id)\
+            .distinct().order_by(OrderItem.order_id.desc())
+
     def __repr__(self):
         return f'<Order #{self.id} - {self.status}>'
 
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        db.Index('ix_order_items_order', 'order_id', 'farmer_id'),
+        db.Index('ix_order_items_farmer', 'farmer_id', 'order_id', 'quantity', 'unit_price'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    # The product's farmer at checkout, so farmer pages never join products
+    farmer_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
 
     @property
     def subtotal(self):
         return self.quantity * self.unit_price
+
+    @staticmethod
+    def for_farmer(farmer_id, order_ids):
+        """{order id: [the farmer's lines in it]} for some orders, with their products."""
+        from sqlalchemy.orm import joinedload
+        lines = {order_id: [] for order_id in order_ids}
+        if not lines:
+            return lines
+        for item in OrderItem.query.options(joinedload(OrderItem.product))\
+                .filter(OrderItem.order_id.in_(list(lines)), OrderItem.farmer_id == farmer_id)\
+                .order_by(OrderItem.id):
+            lines[item.order_id].append(item)
+        return lines
+
     
\ No newline at end of file
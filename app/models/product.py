@@ -1,7 +1,9 @@
 from app import db
+from app.models.review import RatingStats
+from app.models.geo import GeoPoint
 from datetime import datetime
 
-class Product(db.Model):
+class Product(db.Model, RatingStats, GeoPoint):
     __tablename__ = 'products'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -14,12 +16,14 @@ class Product(db.Model):
     stock_quantity = db.Column(db.Integer, nullable=False, default=0)
     min_order_quantity = db.Column(db.Integer, default=1)
     image = db.Column(db.String(255), default='default_product.jpg')
+    image_variants = db.Column(db.Text)  # JSON {variant: width}, see utils/images.py
     images = db.Column(db.Text)  # JSON list of additional images
     is_organic = db.Column(db.Boolean, default=False)
     is_available = db.Column(db.Boolean, default=True)
     harvest_date = db.Column(db.Date)
     location = db.Column(db.String(200))
     views = db.Column(db.Integer, default=0)
+    related_ids = db.Column(db.String(255))  # top co-purchased product ids, best first
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -27,19 +31,16 @@ class Product(db.Model):
     reviews = db.relationship('Review', backref='product', lazy=True, cascade='all, delete-orphan')
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
 
-    @property
-    def average_rating(self):
-        if not self.reviews:
-            return 0
-        return round(sum(r.rating for r in self.reviews) / len(self.reviews), 1)
-
-    @property
-    def review_count(self):
-        return len(self.reviews)
-
     @property
     def is_in_stock(self):
         return self.stock_quantity > 0 and self.is_available
 
     def __repr__(self):
-        return f'<Product {self.name}>'
\ No newline at end of file
+        return f'<Product {self.name}>'
+
+
+# Keyset listings order by (sort column, id); one index per sort lets each
+# page read straight off the index instead of sorting the matching rows.
+db.Index('ix_products_price', Product.price, Product.id)
+db.Index('ix_products_views', Product.views, Product.id)
+db.Index('ix_products_created', Product.created_at, Product.id)
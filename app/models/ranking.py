@@ -0,0 +1,20 @@
+from app import db
+from datetime import datetime
+
+class FarmerRanking(db.Model):
+    """Materialized farmer score, kept fresh by utils/farmer_ranking.py."""
+    __tablename__ = 'farmer_rankings'
+
+    farmer_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, default=0, index=True)
+    rating = db.Column(db.Float, nullable=False, default=0)  # shrunk toward the prior
+    delivered_orders = db.Column(db.Integer, nullable=False, default=0)
+    recent_sales = db.Column(db.Float, nullable=False, default=0)  # PHP, last SALES_WINDOW_DAYS
+    available_products = db.Column(db.Integer, nullable=False, default=0)
+    total_products = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    farmer = db.relationship('User', backref=db.backref('ranking', uselist=False, lazy=True))
+
+    def __repr__(self):
+        return f'<FarmerRanking {self.farmer_id}: {self.score:.3f}>'
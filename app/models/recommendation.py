@@ -0,0 +1,16 @@
+from app import db
+
+class CoPurchase(db.Model):
+    """How many orders contained both products; stored in both directions."""
+    __tablename__ = 'co_purchases'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    other_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_co_purchases_top', 'product_id', 'orders'),
+    )
+
+    def __repr__(self):
+        return f'<CoPurchase {self.product_id}-{self.other_id}: {self.orders}>'
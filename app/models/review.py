@@ -1,6 +1,33 @@
 from app import db
 from datetime import datetime
 
+class RatingStats:
+    """Denormalized review aggregates, maintained by app.utils.ratings."""
+
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @property
+    def review_count(self):
+        return self.rating_count or 0
+
+    @property
+    def rating_histogram(self):
+        """Review counts for 1..5 stars."""
+        return [self.rating_1, self.rating_2, self.rating_3, self.rating_4, self.rating_5]
+
+
 class Review(db.Model):
     __tablename__ = 'reviews'
 
@@ -14,4 +41,3 @@ class Review(db.Model):
 
     def __repr__(self):
         return f'<Review {self.rating}★ on Product #{self.product_id}>'
-    
\ No newline at end of file
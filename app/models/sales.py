@@ -0,0 +1,20 @@
+from app import db
+
+
+class SalesDaily(db.Model):
+    """Per farmer, product and day sales figures, kept by utils/sales_rollup.py."""
+    __tablename__ = 'sales_daily'
+    __table_args__ = (
+        db.Index('ix_sales_daily_farmer_day', 'farmer_id', 'day'),
+    )
+
+    farmer_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)  # the order's creation date (UTC)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)  # PHP, excluding cancelled/refunded
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    cancellations = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalesDaily {self.farmer_id}/{self.product_id} {self.day}: {self.revenue}>'
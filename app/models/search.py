@@ -0,0 +1,21 @@
+from app import db
+
+class SearchTerm(db.Model):
+    """A distinct word from product/category names, for typo-tolerant lookup."""
+    __tablename__ = 'search_terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(100), nullable=False, unique=True)
+    gram_count = db.Column(db.Integer, nullable=False)
+    refs = db.Column(db.Integer, nullable=False, default=0)  # names currently using the word
+
+    def __repr__(self):
+        return f'<SearchTerm {self.term}>'
+
+
+class SearchTrigram(db.Model):
+    __tablename__ = 'search_trigrams'
+
+    gram = db.Column(db.String(3), primary_key=True)
+    term_id = db.Column(db.Integer, db.ForeignKey('search_terms.id', ondelete='CASCADE'),
+                        primary_key=True, index=True)
@@ -1,12 +1,14 @@
 from app import db, login_manager, bcrypt
 from flask_login import UserMixin
+from app.models.review import RatingStats
+from app.models.geo import GeoPoint
 from datetime import datetime
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-class User(db.Model, UserMixin):
+class User(db.Model, UserMixin, RatingStats, GeoPoint):
     __tablename__ = 'users'
 
     id = db.Column(db.Integer, primary_key=True)
@@ -19,6 +21,7 @@ class User(db.Model, UserMixin):
     address = db.Column(db.Text)
     region = db.Column(db.String(100))
     profile_image = db.Column(db.String(255), default='default_profile.jpg')
+    profile_image_variants = db.Column(db.Text)  # JSON {variant: width}, see utils/images.py
     bio = db.Column(db.Text)
     is_verified = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
@@ -40,16 +43,6 @@ class User(db.Model, UserMixin):
     def is_farmer(self):
         return self.role == 'farmer'
 
-    @property
-    def average_rating(self):
-        if not self.products:
-            return 0
-        ratings = []
-        for product in self.products:
-            for review in product.reviews:
-                ratings.append(review.rating)
-        return round(sum(ratings) / len(ratings), 1) if ratings else 0
-
     def __repr__(self):
         return f'<User {self.username} ({self.role})>'
     
\ No newline at end of file
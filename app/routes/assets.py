@@ -0,0 +1,33 @@
+import mimetypes
+from flask import Blueprint, current_app, request, send_from_directory
+from app.utils import assets
+
+assets_bp = Blueprint('assets', __name__)
+
+# Fingerprinted static files (see utils/assets.py). The name changes whenever
+# the content does, so responses are cached for a year as immutable; clients
+# that accept brotli or gzip get the precompressed sibling built alongside.
+
+ASSET_MAX_AGE = 365 * 24 * 3600
+_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+@assets_bp.route('/<path:filename>')
+def serve(filename):
+    served, encoding = filename, None
+    for candidate in assets.encodings.get(filename, ()):
+        if request.accept_encodings[candidate]:
+            served, encoding = filename + _SUFFIXES[candidate], candidate
+            break
+    response = send_from_directory(
+        f'{current_app.static_folder}/{assets.DIST}', served,
+        mimetype=mimetypes.guess_type(filename)[0], etag=served,
+        max_age=ASSET_MAX_AGE, conditional=True,
+    )
+    if encoding:
+        response.content_encoding = encoding
+    if filename in assets.encodings:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
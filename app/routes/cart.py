@@ -1,35 +1,46 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session
 from flask_login import login_required, current_user
 from app import db
 from app.models.product import Product
 from app.models.order import Order, OrderItem
 from app.utils.constants import DELIVERY_FEE, FREE_DELIVERY_THRESHOLD, PAYMENT_METHODS
+from app.utils import stock
+from app.utils.write_queue import WritePending, write
+from app.utils.cart_store import cart_key, get_cart, priced_lines, load_products, add_item, \
+    set_quantities, remove_item, clear_cart
 
 cart_bp = Blueprint('cart', __name__)
 
-def get_cart():
-    return session.get('cart', {})
-
-def save_cart(cart):
-    session['cart'] = cart
-    session.modified = True
-
 @cart_bp.route('/')
 def view_cart():
     cart = get_cart()
-    items = []
-    total = 0
-    for product_id, qty in cart.items():
-        product = Product.query.get(int(product_id))
-        if product and product.is_available:
-            subtotal = product.price * qty
-            total += subtotal
-            items.append({'product': product, 'quantity': qty, 'subtotal': subtotal})
+    hold_minutes = stock.reservation_minutes()
+    held = stock.reserved_for(current_user.id) if current_user.is_authenticated and hold_minutes else {}
+    items, total = priced_lines(cart)
     delivery_fee = 0 if total >= FREE_DELIVERY_THRESHOLD else DELIVERY_FEE
     grand_total = total + delivery_fee
     return render_template('cart/cart.html', items=items, total=total,
                            delivery_fee=delivery_fee, grand_total=grand_total,
-                           payment_methods=PAYMENT_METHODS)
+                           payment_methods=PAYMENT_METHODS, held=held,
+                           hold_minutes=hold_minutes)
+
+@cart_bp.route('/hold', methods=['POST'])
+@login_required
+def hold_cart():
+    """Start checkout: set the cart's stock aside for STOCK_RESERVATION_MINUTES."""
+    cart = get_cart()
+    if not stock.reservation_minutes() or not cart:
+        return redirect(url_for('cart.view_cart'))
+    try:
+        short = write(stock.reserve, current_user.id, cart)
+    except WritePending:
+        flash('Your items are still being set aside. Check back in a moment.', 'warning')
+        return redirect(url_for('cart.view_cart'))
+    if short:
+        products = load_products(short, profile=None)
+        names = ', '.join(f'"{products[pid].name}"' for pid in sorted(short) if pid in products)
+        flash(f'Not enough stock left to hold: {names}.', 'warning')
+    return redirect(url_for('cart.view_cart'))
 
 @cart_bp.route('/add/<int:product_id>', methods=['POST'])
 def add_to_cart(product_id):
@@ -39,42 +50,54 @@ def add_to_cart(product_id):
         flash('Invalid quantity.', 'danger')
         return redirect(request.referrer or url_for('products.product_detail', product_id=product_id))
 
-    cart = get_cart()
-    key = str(product_id)
-    cart[key] = cart.get(key, 0) + qty
-    if cart[key] > product.stock_quantity:
-        cart[key] = product.stock_quantity
-    save_cart(cart)
+    add_item(product, qty)
+    db.session.commit()
     flash(f'{product.name} added to cart!', 'success')
     return redirect(request.referrer or url_for('cart.view_cart'))
 
 @cart_bp.route('/remove/<int:product_id>', methods=['POST'])
 def remove_from_cart(product_id):
-    cart = get_cart()
-    cart.pop(str(product_id), None)
-    save_cart(cart)
+    remove_item(product_id)
+    db.session.commit()
     flash('Item removed from cart.', 'info')
     return redirect(url_for('cart.view_cart'))
 
 @cart_bp.route('/update', methods=['POST'])
 def update_cart():
-    cart = get_cart()
+    quantities = {}
     for key, qty in request.form.items():
         if key.startswith('qty_'):
-            product_id = key.replace('qty_', '')
             try:
-                qty = int(qty)
-                product = Product.query.get(int(product_id))
-                if product and qty > 0:
-                    cart[product_id] = min(qty, product.stock_quantity)
-                elif qty <= 0:
-                    cart.pop(product_id, None)
+                quantities[int(key.replace('qty_', ''))] = int(qty)
             except ValueError:
                 pass
-    save_cart(cart)
+    set_quantities(quantities)
+    db.session.commit()
     flash('Cart updated.', 'success')
     return redirect(url_for('cart.view_cart'))
 
+def place_order(buyer_id, key, items, total_amount, delivery_fee, shipping_address, payment_method, notes):
+    """Write operation: take the stock, record the order and empty the cart; returns the order id."""
+    stock.claim(buyer_id, {product_id: qty for product_id, _, qty, _ in items})
+    order = Order(
+        buyer_id=buyer_id,
+        total_amount=total_amount,
+        delivery_fee=delivery_fee,
+        shipping_address=shipping_address,
+        payment_method=payment_method,
+        notes=notes,
+        status='pending',
+        payment_status='unpaid' if payment_method != 'cod' else 'pending',
+    )
+    db.session.add(order)
+    db.session.flush()
+    for product_id, farmer_id, qty, price in items:
+        db.session.add(OrderItem(order_id=order.id, product_id=product_id, farmer_id=farmer_id,
+                                 quantity=qty, unit_price=price))
+    clear_cart(key)
+    db.session.flush()
+    return order.id
+
 @cart_bp.route('/checkout', methods=['POST'])
 @login_required
 def checkout():
@@ -93,43 +116,29 @@ def checkout():
 
     items_data = []
     total = 0
+    products = load_products(cart, profile=None)
     for product_id, qty in cart.items():
-        product = Product.query.get(int(product_id))
-        if not product or not product.is_available or product.stock_quantity < qty:
+        product = products.get(product_id)
+        if not product or not product.is_available:
             flash(f'"{product.name if product else "A product"}" is no longer available in requested quantity.', 'danger')
             return redirect(url_for('cart.view_cart'))
         subtotal = product.price * qty
         total += subtotal
-        items_data.append({'product': product, 'qty': qty, 'price': product.price})
+        items_data.append((product_id, product.farmer_id, qty, product.price))
 
     delivery_fee = 0 if total >= FREE_DELIVERY_THRESHOLD else DELIVERY_FEE
-    grand_total = total + delivery_fee
-
-    order = Order(
-        buyer_id=current_user.id,
-        total_amount=grand_total,
-        delivery_fee=delivery_fee,
-        shipping_address=shipping_address,
-        payment_method=payment_method,
-        notes=notes,
-        status='pending',
-        payment_status='unpaid' if payment_method != 'cod' else 'pending',
-    )
-    db.session.add(order)
-    db.session.flush()
-
-    for item in items_data:
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=item['product'].id,
-            quantity=item['qty'],
-            unit_price=item['price'],
-        )
-        item['product'].stock_quantity -= item['qty']
-        db.session.add(order_item)
-
-    db.session.commit()
-    session.pop('cart', None)
-
-    flash(f'Order #{order.id} placed successfully!', 'success')
-    return redirect(url_for('orders.order_detail', order_id=order.id))
\ No newline at end of file
+    try:
+        order_id = write(place_order, current_user.id, cart_key(), items_data, total + delivery_fee,
+                         delivery_fee, shipping_address, payment_method, notes)
+    except stock.OutOfStock as e:
+        names = ', '.join(f'"{products[pid].name}"' for pid in sorted(e.product_ids))
+        flash(f'{names} no longer available in requested quantity.', 'danger')
+        return redirect(url_for('cart.view_cart'))
+    except WritePending:
+        # It may still go through, so don't invite a second checkout.
+        flash('Your order is still being processed. Check My Orders in a moment before trying again.', 'warning')
+        return redirect(url_for('orders.my_orders'))
+    session.pop('cart_count', None)
+
+    flash(f'Order #{order_id} placed successfully!', 'success')
+    return redirect(url_for('orders.order_detail', order_id=order_id))
\ No newline at end of file
@@ -1,7 +1,9 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for
-from app.models.product import Product
-from app.models.category import Category
-from app.models.user import User
+from flask import Blueprint, render_template, request, session, redirect, url_for, jsonify
+from app.models.ranking import FarmerRanking
+from app.utils.page_cache import cache_page
+from app.utils.catalog_snapshot import catalog
+from app.utils.write_queue import write_queue
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timezone
 
 # 1. Blueprint must be defined BEFORE the routes below use it
@@ -32,22 +34,19 @@ def inject_globals():
 # ─── Main Routes ──────────────────────────────────────────────────────────────
 
 @main_bp.route('/')
+@cache_page(ttl=60)
 def index():
     """Homepage — featured products, categories, top farmers."""
-    featured = (
-        Product.query
-        .filter_by(is_available=True)
-        .order_by(Product.views.desc())
-        .limit(8)
-        .all()
-    )
-    categories = Category.query.all()
-    top_farmers = (
-        User.query
-        .filter_by(role='farmer', is_active=True)
+    snapshot = catalog.get()
+    featured = snapshot.top('popular', 8)
+    categories = snapshot.categories
+    top_farmers = [
+        ranking.farmer for ranking in
+        FarmerRanking.query
+        .options(joinedload(FarmerRanking.farmer))
+        .order_by(FarmerRanking.score.desc())
         .limit(6)
-        .all()
-    )
+    ]
     return render_template(
         'index.html',
         featured=featured,
@@ -68,6 +67,12 @@ def contact():
     return render_template('contact.html')
 
 
+@main_bp.route('/write-queue-stats')
+def write_queue_stats():
+    """Batch, operation, timeout and backlog counters of this process's write queue."""
+    return jsonify(write_queue.stats())
+
+
 # ─── Error Handlers ───────────────────────────────────────────────────────────
 
 @main_bp.app_errorhandler(404)
@@ -0,0 +1,23 @@
+from flask import Blueprint, abort, current_app, send_from_directory
+
+media_bp = Blueprint('media', __name__)
+
+# Uploads are named by content hash (derivatives by hash + variant), so a URL
+# never changes meaning: responses carry the path as a strong ETag and may be
+# cached for a year. Range requests are answered by send_file; set
+# USE_X_SENDFILE to hand the transfer to the front-end server. Dot-files,
+# such as the .<uuid>.part files an upload is written to before it is
+# renamed, are never served.
+
+MEDIA_MAX_AGE = 365 * 24 * 3600
+
+
+@media_bp.route('/<path:filename>')
+def serve(filename):
+    if any(part.startswith('.') for part in filename.split('/')) or filename.endswith('.part'):
+        abort(404)
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename,
+                                   etag=filename, max_age=MEDIA_MAX_AGE, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
@@ -3,7 +3,8 @@ from flask_login import login_required, current_user
 from app import db
 from app.models.message import Conversation, Message
 from app.models.user import User
-from datetime import datetime
+from app.utils.loading import loading_profile
+from app.utils.write_queue import WritePending, write
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -12,12 +13,14 @@ messages_bp = Blueprint('messages', __name__)
 @login_required
 def inbox():
     """Show all conversations for the current user."""
-    conversations = Conversation.query.filter(
+    conversations = Conversation.query.options(*loading_profile('conversation')).filter(
         (Conversation.buyer_id == current_user.id) | 
         (Conversation.farmer_id == current_user.id)
     ).order_by(Conversation.last_message_at.desc()).all()
     
-    return render_template('messages/inbox.html', conversations=conversations)
+    return render_template('messages/inbox.html', conversations=conversations,
+                           unread_counts=Conversation.unread_counts(current_user.id),
+                           last_messages=Conversation.last_messages([c.id for c in conversations]))
 
 
 @messages_bp.route('/chat/<int:user_id>')
@@ -83,23 +86,19 @@ def send_message():
     if conversation.buyer_id != current_user.id and conversation.farmer_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    message = Message(
-        conversation_id=conversation_id,
-        sender_id=current_user.id,
-        message=message_text
-    )
-    conversation.last_message_at = datetime.utcnow()
-    
-    db.session.add(message)
-    db.session.commit()
+    try:
+        message_id, created_at = write(Message.post, conversation.id, current_user.id, message_text)
+    except WritePending:
+        # Accepted but not saved yet; sending it again could post it twice.
+        return jsonify({'pending': True, 'error': 'Message is still being sent'}), 202
     
     return jsonify({
         'success': True,
         'message': {
-            'id': message.id,
-            'sender_id': message.sender_id,
-            'message': message.message,
-            'created_at': message.created_at.strftime('%I:%M %p'),
+            'id': message_id,
+            'sender_id': current_user.id,
+            'message': message_text,
+            'created_at': created_at.strftime('%I:%M %p'),
             'sender_name': current_user.full_name or current_user.username
         }
     })
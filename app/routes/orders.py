@@ -1,9 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, \
+    Response, stream_with_context
 from flask_login import login_required, current_user
 from app import db
 from app.models.order import Order, OrderItem
 from app.models.product import Product
 from app.utils.constants import DELIVERY_FEE, FREE_DELIVERY_THRESHOLD
+from app.utils.pagination import keyset_paginate, paginate, wants_keyset, cached_count
+from app.utils.loading import loading_profile
+from app.utils.order_export import export_csv, export_jsonl
+from app.utils.search_cache import CachedPagination
+from app.utils import stock
+from app.utils.sales_rollup import order_status_changed
+from app.utils.order_events import order_changed
+from app.utils.write_queue import WritePending, write
 
 orders_bp = Blueprint('orders', __name__)
 
@@ -11,20 +20,77 @@ orders_bp = Blueprint('orders', __name__)
 @login_required
 def my_orders():
     page = request.args.get('page', 1, type=int)
-    orders = Order.query.filter_by(buyer_id=current_user.id)\
-                        .order_by(Order.created_at.desc())\
-                        .paginate(page=page, per_page=current_app.config['ORDERS_PER_PAGE'])
+    per_page = current_app.config['ORDERS_PER_PAGE']
+    query = Order.query.options(*loading_profile('order_items')).filter_by(buyer_id=current_user.id)
+    count_key = ('orders', current_user.id)
+    if wants_keyset():
+        orders = keyset_paginate(query, 'newest', Order.created_at, Order.id,
+                                 cursor=request.args.get('cursor'), per_page=per_page,
+                                 total=cached_count(count_key, query))
+    else:
+        orders = paginate(query.order_by(Order.created_at.desc(), Order.id.desc()),
+                          page, per_page, count_key)
     return render_template('orders/my_orders.html', orders=orders)
 
+def _export(user_id, as_farmer, name):
+    if request.args.get('format') == 'jsonl':
+        body, mimetype, ext = export_jsonl(user_id, as_farmer), 'application/x-ndjson', 'jsonl'
+    else:
+        body, mimetype, ext = export_csv(user_id, as_farmer), 'text/csv', 'csv'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=harvestiq-{name}-{user_id}.{ext}',
+    })
+
+@orders_bp.route('/export')
+@login_required
+def export_orders():
+    return _export(current_user.id, False, 'orders')
+
 @orders_bp.route('/<int:order_id>')
 @login_required
 def order_detail(order_id):
-    order = Order.query.get_or_404(order_id)
+    order = Order.query.options(*loading_profile('order_items')).get_or_404(order_id)
     if order.buyer_id != current_user.id and not current_user.is_farmer:
         flash('Unauthorized.', 'danger')
         return redirect(url_for('main.index'))
     return render_template('orders/detail.html', order=order)
 
+def cancel(order_id):
+    """Write operation: cancel a pending or confirmed order and restock it; returns whether it was cancelled."""
+    status = db.session.query(Order.status).filter_by(id=order_id).scalar()
+    if status not in ('pending', 'confirmed'):
+        return False
+    # Flip the status with a conditional UPDATE so two cancels can't both
+    # return the stock.
+    cancelled = Order.query.filter(Order.id == order_id, Order.status == status)\
+                           .update({'status': 'cancelled'}, synchronize_session='evaluate')
+    if cancelled:
+        returned = {}
+        for product_id, quantity in db.session.query(OrderItem.product_id, OrderItem.quantity)\
+                                              .filter_by(order_id=order_id):
+            returned[product_id] = returned.get(product_id, 0) + quantity
+        stock.release(returned)
+        order_status_changed(order_id, status, 'cancelled')
+        order_changed(order_id)
+    return bool(cancelled)
+
+def set_status(order_id, status):
+    """Write operation: move an order to a new fulfilment status; returns whether it moved.
+
+    Cancelled and refunded orders stay closed: their stock has gone back on
+    the shelf, so reviving them would sell units nobody holds.
+    """
+    old_status = db.session.query(Order.status).filter_by(id=order_id).scalar()
+    if old_status is None or old_status == status or old_status in Order.CLOSED_STATUSES:
+        return False
+    moved = Order.query.filter(Order.id == order_id, Order.status == old_status,
+                               Order.status.notin_(Order.CLOSED_STATUSES))\
+                       .update({'status': status}, synchronize_session='evaluate')
+    if moved:
+        order_status_changed(order_id, old_status, status)
+        order_changed(order_id)
+    return bool(moved)
+
 @orders_bp.route('/<int:order_id>/cancel', methods=['POST'])
 @login_required
 def cancel_order(order_id):
@@ -32,15 +98,13 @@ def cancel_order(order_id):
     if order.buyer_id != current_user.id:
         flash('Unauthorized.', 'danger')
         return redirect(url_for('main.index'))
-    if order.status in ('pending', 'confirmed'):
-        order.status = 'cancelled'
-        # Restore stock
-        for item in order.items:
-            item.product.stock_quantity += item.quantity
-        db.session.commit()
-        flash('Order cancelled.', 'info')
-    else:
-        flash('This order cannot be cancelled.', 'danger')
+    try:
+        if write(cancel, order.id):
+            flash('Order cancelled.', 'info')
+        else:
+            flash('This order cannot be cancelled.', 'danger')
+    except WritePending:
+        flash('Your cancellation is still being processed. Check back in a moment.', 'warning')
     return redirect(url_for('orders.order_detail', order_id=order_id))
 
 @orders_bp.route('/farmer/manage')
@@ -49,13 +113,24 @@ def farmer_orders():
     if not current_user.is_farmer:
         flash('Only farmers can view this page.', 'danger')
         return redirect(url_for('main.index'))
-    # Get orders containing the farmer's products
-    farmer_product_ids = [p.id for p in current_user.products]
-    order_ids = db.session.query(OrderItem.order_id)\
-                          .filter(OrderItem.product_id.in_(farmer_product_ids)).distinct().all()
-    order_ids = [o[0] for o in order_ids]
-    orders = Order.query.filter(Order.id.in_(order_ids)).order_by(Order.created_at.desc()).all()
-    return render_template('orders/farmer_orders.html', orders=orders)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['ORDERS_PER_PAGE']
+    ids_query = Order.farmer_order_ids(current_user.id)
+    order_ids = [oid for (oid,) in ids_query.offset((page - 1) * per_page).limit(per_page)]
+    loaded = {o.id: o for o in Order.query.options(*loading_profile('farmer_order'))
+                                          .filter(Order.id.in_(order_ids))} if order_ids else {}
+    orders = CachedPagination([loaded[oid] for oid in order_ids if oid in loaded],
+                              cached_count(('farmer_orders', current_user.id), ids_query), page, per_page)
+    farmer_items = OrderItem.for_farmer(current_user.id, order_ids)
+    return render_template('orders/farmer_orders.html', orders=orders, farmer_items=farmer_items)
+
+@orders_bp.route('/farmer/export')
+@login_required
+def export_farmer_orders():
+    if not current_user.is_farmer:
+        flash('Only farmers can export farmer orders.', 'danger')
+        return redirect(url_for('main.index'))
+    return _export(current_user.id, True, 'farmer-orders')
 
 @orders_bp.route('/farmer/<int:order_id>/update', methods=['POST'])
 @login_required
@@ -67,7 +142,11 @@ def update_order_status(order_id):
     new_status = request.form.get('status')
     valid_statuses = ['confirmed', 'processing', 'shipped', 'delivered']
     if new_status in valid_statuses:
-        order.status = new_status
-        db.session.commit()
-        flash(f'Order status updated to {new_status}.', 'success')
+        try:
+            if write(set_status, order.id, new_status):
+                flash(f'Order status updated to {new_status}.', 'success')
+            else:
+                flash(f'Order #{order.id} is {order.status} and can no longer change status.', 'danger')
+        except WritePending:
+            flash(f'The update of order #{order.id} is still being processed. Check back in a moment.', 'warning')
     return redirect(url_for('orders.farmer_orders'))
\ No newline at end of file
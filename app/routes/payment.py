@@ -32,6 +32,9 @@ def stripe_charge(order_id):
     order = Order.query.get_or_404(order_id)
     if order.buyer_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
+    if order.status in Order.CLOSED_STATUSES:
+        flash(f'Order #{order.id} is {order.status} and can no longer be paid.', 'danger')
+        return redirect(url_for('orders.order_detail', order_id=order_id))
 
     stripe.api_key = current_app.config['STRIPE_SECRET_KEY']
     token = request.form.get('stripeToken')
@@ -57,7 +60,9 @@ def stripe_charge(order_id):
 def confirm_ewallet(order_id):
     order = Order.query.get_or_404(order_id)
     ref = request.form.get('reference', '').strip()
-    if ref:
+    if order.status in Order.CLOSED_STATUSES:
+        flash(f'Order #{order.id} is {order.status} and can no longer be paid.', 'danger')
+    elif ref:
         order.payment_reference = ref
         order.payment_status = 'paid'
         order.status = 'confirmed'
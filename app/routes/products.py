@@ -1,47 +1,59 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, \
+    Response, stream_with_context, jsonify
 from flask_login import login_required, current_user
 from app import db
 from app.models.product import Product
 from app.models.category import Category
 from app.utils.helpers import save_image
+from app.utils.uploads import process_upload
+from app.utils.constants import IMAGE_TOO_LARGE
+from app.utils.view_counter import view_counter
+from app.utils.page_cache import cache_page
+from app.utils.loading import loading_profile
+from app.utils.copurchase import related_ids
+from app.utils.catalog_io import import_catalog, export_csv, export_jsonl, FIELDS as CATALOG_FIELDS
+from app.utils.pagination import wants_keyset
+from app.utils.catalog_snapshot import catalog
 
 products_bp = Blueprint('products', __name__)
 
 @products_bp.route('/')
+@cache_page(ttl=60)
 def list_products():
     page = request.args.get('page', 1, type=int)
     category_id = request.args.get('category', type=int)
     sort = request.args.get('sort', 'newest')
     organic = request.args.get('organic', type=bool)
 
-    query = Product.query.filter_by(is_available=True)
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if organic:
-        query = query.filter_by(is_organic=True)
-
-    if sort == 'price_asc':
-        query = query.order_by(Product.price.asc())
-    elif sort == 'price_desc':
-        query = query.order_by(Product.price.desc())
-    elif sort == 'popular':
-        query = query.order_by(Product.views.desc())
+    snapshot = catalog.get()
+    per_page = current_app.config['PRODUCTS_PER_PAGE']
+    if wants_keyset():
+        products = snapshot.keyset_page(sort, request.args.get('cursor'), per_page,
+                                        category_id=category_id, organic=organic)
     else:
-        query = query.order_by(Product.created_at.desc())
-
-    products = query.paginate(page=page, per_page=current_app.config['PRODUCTS_PER_PAGE'])
-    categories = Category.query.all()
-    return render_template('products/list.html', products=products, categories=categories,
+        products = snapshot.paginate(sort, page, per_page, category_id=category_id, organic=organic)
+    return render_template('products/list.html', products=products, categories=snapshot.categories,
                            selected_category=category_id, sort=sort)
 
+@products_bp.route('/catalog-stats')
+def catalog_stats():
+    """Version, age and approximate memory footprint of this process's catalog snapshot."""
+    return jsonify(catalog.stats())
+
 @products_bp.route('/<int:product_id>')
+@cache_page(ttl=120, on_hit=view_counter.record)
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    product.views += 1
-    db.session.commit()
-    related = Product.query.filter_by(category_id=product.category_id, is_available=True)\
-                           .filter(Product.id != product_id).limit(4).all()
-    return render_template('products/detail.html', product=product, related=related)
+    product = Product.query.options(*loading_profile('product_detail')).get_or_404(product_id)
+    view_counter.record(product.id)
+    views = (product.views or 0) + view_counter.pending(product.id)
+    snapshot = catalog.get()
+    related = [snapshot.by_id[i] for i in related_ids(product) if i in snapshot.by_id][:4]
+    bought_together = bool(related)
+    if not bought_together:
+        # Nobody has bought it alongside anything that is still on sale
+        related = snapshot.top('newest', 4, category_id=product.category_id, exclude=product.id)
+    return render_template('products/detail.html', product=product, related=related, views=views,
+                           bought_together=bought_together)
 
 @products_bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -54,6 +66,11 @@ def add_product():
     if request.method == 'POST':
         image_file = request.files.get('image')
         image_path = save_image(image_file) if image_file else None
+        image_variants = None
+        if image_path:
+            image_path, image_variants = process_upload(image_path)
+            if image_path is None:
+                flash(IMAGE_TOO_LARGE, 'warning')
 
         product = Product(
             farmer_id=current_user.id,
@@ -67,6 +84,7 @@ def add_product():
             is_organic='is_organic' in request.form,
             location=request.form.get('location', current_user.region),
             image=image_path or 'default_product.jpg',
+            image_variants=image_variants,
         )
         db.session.add(product)
         db.session.commit()
@@ -97,7 +115,12 @@ def edit_product(product_id):
         if image_file and image_file.filename:
             image_path = save_image(image_file)
             if image_path:
-                product.image = image_path
+                image_path, image_variants = process_upload(image_path)
+                if image_path is None:
+                    flash(IMAGE_TOO_LARGE, 'warning')
+                else:
+                    product.image = image_path
+                    product.image_variants = image_variants
 
         db.session.commit()
         flash('Product updated!', 'success')
@@ -115,3 +138,37 @@ def delete_product(product_id):
     db.session.commit()
     flash('Product removed.', 'success')
     return redirect(url_for('users.dashboard'))
+
+@products_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_products():
+    if not current_user.is_farmer:
+        flash('Only farmers can import products.', 'danger')
+        return redirect(url_for('main.index'))
+
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('catalog')
+        if not upload or not upload.filename:
+            flash('Choose a CSV or JSON Lines file to import.', 'warning')
+            return redirect(url_for('products.import_products'))
+        fmt = 'jsonl' if upload.filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+        report = import_catalog(current_user, upload.stream, fmt)
+        flash(f'Imported {report.created} new and {report.updated} updated products'
+              + (f'; {report.failed} rows skipped.' if report.failed else '.'),
+              'success' if not report.failed else 'warning')
+    return render_template('products/import.html', report=report, fields=CATALOG_FIELDS)
+
+@products_bp.route('/export')
+@login_required
+def export_products():
+    if not current_user.is_farmer:
+        flash('Only farmers can export products.', 'danger')
+        return redirect(url_for('main.index'))
+    if request.args.get('format') == 'jsonl':
+        body, mimetype, ext = export_jsonl(current_user.id), 'application/x-ndjson', 'jsonl'
+    else:
+        body, mimetype, ext = export_csv(current_user.id), 'text/csv', 'csv'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=harvestiq-products-{current_user.id}.{ext}',
+    })
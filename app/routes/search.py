@@ -1,49 +1,183 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, jsonify, session, url_for
+from flask_login import login_required
 from app.models.product import Product
 from app.models.category import Category
 from app.utils.validators import sanitize_search
+from app.utils import search_index
+from app.utils.facets import compute_facets, region_filter, price_filter
+from app.utils.autocomplete import suggest
+from app.utils.trigram_index import did_you_mean
+from app.utils import search_cache
+from app.utils import geo
+from app.utils.page_cache import cache_page
+from app.utils.loading import loading_profile
+from app.utils.pagination import keyset_paginate, paginate, product_sort_key, wants_keyset, cached_count
 
 search_bp = Blueprint('search', __name__)
 
-@search_bp.route('/')
-def search():
-    q = sanitize_search(request.args.get('q', ''))
-    category_id = request.args.get('category', type=int)
-    min_price = request.args.get('min_price', type=float)
-    max_price = request.args.get('max_price', type=float)
-    region = request.args.get('region', '')
-    organic = request.args.get('organic', '')
-    sort = request.args.get('sort', 'relevance')
-    page = request.args.get('page', 1, type=int)
 
-    query = Product.query.filter_by(is_available=True)
+def get_search_params():
+    """Read the search/filter arguments shared by the page and JSON endpoints."""
+    return {
+        'q': sanitize_search(request.args.get('q', '')),
+        'category_id': request.args.get('category', type=int),
+        'min_price': request.args.get('min_price', type=float),
+        'max_price': request.args.get('max_price', type=float),
+        'price_below': request.args.get('price_below', type=float),
+        'region': request.args.get('region', ''),
+        'organic': request.args.get('organic', ''),
+        'near': request.args.get('near', '').strip()[:100],
+        'radius': geo.clamp_radius(request.args.get('radius', type=float)),
+        'sort': request.args.get('sort', 'relevance'),
+        'page': request.args.get('page', 1, type=int),
+    }
+
 
-    if q:
+def uses_index(q):
+    return bool(q) and search_index.is_enabled() and bool(search_index.match_expression(q))
+
+
+def text_query(q):
+    """Available products matching the search text, before facet filters."""
+    query = Product.query.filter_by(is_available=True)
+    if uses_index(q):
+        query = search_index.apply_search(query, q)
+    elif q:
         query = query.filter(
             Product.name.ilike(f'%{q}%') | Product.description.ilike(f'%{q}%')
         )
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-    if min_price:
-        query = query.filter(Product.price >= min_price)
-    if max_price:
-        query = query.filter(Product.price <= max_price)
-    if region:
-        query = query.filter(Product.location.ilike(f'%{region}%'))
-    if organic == '1':
+    return query
+
+
+def near_filter(query, params):
+    """Keep products within the requested radius when the search has an origin."""
+    origin = geo.parse_origin(params['near'])
+    if origin is None:
+        return query
+    return geo.within(query, Product, origin, params['radius'])
+
+
+def apply_filters(query, params):
+    query = near_filter(query, params)
+    if params['category_id']:
+        query = query.filter_by(category_id=params['category_id'])
+    for clause in price_filter(params['min_price'], params['max_price'], params['price_below']):
+        query = query.filter(clause)
+    if params['region']:
+        query = query.filter(region_filter(params['region']))
+    if params['organic'] == '1':
         query = query.filter_by(is_organic=True)
+    return query
+
+
+def facets_for(params):
+    return compute_facets(
+        near_filter(text_query(params['q']), params),
+        category_id=params['category_id'],
+        region=params['region'],
+        organic=params['organic'] == '1',
+        min_price=params['min_price'],
+        max_price=params['max_price'],
+        price_below=params['price_below'],
+    )
+
+
+def run_search(params, cursor=None):
+    """Execute a search; returns (results page, did-you-mean suggestion)."""
+    q, sort = params['q'], params['sort']
 
-    if sort == 'price_asc':
-        query = query.order_by(Product.price.asc())
-    elif sort == 'price_desc':
-        query = query.order_by(Product.price.desc())
-    elif sort == 'popular':
-        query = query.order_by(Product.views.desc())
+    query = apply_filters(text_query(q), params).options(*loading_profile('product_card'))
+    count_key = ('search',) + tuple(v for k, v in sorted(params.items()) if k not in ('page', 'sort'))
+    ranked = sort == 'relevance' and uses_index(q)
+    origin = geo.parse_origin(params['near']) if sort == 'nearest' else None
+
+    if cursor is not None and not ranked and origin is None:
+        column, descending = product_sort_key(sort)
+        results = keyset_paginate(query, sort, column, Product.id, descending=descending,
+                                  cursor=cursor, per_page=12,
+                                  total=cached_count(count_key, query))
+    else:
+        if ranked:
+            query = query.order_by(search_index.relevance_order(), Product.id.desc())
+        elif origin is not None:
+            query = query.order_by(geo.nearest_first(Product, origin), Product.id.desc())
+        else:
+            column, descending = product_sort_key(sort)
+            query = query.order_by(column.desc() if descending else column.asc(), Product.id.desc())
+        results = paginate(query, params['page'], 12, count_key)
+
+    # Nothing matched: retry once with misspelled words swapped for their
+    # closest indexed names, and tell the user which query was used.
+    suggestion = None
+    if q and params['page'] == 1 and not cursor and not results.items:
+        suggestion = did_you_mean(q)
+        if suggestion:
+            query = apply_filters(text_query(suggestion), params).options(*loading_profile('product_card'))
+            if uses_index(suggestion):
+                query = query.order_by(search_index.relevance_order(), Product.id.desc())
+            results = query.paginate(page=1, per_page=12)
+    return results, suggestion
+
+
+@search_bp.route('/')
+@cache_page(ttl=60)
+def search():
+    params = get_search_params()
+    cursor = request.args.get('cursor') if wants_keyset() else None
+
+    key = search_cache.make_key(params, cursor)
+    entry = search_cache.cache.get(key)
+    if entry is None:
+        # A commit that clears the cache while we compute makes this result
+        # stale already: set() then drops it instead of caching it.
+        generation = search_cache.cache.generation
+        results, suggestion = run_search(params, cursor)
+        facets = facets_for(dict(params, q=suggestion or params['q']))
+        search_cache.cache.set(key, dict(search_cache.freeze(results), suggestion=suggestion, facets=facets),
+                               generation=generation)
     else:
-        query = query.order_by(Product.created_at.desc())
+        results = search_cache.thaw(entry)
+        suggestion, facets = entry['suggestion'], entry['facets']
 
-    results = query.paginate(page=page, per_page=12)
     categories = Category.query.all()
-    return render_template('search/results.html', results=results, q=q,
-                           categories=categories, selected_category=category_id,
-                           sort=sort, organic=organic)
\ No newline at end of file
+    return render_template('search/results.html', results=results, q=params['q'],
+                           categories=categories, selected_category=params['category_id'],
+                           sort=params['sort'], organic=params['organic'], region=params['region'],
+                           min_price=params['min_price'], max_price=params['max_price'],
+                           price_below=params['price_below'],
+                           near=params['near'], radius=params['radius'],
+                           radius_choices=geo.RADIUS_CHOICES, origin=geo.parse_origin(params['near']),
+                           facets=facets, suggestion=suggestion)
+
+
+@search_bp.route('/cache-stats')
+@login_required
+def cache_stats():
+    """Hit/miss/eviction counters of the search result cache."""
+    return jsonify(search_cache.cache.stats())
+
+
+@search_bp.route('/facets')
+def facets():
+    """Facet counts for the current search as JSON."""
+    return jsonify(facets_for(get_search_params()))
+
+
+@search_bp.route('/autocomplete')
+def autocomplete():
+    """Typeahead suggestions for the search box, served from memory."""
+    q = request.args.get('q', '')[:100]
+    limit = min(request.args.get('limit', 8, type=int), 20)
+    lang = session.get('lang', 'en')
+    suggestions = []
+    for item in suggest(q, limit=limit):
+        if item['type'] == 'category':
+            name = item['label_tl'] if lang == 'tl' and item['label_tl'] else item['label']
+            label = f"{item['icon']} {name}"
+            url = url_for('products.list_products', category=item['id'])
+        elif item['type'] == 'farmer':
+            label, url = item['label'], url_for('users.farmer_store', farmer_id=item['id'])
+        else:
+            label, url = item['label'], url_for('products.product_detail', product_id=item['id'])
+        suggestions.append({'type': item['type'], 'id': item['id'], 'label': label, 'url': url})
+    return jsonify({'q': q, 'suggestions': suggestions})
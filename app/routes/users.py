@@ -1,10 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from sqlalchemy.orm import joinedload
 from flask_login import login_required, current_user
 from app import db
 from app.models.product import Product
 from app.models.order import Order
 from app.utils.helpers import save_image
-from app.utils.constants import PH_REGIONS, PRODUCT_UNITS
+from app.utils.uploads import process_upload
+from app.utils.constants import PH_REGIONS, PRODUCT_UNITS, IMAGE_TOO_LARGE
+from app.utils.page_cache import cache_page
+from app.utils.loading import loading_profile
+from app.utils.pagination import paginate
+from app.utils import sales_rollup
 
 users_bp = Blueprint('users', __name__)
 
@@ -12,22 +18,23 @@ users_bp = Blueprint('users', __name__)
 @login_required
 def dashboard():
     if current_user.is_farmer:
-        products = Product.query.filter_by(farmer_id=current_user.id).order_by(Product.created_at.desc()).all()
-        farmer_product_ids = [p.id for p in products]
-        from app.models.order import OrderItem
-        order_ids = db.session.query(OrderItem.order_id)\
-                              .filter(OrderItem.product_id.in_(farmer_product_ids)).distinct().all()
-        recent_orders = Order.query.filter(Order.id.in_([o[0] for o in order_ids]))\
-                                   .order_by(Order.created_at.desc()).limit(5).all()
-        total_revenue = sum(
-            item.subtotal for order in Order.query.filter(Order.id.in_([o[0] for o in order_ids])).all()
-            for item in order.items if item.product.farmer_id == current_user.id
-        )
+        products = Product.query.options(*loading_profile('product_card'))\
+                           .filter_by(farmer_id=current_user.id).order_by(Product.created_at.desc()).all()
+        recent_ids = [oid for (oid,) in Order.farmer_order_ids(current_user.id).limit(5)]
+        recent_orders = Order.query.options(*loading_profile('farmer_order'))\
+                                   .filter(Order.id.in_(recent_ids))\
+                                   .order_by(Order.id.desc()).all() if recent_ids else []
+        days = request.args.get('range', 30, type=int)
+        days = days if days in sales_rollup.RANGES else 30
         return render_template('dashboard/farmer.html', products=products,
-                               recent_orders=recent_orders, total_revenue=total_revenue,
-                               units=PRODUCT_UNITS)
+                               recent_orders=recent_orders, units=PRODUCT_UNITS,
+                               total_revenue=sales_rollup.sales_summary(current_user.id)['revenue'],
+                               days=days, ranges=sales_rollup.RANGES,
+                               summary=sales_rollup.sales_summary(current_user.id, days),
+                               series=sales_rollup.sales_series(current_user.id, days),
+                               top_products=sales_rollup.top_products(current_user.id, days))
     else:
-        orders = Order.query.filter_by(buyer_id=current_user.id)\
+        orders = Order.query.options(*loading_profile('order_items')).filter_by(buyer_id=current_user.id)\
                             .order_by(Order.created_at.desc()).limit(5).all()
         return render_template('dashboard/buyer.html', orders=orders)
 
@@ -45,16 +52,37 @@ def profile():
         if image_file and image_file.filename:
             path = save_image(image_file, subfolder='profiles')
             if path:
-                current_user.profile_image = path
+                path, variants = process_upload(path)
+                if path is None:
+                    flash(IMAGE_TOO_LARGE, 'warning')
+                else:
+                    current_user.profile_image = path
+                    current_user.profile_image_variants = variants
 
         db.session.commit()
         flash('Profile updated!', 'success')
         return redirect(url_for('users.profile'))
     return render_template('users/profile.html', regions=PH_REGIONS)
 
+@users_bp.route('/farmers')
+@cache_page(ttl=120)
+def farmer_directory():
+    from app.models.ranking import FarmerRanking
+    from app.models.user import User
+    page = request.args.get('page', 1, type=int)
+    region = request.args.get('region', '')
+    query = FarmerRanking.query.options(joinedload(FarmerRanking.farmer))
+    if region:
+        query = query.join(User, User.id == FarmerRanking.farmer_id).filter(User.region == region)
+    rankings = paginate(query.order_by(FarmerRanking.score.desc(), FarmerRanking.farmer_id),
+                        page, current_app.config.get('FARMERS_PER_PAGE', 24), ('farmers', region))
+    return render_template('users/farmers.html', rankings=rankings, regions=PH_REGIONS, region=region)
+
 @users_bp.route('/farmer/<int:farmer_id>')
+@cache_page(ttl=120)
 def farmer_store(farmer_id):
     from app.models.user import User
     farmer = User.query.filter_by(id=farmer_id, role='farmer', is_active=True).first_or_404()
-    products = Product.query.filter_by(farmer_id=farmer_id, is_available=True).all()
+    products = Product.query.options(*loading_profile('product_card'))\
+                           .filter_by(farmer_id=farmer_id, is_available=True).all()
     return render_template('users/farmer_store.html', farmer=farmer, products=products)
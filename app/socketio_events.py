@@ -1,15 +1,17 @@
 from flask import request
 from flask_login import current_user
 from flask_socketio import emit, join_room, leave_room
-from app import socketio, db
+from app import socketio
 from app.models.message import Message, Conversation
-from datetime import datetime
+from app.utils.write_queue import WritePending, write
+from app.utils.order_events import user_room
 
 
 @socketio.on('connect')
 def handle_connect():
     """User connects to websocket."""
     if current_user.is_authenticated:
+        join_room(user_room(current_user.id))
         print(f'User {current_user.username} connected')
 
 
@@ -58,34 +60,29 @@ def handle_send_message(data):
         return
     
     # Create message
-    message = Message(
-        conversation_id=conversation_id,
-        sender_id=current_user.id,
-        message=message_text
-    )
-    conversation.last_message_at = datetime.utcnow()
-    
-    db.session.add(message)
-    db.session.commit()
+    try:
+        message_id, created_at = write(Message.post, conversation.id, current_user.id, message_text)
+    except WritePending:
+        return  # still being saved; it shows up when the conversation is next loaded
     
     # Broadcast to room
     room = f'conversation_{conversation_id}'
     emit('new_message', {
-        'id': message.id,
-        'sender_id': message.sender_id,
+        'id': message_id,
+        'sender_id': current_user.id,
         'sender_name': current_user.full_name or current_user.username,
-        'message': message.message,
-        'created_at': message.created_at.strftime('%I:%M %p'),
+        'message': message_text,
+        'created_at': created_at.strftime('%I:%M %p'),
         'is_mine': True
     }, room=room, include_self=False)
     
     # Send to sender for confirmation
     emit('message_sent', {
-        'id': message.id,
-        'sender_id': message.sender_id,
+        'id': message_id,
+        'sender_id': current_user.id,
         'sender_name': current_user.full_name or current_user.username,
-        'message': message.message,
-        'created_at': message.created_at.strftime('%I:%M %p'),
+        'message': message_text,
+        'created_at': created_at.strftime('%I:%M %p'),
         'is_mine': True
     })
 
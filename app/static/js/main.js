@@ -37,19 +37,42 @@ document.querySelectorAll('a[href^="#"]').forEach(anchor => {
     if (target) { e.preventDefault(); target.scrollIntoView({ behavior: 'smooth' }); }
   });
 });
-```
 
----
+// Search box typeahead
+document.querySelectorAll('input[data-autocomplete]').forEach(input => {
+  const menu = input.parentElement.querySelector('.autocomplete-menu');
+  const icons = { category: 'fa-tags', farmer: 'fa-user', product: 'fa-seedling' };
+  let timer = null;
+  let controller = null;
 
-## `.env.example`
-```
-SECRET_KEY=your-secret-key-here
-DATABASE_URL=sqlite:///data/farmers_marketplace.db
+  const hide = () => menu.classList.remove('show');
 
-MAIL_SERVER=smtp.gmail.com
-MAIL_PORT=587
-MAIL_USERNAME=your@gmail.com
-MAIL_PASSWORD=your-app-password
+  input.addEventListener('input', function() {
+    clearTimeout(timer);
+    const q = this.value.trim();
+    if (!q) { hide(); return; }
+    timer = setTimeout(() => {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      fetch(`${input.dataset.autocomplete}?q=${encodeURIComponent(q)}`, { signal: controller.signal })
+        .then(res => res.json())
+        .then(data => {
+          menu.innerHTML = '';
+          data.suggestions.forEach(s => {
+            const link = document.createElement('a');
+            link.className = 'dropdown-item small';
+            link.href = s.url;
+            const icon = document.createElement('i');
+            icon.className = `fas ${icons[s.type]} text-success me-2`;
+            link.append(icon, document.createTextNode(s.label));
+            menu.appendChild(link);
+          });
+          menu.classList.toggle('show', data.suggestions.length > 0);
+        })
+        .catch(() => {});
+    }, 80);
+  });
 
-STRIPE_PUBLIC_KEY=pk_test_...
-STRIPE_SECRET_KEY=sk_test_...
\ No newline at end of file
+  input.addEventListener('blur', () => setTimeout(hide, 150));
+  input.addEventListener('keydown', e => { if (e.key === 'Escape') hide(); });
+});
@@ -0,0 +1,34 @@
+// Live order updates: the server pushes order_updated / new_order events to
+// this user's Socket.IO room. Elements marked data-live-order="<id>" are
+// swapped for their fresh copies from the same page; new orders show a notice
+// in #new-order-alerts.
+(function() {
+  if (typeof io === 'undefined') return;
+  const socket = io();
+
+  socket.on('order_updated', data => {
+    const stale = document.querySelectorAll(`[data-live-order="${data.order_id}"]`);
+    if (!stale.length) return;
+    fetch(window.location.href, { credentials: 'same-origin' })
+      .then(response => response.text())
+      .then(html => {
+        const page = new DOMParser().parseFromString(html, 'text/html');
+        stale.forEach(el => {
+          const fresh = el.id && page.getElementById(el.id);
+          if (fresh) el.replaceWith(document.importNode(fresh, true));
+        });
+      });
+  });
+
+  socket.on('new_order', data => {
+    const slot = document.getElementById('new-order-alerts');
+    if (!slot) return;
+    const alert = document.createElement('div');
+    alert.className = 'alert alert-success alert-dismissible fade show';
+    alert.innerHTML = `<i class="fas fa-bell me-2"></i>New order <strong>#${data.order_id}</strong>: ` +
+      `${data.items} item${data.items === 1 ? '' : 's'}, ₱${data.amount.toFixed(2)}. ` +
+      `<a href="${slot.dataset.ordersUrl}" class="alert-link">View orders</a>` +
+      '<button type="button" class="btn-close" data-bs-dismiss="alert"></button>';
+    slot.prepend(alert);
+  });
+})();
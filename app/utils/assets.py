@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+from flask import url_for
+
+logger = logging.getLogger(__name__)
+
+# ─── Fingerprinted Static Assets ──────────────────────────────────────────────
+#
+# `build_assets` copies every file under static/ to static/dist/ with a content
+# hash in its name (css/main.css -> css/main.3f2a9c1b.css), writes gzip and,
+# when the brotli package is installed, brotli siblings for text files, and
+# records the mapping in dist/manifest.json. The manifest is read once at
+# startup; asset_url() then resolves names from memory, and /assets serves the
+# hashed files as immutable. Without a manifest asset_url() falls back to the
+# plain static URL.
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+
+manifest = {}     # source name -> hashed name
+encodings = {}    # hashed name -> ['br', 'gzip'] variants on disk
+
+
+def _compressors():
+    compressors = [('gzip', '.gz', lambda data: gzip.compress(data, 9, mtime=0))]
+    try:
+        import brotli
+    except ImportError:
+        return compressors
+    return [('br', '.br', lambda data: brotli.compress(data, quality=11))] + compressors
+
+
+def build_assets(static_folder):
+    """Fingerprint and precompress static files into static/dist; returns the manifest."""
+    dist = os.path.join(static_folder, DIST)
+    compressors = _compressors()
+    files, variants = {}, {}
+    for root, dirs, names in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for name in sorted(names):
+            source = os.path.join(root, name)
+            rel = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(rel)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(dist, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write(target, data)
+            files[rel] = hashed
+            if ext.lower() in COMPRESSIBLE:
+                variants[hashed] = []
+                for encoding, suffix, compress in compressors:
+                    packed = compress(data)
+                    if len(packed) < len(data):
+                        _write(target + suffix, packed)
+                        variants[hashed].append(encoding)
+    payload = json.dumps({'files': files, 'encodings': variants}, indent=2, sort_keys=True)
+    _write(os.path.join(dist, MANIFEST), payload.encode(), replace=True)
+    return files
+
+
+def _write(path, data, replace=False):
+    # Hashed names never change content, so existing files are left alone; the
+    # temp-file rename keeps concurrent builds (e.g. the reloader) from
+    # exposing half-written files.
+    if os.path.exists(path) and not replace:
+        return
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def configure(app):
+    """Load the manifest, building it first when ASSETS_BUILD_ON_STARTUP is set."""
+    if app.config.get('ASSETS_BUILD_ON_STARTUP'):
+        build_assets(app.static_folder)
+    path = os.path.join(app.static_folder, DIST, MANIFEST)
+    manifest.clear()
+    encodings.clear()
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        logger.info('No asset manifest at %s; serving unversioned static files', path)
+        return
+    manifest.update(data['files'])
+    encodings.update(data['encodings'])
+
+
+def asset_url(filename):
+    """Drop-in for url_for('static', filename=...) that returns the fingerprinted URL."""
+    hashed = manifest.get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.serve', filename=hashed)
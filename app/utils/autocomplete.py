@@ -0,0 +1,261 @@
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from sqlalchemy import event
+from sqlalchemy.orm import Session, load_only
+
+# ─── Typeahead Prefix Index ───────────────────────────────────────────────────
+#
+# A per-process sorted array of (term, kind, ref_id) keys, one key per word of
+# each suggestion label, so "ri" finds "Dinorado Rice". Lookups are a bisect
+# plus a short scan and never touch the database. The index is loaded once on
+# first use (keys sorted in one go) and then patched from committed ORM changes.
+#
+# A short or common prefix ("r", "rice") matches a large share of the catalog,
+# so a prefix with at least TOP_K matches keeps a list of its TOP_K best
+# suggestions, updated as entries come and go. Lists for one-letter
+# prefixes are built with the index; longer ones by one scan the first time
+# they are asked for. A query is anchored on its word with the fewest matches
+# and its other words filter that list, looking at no more than SCAN_LIMIT
+# further keys when it comes up short.
+
+KIND_ORDER = {'category': 0, 'farmer': 1, 'product': 2}
+TOP_K = 50
+SCAN_LIMIT = 500
+PRELOADED_PREFIX = 1  # lists for prefixes this short are built with the index
+
+
+def normalize(value):
+    """Lower-case and strip diacritics so 'Piña' matches 'pina'."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(*labels):
+    terms = set()
+    for label in labels:
+        for word in normalize(label).replace('-', ' ').split():
+            word = ''.join(ch for ch in word if ch.isalnum())
+            if word:
+                terms.add(word)
+    return terms
+
+
+def _rank(entry):
+    return KIND_ORDER[entry['type']], len(entry['label']), entry['label']
+
+
+def _prefixes(terms):
+    return {term[:n] for term in terms for n in range(1, len(term) + 1)}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+        self._top = {}  # common prefix -> sorted [(rank, ref)] of its TOP_K best entries
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry(kind, ref_id, label, terms, extra):
+        return {'type': kind, 'id': ref_id, 'label': label, 'terms': frozenset(terms), **(extra or {})}
+
+    def load(self, rows):
+        """Replace the contents with rows of upsert() arguments, sorting the keys once."""
+        entries, keys = {}, []
+        for kind, ref_id, label, terms, extra in rows:
+            entries[(kind, ref_id)] = self._entry(kind, ref_id, label, terms, extra)
+            keys.extend((term, KIND_ORDER[kind], ref_id, kind) for term in terms)
+        keys.sort()
+        top = {}
+        for item in sorted((_rank(entry), ref) for ref, entry in entries.items()):
+            terms = entries[item[1]]['terms']
+            for prefix in {term[:n] for term in terms for n in range(1, PRELOADED_PREFIX + 1)}:
+                best = top.setdefault(prefix, [])
+                if len(best) < TOP_K:
+                    best.append(item)
+        top = {prefix: best for prefix, best in top.items() if len(best) == TOP_K}
+        with self._lock:
+            self._entries, self._keys, self._top = entries, keys, top
+
+    def upsert(self, kind, ref_id, label, terms, extra=None):
+        ref = (kind, ref_id)
+        entry = self._entry(kind, ref_id, label, terms, extra)
+        with self._lock:
+            if self._entries.get(ref) == entry:
+                return
+            self._discard(ref)
+            self._entries[ref] = entry
+            for term in terms:
+                insort(self._keys, (term, KIND_ORDER[kind], ref_id, kind))
+            item = (_rank(entry), ref)
+            for prefix in _prefixes(entry['terms']):
+                top = self._top.get(prefix)
+                if top is not None and item < top[-1]:
+                    insort(top, item)
+                    del top[TOP_K:]
+
+    def remove(self, kind, ref_id):
+        with self._lock:
+            self._discard((kind, ref_id))
+
+    def _discard(self, ref):
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return
+        kind, ref_id = ref
+        for term in entry['terms']:
+            key = (term, KIND_ORDER[kind], ref_id, kind)
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+        item = (_rank(entry), ref)
+        for prefix in _prefixes(entry['terms']):
+            top = self._top.get(prefix)
+            if top is not None and item in top:
+                del self._top[prefix]  # the next best is unknown: rebuild on demand
+
+    def _range(self, prefix):
+        lo = bisect_left(self._keys, (prefix,))
+        return lo, bisect_left(self._keys, (prefix + '\uffff',), lo)
+
+    def _width(self, prefix):
+        lo, hi = self._range(prefix)
+        return hi - lo
+
+    def _scan(self, prefix, limit=None):
+        """Distinct refs of the entries with a term starting with ``prefix``, in key order."""
+        lo, hi = self._range(prefix)
+        keys = self._keys[lo:hi if limit is None else min(hi, lo + limit)]
+        return list(dict.fromkeys((kind, ref_id) for _, _, ref_id, kind in keys))
+
+    def _best(self, prefix):
+        top = self._top.get(prefix)
+        if top is None:
+            refs = self._scan(prefix)
+            top = heapq.nsmallest(TOP_K, ((_rank(self._entries[ref]), ref) for ref in refs))
+            if len(top) == TOP_K:
+                self._top[prefix] = top
+        return top
+
+    def search(self, text, limit=8):
+        words = tokenize(text)
+        if not words:
+            return []
+
+        def wanted(entry):
+            return all(any(t.startswith(w) for t in entry['terms']) for w in rest)
+
+        with self._lock:
+            anchor = min(words, key=lambda w: (self._width(w), -len(w), w))
+            rest = words - {anchor}
+            top = self._best(anchor)
+            found = [self._entries[ref] for _, ref in top if wanted(self._entries[ref])]
+            if rest and len(found) < limit and len(top) == TOP_K:
+                # The anchor's best matches don't satisfy the other words often
+                # enough: look through more of its matches, within bounds.
+                listed = {ref for _, ref in top}
+                found += [self._entries[ref] for ref in self._scan(anchor, limit=SCAN_LIMIT)
+                          if ref not in listed and wanted(self._entries[ref])]
+        found.sort(key=_rank)
+        return [{k: v for k, v in e.items() if k != 'terms'} for e in found[:limit]]
+
+
+index = PrefixIndex()
+_load_lock = threading.Lock()
+
+
+# ─── Row → Suggestion ─────────────────────────────────────────────────────────
+
+def _product_entry(product):
+    if not product.is_available:
+        return None
+    return ('product', product.id, product.name, tokenize(product.name), None)
+
+
+def _category_entry(category):
+    return ('category', category.id, category.name,
+            tokenize(category.name, category.name_tl),
+            {'label_tl': category.name_tl, 'icon': category.icon})
+
+
+def _farmer_entry(user):
+    if user.role != 'farmer' or not user.is_active:
+        return None
+    label = user.full_name or user.username
+    return ('farmer', user.id, label, tokenize(label, user.username), None)
+
+
+def _entry_for(obj):
+    from app.models.product import Product
+    from app.models.category import Category
+    from app.models.user import User
+    if isinstance(obj, Product):
+        return 'product', _product_entry(obj)
+    if isinstance(obj, Category):
+        return 'category', _category_entry(obj)
+    if isinstance(obj, User):
+        return 'farmer', _farmer_entry(obj)
+    return None, None
+
+
+# ─── Loading & Sync ───────────────────────────────────────────────────────────
+
+def ensure_loaded():
+    """Build the index from the database the first time it is needed."""
+    if index.loaded:
+        return index
+    with _load_lock:
+        if index.loaded:
+            return index
+        from app.models.product import Product
+        from app.models.category import Category
+        from app.models.user import User
+        rows = (
+            [_category_entry(c) for c in Category.query.all()]
+            + [_farmer_entry(u) for u in User.query.filter_by(role='farmer', is_active=True)]
+            + [_product_entry(p) for p in Product.query.filter_by(is_available=True).options(
+                load_only(Product.id, Product.name, Product.is_available))]
+        )
+        index.load(row for row in rows if row)
+        index.loaded = True
+    return index
+
+
+def suggest(text, limit=8):
+    return ensure_loaded().search(text, limit=limit)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    pending = session.info.setdefault('autocomplete_pending', {})
+    for obj in list(session.new) + list(session.dirty):
+        kind, entry = _entry_for(obj)
+        if kind:
+            pending[(kind, obj.id)] = entry
+    for obj in session.deleted:
+        kind, _ = _entry_for(obj)
+        if kind:
+            pending[(kind, obj.id)] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    pending = session.info.pop('autocomplete_pending', None)
+    if not pending or not index.loaded:
+        return
+    for (kind, ref_id), entry in pending.items():
+        if entry:
+            index.upsert(*entry)
+        else:
+            index.remove(kind, ref_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('autocomplete_pending', None)
@@ -0,0 +1,192 @@
+import secrets
+from datetime import datetime, timedelta
+from flask import session
+from flask_login import current_user, user_logged_in, user_logged_out, user_loaded_from_cookie
+from sqlalchemy import func
+from app import db
+from app.models.cart import CartItem
+from app.utils.loading import loading_profile
+
+# ─── Server-side Cart ─────────────────────────────────────────────────────────
+#
+# Cart lines live in the cart_items table under a cart key: 'u:<id>' for a
+# logged-in user, 's:<token>' for a visitor, whose token is the only cart data
+# kept in the cookie (plus the item count for the navbar badge). Logging in
+# folds the visitor cart into the user's. Products behind a cart are always
+# loaded with one IN query.
+
+def cart_key(create=False):
+    """The current request's cart key; a visitor gets a token only once they add something."""
+    if current_user.is_authenticated:
+        return f'u:{current_user.id}'
+    token = session.get('cart_id')
+    if token is None and create:
+        token = session['cart_id'] = secrets.token_urlsafe(18)
+    return f's:{token}' if token else None
+
+
+def get_cart(key=None):
+    """{product id: quantity} for a cart, oldest line first."""
+    if 'cart' in session:
+        _adopt_cookie_cart(cart_key(create=True))
+    key = key or cart_key()
+    if not key:
+        return {}
+    rows = db.session.query(CartItem.product_id, CartItem.quantity)\
+                     .filter_by(cart_key=key).order_by(CartItem.added_at, CartItem.product_id)
+    return dict(rows)
+
+
+def load_products(product_ids, profile='cart_product'):
+    """{id: Product} for a cart's products in one query."""
+    from app.models.product import Product
+    if not product_ids:
+        return {}
+    query = Product.query.filter(Product.id.in_(list(product_ids)))
+    if profile:
+        query = query.options(*loading_profile(profile))
+    return {p.id: p for p in query}
+
+
+def priced_lines(cart):
+    """Cart lines for still-available products, with subtotals; returns (lines, total)."""
+    products = load_products(cart)
+    lines, total = [], 0
+    for product_id, qty in cart.items():
+        product = products.get(product_id)
+        if product and product.is_available:
+            subtotal = product.price * qty
+            total += subtotal
+            lines.append({'product': product, 'quantity': qty, 'subtotal': subtotal})
+    return lines, total
+
+
+# ─── Changes ──────────────────────────────────────────────────────────────────
+# These stage changes on db.session; the caller commits.
+
+def add_item(product, quantity):
+    key = cart_key(create=True)
+    item = db.session.get(CartItem, (key, product.id))
+    if item is None:
+        item = CartItem(cart_key=key, product_id=product.id, quantity=0)
+        db.session.add(item)
+    item.quantity = min(item.quantity + quantity, product.stock_quantity + _held().get(product.id, 0))
+    _remember_count(key)
+
+
+def set_quantities(quantities):
+    """Apply {product id: quantity} from the cart form; 0 or less removes the line."""
+    key = cart_key()
+    if not key:
+        return
+    products = load_products([pid for pid, qty in quantities.items() if qty > 0], profile=None)
+    held = _held()
+    items = {i.product_id: i for i in CartItem.query.filter(
+        CartItem.cart_key == key, CartItem.product_id.in_(list(quantities)))}
+    for product_id, qty in quantities.items():
+        item = items.get(product_id)
+        if item is None:
+            continue
+        if qty <= 0 or product_id not in products:
+            db.session.delete(item)
+        else:
+            item.quantity = min(qty, products[product_id].stock_quantity + held.get(product_id, 0))
+    _remember_count(key)
+
+
+def remove_item(product_id):
+    key = cart_key()
+    if key:
+        CartItem.query.filter_by(cart_key=key, product_id=product_id).delete()
+        _remember_count(key)
+
+
+def clear_cart(key):
+    CartItem.query.filter_by(cart_key=key).delete()
+
+
+def merge_carts(from_key, to_key):
+    """Move every line of one cart into another, adding up quantities of shared products.
+
+    Like add_item(), a merged line holds no more than is in stock (plus what
+    the current user already has set aside).
+    """
+    moving = CartItem.query.filter_by(cart_key=from_key).all()
+    if not moving:
+        return
+    products = load_products([i.product_id for i in moving], profile=None)
+    held = _held()
+    target = {i.product_id: i for i in CartItem.query.filter_by(cart_key=to_key)}
+    for item in moving:
+        db.session.delete(item)
+        product = products.get(item.product_id)
+        if product is None:
+            continue
+        line = target.get(item.product_id)
+        quantity = min((line.quantity if line else 0) + item.quantity,
+                       product.stock_quantity + held.get(item.product_id, 0))
+        if quantity <= 0:
+            continue  # sold out: leave the user's own line as it was
+        if line is not None:
+            line.quantity = quantity
+        else:
+            db.session.add(CartItem(cart_key=to_key, product_id=item.product_id, quantity=quantity))
+
+
+def prune_visitor_carts(days):
+    """Delete visitor carts untouched for ``days`` days; returns lines removed."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = CartItem.query.filter(CartItem.cart_key.startswith('s:'), CartItem.updated_at < cutoff)\
+                            .delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def _held():
+    """Units already set aside for the current user (they are off the shelf but theirs)."""
+    from app.utils.stock import reserved_for
+    return reserved_for(current_user.id) if current_user.is_authenticated else {}
+
+
+def _remember_count(key):
+    count = db.session.query(func.coalesce(func.sum(CartItem.quantity), 0)).filter_by(cart_key=key).scalar()
+    session['cart_count'] = count
+
+
+def _adopt_cookie_cart(key):
+    """Move a cart kept in the cookie by earlier versions into the store."""
+    legacy = {}
+    for product_id, qty in session.pop('cart', {}).items():
+        try:
+            legacy[int(product_id)] = int(qty)
+        except (TypeError, ValueError):
+            continue
+    stored = {pid for (pid,) in db.session.query(CartItem.product_id).filter_by(cart_key=key)}
+    for product_id in load_products(legacy, profile=None):
+        if product_id not in stored and legacy[product_id] > 0:
+            db.session.add(CartItem(cart_key=key, product_id=product_id, quantity=legacy[product_id]))
+    _remember_count(key)
+    db.session.commit()
+
+
+# ─── Login / Logout ───────────────────────────────────────────────────────────
+
+@user_logged_in.connect
+def _merge_visitor_cart(app, user):
+    token = session.pop('cart_id', None)
+    key = f'u:{user.id}'
+    if token:
+        merge_carts(f's:{token}', key)
+    _remember_count(key)
+    db.session.commit()
+
+
+@user_loaded_from_cookie.connect
+def _count_remembered_cart(app, user):
+    _remember_count(f'u:{user.id}')
+
+
+@user_logged_out.connect
+def _forget_cart(app, user):
+    session.pop('cart_count', None)
+    session.pop('cart_id', None)
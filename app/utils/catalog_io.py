@@ -0,0 +1,259 @@
+import csv
+import io
+import json
+from datetime import date
+from app import db
+from app.utils.constants import PRODUCT_UNITS
+from app.utils.validators import validate_price
+
+# ─── Catalog Import / Export ──────────────────────────────────────────────────
+#
+# Farmers upload their catalog as CSV or JSON Lines. Rows are parsed as a
+# stream, validated one by one and applied in batches of IMPORT_BATCH_SIZE,
+# each a single flush (executemany INSERT/UPDATE) and commit, so a bad row
+# only costs its own line in the report. A row updates the farmer's product
+# with the same id, else with the same name, else creates a new product.
+# Export streams the same columns back through a generator.
+
+FIELDS = ('id', 'name', 'category', 'description', 'price', 'unit', 'stock_quantity',
+          'min_order_quantity', 'is_organic', 'is_available', 'location', 'harvest_date')
+REQUIRED_FOR_NEW = {'name': 'name', 'category_id': 'category', 'price': 'price'}
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+
+_TRUE = {'1', 'true', 'yes', 'y', 'oo'}
+_FALSE = {'0', 'false', 'no', 'n', 'hindi'}
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []  # (line, message), first MAX_REPORTED_ERRORS only
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+# ─── Parsing ──────────────────────────────────────────────────────────────────
+
+def read_rows(stream, fmt):
+    """Yield (line number, raw dict, error) from an uploaded CSV or JSON Lines byte stream.
+
+    A line that isn't a JSON object comes back as (line, None, message). A file
+    that stops decoding (not UTF-8) or parsing (broken CSV quoting) yields one
+    last error for the line it got to, since nothing after it can be trusted.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    line_no = 0
+    try:
+        if fmt == 'jsonl':
+            for line_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                if isinstance(row, dict):
+                    yield line_no, row, None
+                else:
+                    yield line_no, None, 'not a JSON object'
+        else:
+            reader = csv.DictReader(text)
+            for row in reader:
+                line_no = reader.line_num
+                yield line_no, row, None
+    except UnicodeDecodeError:
+        yield line_no + 1, None, 'file is not UTF-8 text; save it as "CSV UTF-8" and upload again'
+    except csv.Error as e:
+        yield line_no + 1, None, f'file could not be read from here on: {e}'
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    word = str(value).strip().lower()
+    if word in _TRUE:
+        return True
+    if word in _FALSE:
+        return False
+    raise ValueError('expected yes/no')
+
+
+def _int(value, minimum):
+    number = int(str(value).strip())
+    if number < minimum:
+        raise ValueError(f'must be at least {minimum}')
+    return number
+
+
+def validate_row(raw, categories):
+    """Turn one raw row into product column values; returns (values, error message)."""
+    values = {}
+    for field in FIELDS:
+        value = raw.get(field)
+        if _blank(value):
+            continue
+        try:
+            if field == 'id':
+                values['id'] = _int(value, 1)
+            elif field == 'name':
+                values['name'] = str(value).strip()[:200]
+            elif field == 'category':
+                key = str(value).strip().lower()
+                if key not in categories:
+                    raise ValueError(f'unknown category "{value}"')
+                values['category_id'] = categories[key]
+            elif field == 'price':
+                if isinstance(value, bool) or not validate_price(value):  # JSON true is not 1.0
+                    raise ValueError('must be a number above 0')
+                values['price'] = round(float(value), 2)
+            elif field == 'unit':
+                unit = str(value).strip().lower()
+                if unit not in PRODUCT_UNITS:
+                    raise ValueError(f'must be one of {", ".join(PRODUCT_UNITS)}')
+                values['unit'] = unit
+            elif field == 'stock_quantity':
+                values['stock_quantity'] = _int(value, 0)
+            elif field == 'min_order_quantity':
+                values['min_order_quantity'] = _int(value, 1)
+            elif field in ('is_organic', 'is_available'):
+                values[field] = _bool(value)
+            elif field == 'harvest_date':
+                values['harvest_date'] = date.fromisoformat(str(value).strip())
+            else:
+                values[field] = str(value).strip()
+        except ValueError as e:
+            return None, f'{field}: {e}'
+    return values, None
+
+
+# ─── Import ───────────────────────────────────────────────────────────────────
+
+def _category_lookup():
+    from app.models.category import Category
+    lookup = {}
+    for cat_id, name, name_tl in db.session.query(Category.id, Category.name, Category.name_tl):
+        lookup[str(cat_id)] = cat_id
+        lookup[name.lower()] = cat_id
+        if name_tl:
+            lookup[name_tl.lower()] = cat_id
+    return lookup
+
+
+def import_catalog(farmer, stream, fmt='csv', batch_size=IMPORT_BATCH_SIZE):
+    """Validate and upsert a farmer's products from an uploaded file."""
+    from app.models.product import Product
+
+    report = ImportReport()
+    categories = _category_lookup()
+    existing = dict(db.session.query(Product.id, Product.name).filter_by(farmer_id=farmer.id))
+    by_name = {name.lower(): pid for pid, name in existing.items()}
+    batch = []  # (line, values, product id or None)
+
+    def apply(batch):
+        ids = [pid for _, _, pid in batch if pid]
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(ids))} if ids else {}
+        created = []
+        for _, values, pid in batch:
+            if pid:
+                product = products[pid]
+                for key, value in values.items():
+                    setattr(product, key, value)
+            else:
+                product = Product(farmer_id=farmer.id, location=region, **values)
+                db.session.add(product)
+                created.append(product)
+        try:
+            db.session.flush()
+            # Read ids before the commit expires every instance.
+            created = [(product.id, product.name) for product in created]
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for line, _, _ in batch:
+                report.error(line, f'not saved: {e.__class__.__name__}')
+            return
+        for pid, name in created:
+            existing[pid] = name
+            by_name[name.lower()] = pid
+        report.created += len(created)
+        report.updated += len(batch) - len(created)
+
+    region = farmer.region
+    new_names = set()
+    for line, raw, message in read_rows(stream, fmt):
+        if message:
+            report.error(line, message)
+            continue
+        values, message = validate_row(raw, categories)
+        if message:
+            report.error(line, message)
+            continue
+        pid = values.pop('id', None)
+        if pid is not None and pid not in existing:
+            report.error(line, f'id: product {pid} is not in your catalog')
+            continue
+        name_key = values.get('name', '').lower()
+        if pid is None and name_key in new_names:
+            report.error(line, f'name: "{values["name"]}" appears twice in the file')
+            continue
+        pid = pid or by_name.get(name_key)
+        if pid is None:
+            missing = [label for column, label in REQUIRED_FOR_NEW.items() if column not in values]
+            if missing:
+                report.error(line, f'{", ".join(missing)} required for a new product')
+                continue
+            new_names.add(name_key)
+        batch.append((line, values, pid))
+        if len(batch) >= batch_size:
+            apply(batch)
+            batch = []
+    if batch:
+        apply(batch)
+    return report
+
+
+# ─── Export ───────────────────────────────────────────────────────────────────
+
+def export_rows(farmer_id, chunk_size=500):
+    """Yield the farmer's catalog as dicts, reading the table in chunks."""
+    from app.models.product import Product
+    from app.models.category import Category
+    columns = (Product.id, Product.name, Category.name, Product.description, Product.price,
+               Product.unit, Product.stock_quantity, Product.min_order_quantity,
+               Product.is_organic, Product.is_available, Product.location, Product.harvest_date)
+    query = db.session.query(*columns).join(Category, Category.id == Product.category_id)\
+                      .filter(Product.farmer_id == farmer_id).order_by(Product.id)\
+                      .execution_options(yield_per=chunk_size)
+    for row in query:
+        record = dict(zip(FIELDS, row))
+        if record['harvest_date']:
+            record['harvest_date'] = record['harvest_date'].isoformat()
+        yield record
+
+
+def export_csv(farmer_id):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writeheader()
+    for record in export_rows(farmer_id):
+        writer.writerow(record)
+        if buffer.tell() > 16 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(farmer_id):
+    for record in export_rows(farmer_id):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
@@ -0,0 +1,346 @@
+import copy
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.pagination import KeysetPage, encode_cursor, decode_cursor
+from app.utils.search_cache import CachedPagination
+
+# ─── Catalog Snapshot ─────────────────────────────────────────────────────────
+#
+# A per-process, read-only copy of every available product (with its category
+# and farmer) that the shop listing, the homepage and related-product lists
+# read instead of the database. Rows are __slots__ objects; each sort order is
+# an array of row positions, precomputed for every (category, organic) slice.
+#
+# Commits that change products, categories, reviews or farmer details bump
+# `catalog.version`. The next reader then builds a fresh snapshot and swaps it
+# in with one assignment while other threads keep reading the old one.
+# Checkouts, cancellations and cart holds only move stock, which neither adds
+# nor reorders rows: those commits re-read the touched products' stock and swap
+# in a copy of the snapshot with just those rows replaced.
+# View counts are written behind the ORM's back (utils/view_counter.py), so
+# "popular" may lag by up to CATALOG_SNAPSHOT_MAX_AGE seconds.
+
+SORTS = ('newest', 'popular', 'price_asc', 'price_desc')
+
+
+class CategoryRow:
+    __slots__ = ('id', 'name', 'name_tl', 'icon', 'description', 'image')
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+
+class FarmerRow:
+    __slots__ = ('id', 'username', 'full_name', 'region')
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+
+class ProductRow:
+    """Just enough of a Product for the product card templates."""
+
+    __slots__ = ('id', 'farmer_id', 'category_id', 'name', 'price', 'unit', 'stock_quantity',
+                 'image', 'image_variants', 'is_organic', 'location', 'views', 'created_at',
+                 'rating_sum', 'rating_count', 'latitude', 'longitude', 'category', 'farmer')
+    is_available = True
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def replace(self, **changes):
+        row = ProductRow(*(getattr(self, name) for name in self.__slots__))
+        for name, value in changes.items():
+            setattr(row, name, value)
+        return row
+
+    @property
+    def is_in_stock(self):
+        return self.stock_quantity > 0
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0
+        return round(self.rating_sum / self.rating_count, 1)
+
+    @property
+    def review_count(self):
+        return self.rating_count or 0
+
+    @property
+    def point(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return self.latitude, self.longitude
+
+
+def _sort_key(sort, value, row_id):
+    """Ascending key for a row: the listing order of product_sort_key with newest id first on ties."""
+    if sort == 'price_asc':
+        return value, -row_id
+    if sort == 'newest':
+        value = value.timestamp() if value else 0
+    return -(value or 0), -row_id
+
+
+def _sort_value(sort, row):
+    return {'newest': row.created_at, 'popular': row.views or 0,
+            'price_asc': row.price, 'price_desc': row.price}[sort]
+
+
+class CatalogSnapshot:
+    def __init__(self, version, products, categories):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.products = tuple(products)
+        self.categories = tuple(categories)
+        self.by_id = {p.id: p for p in self.products}
+        self._orders = {}
+        for sort in SORTS:
+            ranked = sorted(range(len(self.products)), key=lambda i: self._key(sort, i))
+            slices = {}
+            for i in ranked:
+                p = self.products[i]
+                for key in ((None, False), (p.category_id, False)) + \
+                        (((None, True), (p.category_id, True)) if p.is_organic else ()):
+                    slices.setdefault(key, array('i')).append(i)
+            self._orders[sort] = slices
+
+    def with_stock(self, stock):
+        """Copy of the snapshot with new {product id: stock} levels; sort orders are shared."""
+        changed = {pid: qty for pid, qty in stock.items()
+                   if pid in self.by_id and self.by_id[pid].stock_quantity != qty}
+        if not changed:
+            return self
+        patched = copy.copy(self)
+        patched.products = list(self.products)
+        patched.by_id = dict(self.by_id)
+        for product_id, qty in changed.items():
+            i = bisect_left(self.products, product_id, key=lambda p: p.id)  # rows are in id order
+            patched.products[i] = patched.by_id[product_id] = self.products[i].replace(stock_quantity=qty)
+        patched.products = tuple(patched.products)
+        return patched
+
+    def _key(self, sort, i):
+        row = self.products[i]
+        return _sort_key(sort, _sort_value(sort, row), row.id)
+
+    def _order(self, sort, category_id=None, organic=False):
+        sort = sort if sort in SORTS else 'newest'
+        return sort, self._orders[sort].get((category_id or None, bool(organic)), array('i'))
+
+    def top(self, sort, limit, category_id=None, exclude=None):
+        _, order = self._order(sort, category_id)
+        rows = (self.products[i] for i in order)
+        return list(islice((p for p in rows if p.id != exclude), limit))
+
+    def paginate(self, sort, page, per_page, category_id=None, organic=False):
+        """Offset page shaped like the Pagination the listing template expects."""
+        _, order = self._order(sort, category_id, organic)
+        start = (max(page, 1) - 1) * per_page
+        items = [self.products[i] for i in order[start:start + per_page]]
+        return CachedPagination(items, len(order), max(page, 1), per_page)
+
+    def keyset_page(self, sort, cursor, per_page, category_id=None, organic=False):
+        """Cursor page: resumes after the (value, id) in ``cursor`` by bisecting the sort order."""
+        sort, order = self._order(sort, category_id, organic)
+        start = 0
+        position = decode_cursor(cursor, sort, dated=sort == 'newest')
+        if position is not None:
+            start = bisect_right(order, _sort_key(sort, *position), key=lambda i: self._key(sort, i))
+        items = [self.products[i] for i in order[start:start + per_page]]
+        next_cursor = None
+        if start + per_page < len(order):
+            last = items[-1]
+            next_cursor = encode_cursor(sort, _sort_value(sort, last), last.id)
+        return KeysetPage(items, per_page, next_cursor, total=len(order))
+
+    def memory_bytes(self):
+        """Approximate size of the snapshot: rows, their own values and the sort arrays."""
+        size = sys.getsizeof(self.products) + sys.getsizeof(self.by_id)
+        seen = set()
+        for row in self.products + self.categories + tuple(p.farmer for p in self.products if p.farmer):
+            if id(row) in seen:
+                continue
+            seen.add(id(row))
+            size += sys.getsizeof(row)
+            for name in row.__slots__:
+                value = getattr(row, name)
+                if not isinstance(value, (CategoryRow, FarmerRow)):
+                    size += sys.getsizeof(value)
+        for slices in self._orders.values():
+            size += sum(sys.getsizeof(a) for a in slices.values())
+        return size
+
+
+def build_snapshot(version):
+    from app.models.product import Product
+    from app.models.category import Category
+    from app.models.user import User
+
+    categories = {row[0]: CategoryRow(*row) for row in db.session.query(
+        Category.id, Category.name, Category.name_tl, Category.icon, Category.description, Category.image
+    ).order_by(Category.id)}
+    farmers = {row[0]: FarmerRow(*row) for row in db.session.query(
+        User.id, User.username, User.full_name, User.region
+    ).filter(User.role == 'farmer')}
+    products = []
+    for row in db.session.query(
+        Product.id, Product.farmer_id, Product.category_id, Product.name, Product.price, Product.unit,
+        Product.stock_quantity, Product.image, Product.image_variants, Product.is_organic,
+        Product.location, Product.views, Product.created_at, Product.rating_sum, Product.rating_count,
+        Product.latitude, Product.longitude,
+    ).filter(Product.is_available == True).order_by(Product.id).execution_options(yield_per=2000):
+        products.append(ProductRow(*row, categories.get(row.category_id), farmers.get(row.farmer_id)))
+    return CatalogSnapshot(version, products, categories.values())
+
+
+def read_stock(product_ids):
+    """Committed stock of some products, on a connection of its own (callers may be mid-commit)."""
+    from app.models.product import Product
+    with db.engine.connect() as conn:
+        return dict(conn.execute(select(Product.id, Product.stock_quantity)
+                                 .where(Product.id.in_(product_ids))).all())
+
+
+# ─── Process-wide Store ───────────────────────────────────────────────────────
+
+class CatalogStore:
+    def __init__(self):
+        self.version = 0
+        self.max_age = 300
+        self.builds = 0
+        self.restocks = 0
+        self._snapshot = None
+        self._version_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Guards swapping in a snapshot; restocks that land mid-build are
+        # remembered in _pending and replayed onto the new snapshot.
+        self._swap_lock = threading.Lock()
+        self._building = False
+        self._pending = set()
+
+    def bump(self):
+        with self._version_lock:
+            self.version += 1
+
+    def _fresh(self, snapshot):
+        return snapshot is not None and snapshot.version == self.version and \
+            time.monotonic() - snapshot.built_at < self.max_age
+
+    def get(self):
+        """The current snapshot, rebuilding it first if it is stale and nobody else is."""
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            return snapshot
+        # While one thread rebuilds, the rest keep serving the previous snapshot.
+        if not self._build_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if not self._fresh(self._snapshot):
+                version = self.version
+                with self._swap_lock:
+                    self._building = True
+                    self._pending = set()
+                snapshot = None
+                try:
+                    snapshot = build_snapshot(version)
+                finally:
+                    with self._swap_lock:
+                        self._building = False
+                        if snapshot is not None:
+                            if self._pending:
+                                snapshot = snapshot.with_stock(read_stock(self._pending))
+                            self._snapshot = snapshot
+                self.builds += 1
+            return self._snapshot
+        finally:
+            self._build_lock.release()
+
+    def restock(self, product_ids):
+        """Bring some products' stock up to date without rebuilding the snapshot."""
+        with self._swap_lock:
+            if self._building:
+                self._pending.update(product_ids)
+            if self._snapshot is not None:
+                self._snapshot = self._snapshot.with_stock(read_stock(product_ids))
+                self.restocks += 1
+
+    def stats(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {'version': self.version, 'builds': self.builds, 'restocks': self.restocks, 'loaded': False}
+        return {
+            'version': self.version,
+            'snapshot_version': snapshot.version,
+            'builds': self.builds,
+            'restocks': self.restocks,
+            'loaded': True,
+            'age_seconds': round(time.monotonic() - snapshot.built_at, 1),
+            'products': len(snapshot.products),
+            'categories': len(snapshot.categories),
+            'bytes': snapshot.memory_bytes(),
+        }
+
+
+catalog = CatalogStore()
+
+
+def configure(app):
+    catalog.max_age = app.config.get('CATALOG_SNAPSHOT_MAX_AGE', 300)
+
+
+# ─── Invalidation ─────────────────────────────────────────────────────────────
+
+_FARMER_FIELDS = ('username', 'full_name', 'region', 'role')
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_changes(session, flush_context):
+    from app.models.product import Product
+    from app.models.category import Category
+    from app.models.review import Review
+    from app.models.user import User
+
+    if session.info.get('catalog_stale'):
+        return
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Product, Category, Review)) or (isinstance(obj, User) and obj.role == 'farmer'):
+            session.info['catalog_stale'] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, (Product, Category, Review)) and session.is_modified(obj):
+            session.info['catalog_stale'] = True
+            return
+        if isinstance(obj, User):
+            state = db.inspect(obj)
+            if (obj.role == 'farmer' or state.attrs.role.history.has_changes()) and \
+                    any(state.attrs[f].history.has_changes() for f in _FARMER_FIELDS):
+                session.info['catalog_stale'] = True
+                return
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_version(session):
+    restock = session.info.pop('catalog_restock', None)
+    if session.info.pop('catalog_stale', False):
+        catalog.bump()
+    elif restock:
+        catalog.restock(restock)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget(session):
+    session.info.pop('catalog_stale', None)
+    session.info.pop('catalog_restock', None)
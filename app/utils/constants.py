@@ -20,4 +20,23 @@ ORDER_STATUSES = [
 ]
 
 DELIVERY_FEE = 50.00  # base delivery fee in PHP
-FREE_DELIVERY_THRESHOLD = 500.00
\ No newline at end of file
+FREE_DELIVERY_THRESHOLD = 500.00
+
+# Price facet buckets in PHP: (label, min inclusive, max exclusive)
+PRICE_BUCKETS = [
+    ('Under ₱50', 0, 50),
+    ('₱50 – ₱100', 50, 100),
+    ('₱100 – ₱250', 100, 250),
+    ('₱250 – ₱500', 250, 500),
+    ('₱500 & up', 500, None),
+]
+
+IMAGE_TOO_LARGE = 'That photo is too large to use, so it was not saved. Please upload a smaller one.'
+
+# Image derivatives made at upload time: variant -> longest edge in px.
+# Each is written as JPEG and WebP next to the original.
+IMAGE_VARIANTS = {
+    'thumb': 120,
+    'card': 480,
+    'detail': 1200,
+}
@@ -0,0 +1,123 @@
+from collections import Counter
+from sqlalchemy import event, text, bindparam
+from sqlalchemy.orm import Session
+from app import db
+
+# ─── Co-Purchase Index ────────────────────────────────────────────────────────
+#
+# co_purchases counts, for every ordered pair of products, the orders that
+# contained both. New order items bump the pairs they form with the rest of
+# their order inside the same flush, and each touched product gets its top
+# TOP_K partners rewritten into products.related_ids ("12,7,31"), so the
+# detail page reads its "frequently bought together" list with no scan.
+
+TOP_K = 8
+
+_UPSERT_SQL = text(
+    "INSERT INTO co_purchases (product_id, other_id, orders) VALUES (:a, :b, :n) "
+    "ON CONFLICT (product_id, other_id) DO UPDATE SET orders = orders + :n"
+)
+
+_ORDER_PRODUCTS_SQL = text(
+    "SELECT order_id, product_id FROM order_items WHERE order_id IN :orders"
+).bindparams(bindparam('orders', expanding=True))
+
+_TOP_SQL = text("""
+    SELECT product_id, other_id FROM co_purchases
+    WHERE product_id IN :products
+    ORDER BY product_id, orders DESC, other_id
+""").bindparams(bindparam('products', expanding=True))
+
+
+_PARTNERS_SQL = text(
+    "SELECT DISTINCT product_id FROM co_purchases WHERE other_id IN :ids AND product_id NOT IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+
+
+def refresh_related(conn, product_ids):
+    """Rewrite products.related_ids from the pair counts for the given products."""
+    ranked = {pid: [] for pid in product_ids}
+    for product_id, other_id in conn.execute(_TOP_SQL, {'products': list(product_ids)}):
+        if len(ranked[product_id]) < TOP_K:
+            ranked[product_id].append(str(other_id))
+    conn.execute(
+        text("UPDATE products SET related_ids = :ids WHERE id = :id"),
+        [{'id': pid, 'ids': ','.join(ids) or None} for pid, ids in ranked.items()],
+    )
+
+
+def related_ids(product):
+    return [int(i) for i in product.related_ids.split(',')] if product.related_ids else []
+
+
+# ─── Incremental Sync ─────────────────────────────────────────────────────────
+
+def _sync_after_flush(session, flush_context):
+    from app.models.order import OrderItem
+    from app.models.product import Product
+
+    new_items = {}
+    for obj in session.new:
+        if isinstance(obj, OrderItem):
+            new_items.setdefault(obj.order_id, set()).add(obj.product_id)
+    deleted_products = [obj.id for obj in session.deleted if isinstance(obj, Product)]
+    if not new_items and not deleted_products:
+        return
+
+    conn = session.connection()
+    if deleted_products:
+        # Their partners' related lists still name them: re-rank those too.
+        partners = {pid for (pid,) in conn.execute(_PARTNERS_SQL, {'ids': deleted_products})}
+        conn.execute(text(
+            "DELETE FROM co_purchases WHERE product_id IN :ids OR other_id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True)), {'ids': deleted_products})
+        if partners:
+            refresh_related(conn, partners)
+    if not new_items:
+        return
+
+    in_order = {}
+    for order_id, product_id in conn.execute(_ORDER_PRODUCTS_SQL, {'orders': list(new_items)}):
+        in_order.setdefault(order_id, set()).add(product_id)
+
+    pairs = Counter()
+    for order_id, added in new_items.items():
+        everything = in_order.get(order_id, set()) | added
+        earlier = everything - added
+        for a in added:
+            pairs.update((a, b) for b in everything if b != a)
+            pairs.update((b, a) for b in earlier)
+    if pairs:
+        conn.execute(_UPSERT_SQL, [{'a': a, 'b': b, 'n': n} for (a, b), n in pairs.items()])
+        refresh_related(conn, {a for a, _ in pairs})
+
+
+# ─── Maintenance ──────────────────────────────────────────────────────────────
+
+def rebuild_copurchase_index():
+    """Recount every pair from order_items and rewrite all related lists."""
+    conn = db.session.connection()
+    conn.execute(text("DELETE FROM co_purchases"))
+    conn.execute(text("""
+        INSERT INTO co_purchases (product_id, other_id, orders)
+        SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id)
+        FROM order_items a JOIN order_items b
+          ON b.order_id = a.order_id AND b.product_id != a.product_id
+        GROUP BY a.product_id, b.product_id
+    """))
+    conn.execute(text("UPDATE products SET related_ids = NULL"))
+    product_ids = [pid for (pid,) in conn.execute(text("SELECT DISTINCT product_id FROM co_purchases"))]
+    for start in range(0, len(product_ids), 500):
+        refresh_related(conn, product_ids[start:start + 500])
+    db.session.commit()
+    return len(product_ids)
+
+
+def init_copurchase_index():
+    """Build the index on first start if orders exist, and hook up incremental sync."""
+    from app.models.order import OrderItem
+    from app.models.recommendation import CoPurchase
+    if not db.session.query(CoPurchase.product_id).first() and db.session.query(OrderItem.id).first():
+        rebuild_copurchase_index()
+    if not event.contains(Session, 'after_flush', _sync_after_flush):
+        event.listen(Session, 'after_flush', _sync_after_flush)
@@ -0,0 +1,108 @@
+from collections import Counter
+from sqlalchemy import and_, case, func, literal
+from app.models.product import Product
+from app.models.user import User
+from app.utils.constants import PRICE_BUCKETS
+
+# ─── Search Facets ────────────────────────────────────────────────────────────
+#
+# All facet counts come from ONE grouped query over the text-matched set.
+# Each group row carries the facet values plus whether it passes the price
+# and region filters, so every facet can be counted "disjunctively" (with all
+# filters except its own applied) by summing rows in Python. The number of
+# groups is bounded by categories x regions x buckets, not by product count.
+
+
+def price_bucket_expr():
+    """SQL CASE mapping a product price to its PRICE_BUCKETS index."""
+    whens = [
+        (Product.price < upper, idx)
+        for idx, (_, _, upper) in enumerate(PRICE_BUCKETS) if upper is not None
+    ]
+    return case(*whens, else_=len(PRICE_BUCKETS) - 1)
+
+
+def region_filter(region):
+    """Match a region against the product location or the farmer's region."""
+    return Product.location.ilike(f'%{region}%') | Product.farmer.has(User.region == region)
+
+
+def price_filter(min_price=None, max_price=None, price_below=None):
+    """Price clauses: min and max as typed (both inclusive), and a bucket's exclusive upper bound.
+
+    PRICE_BUCKETS are [min, max), so bucket links filter with price_below to
+    count the same products the facet showed.
+    """
+    clauses = []
+    if min_price:
+        clauses.append(Product.price >= min_price)
+    if max_price:
+        clauses.append(Product.price <= max_price)
+    if price_below:
+        clauses.append(Product.price < price_below)
+    return clauses
+
+
+def compute_facets(query, category_id=None, region='', organic=False,
+                   min_price=None, max_price=None, price_below=None):
+    """Count category/region/organic/price facets for a text-matched Product query.
+
+    ``query`` must carry only the availability and text filters; the facet
+    filters are passed separately so each facet can ignore its own filter.
+    """
+    price_clauses = price_filter(min_price, max_price, price_below)
+    price_ok = case((and_(*price_clauses), 1), else_=0) if price_clauses else literal(1)
+    # The farmer row is already joined below, so test its region directly
+    # instead of through the correlated EXISTS used by region_filter().
+    region_match = Product.location.ilike(f'%{region}%') | (User.region == region)
+    region_ok = case((region_match, 1), else_=0) if region else literal(1)
+
+    dimensions = [Product.category_id, User.region, Product.is_organic, price_bucket_expr()]
+    if price_clauses:
+        dimensions.append(price_ok)
+    if region:
+        dimensions.append(region_ok)
+
+    rows = (
+        query.order_by(None)
+        .outerjoin(User, User.id == Product.farmer_id)
+        .with_entities(
+            Product.category_id,
+            User.region,
+            Product.is_organic,
+            price_bucket_expr(),
+            price_ok,
+            region_ok,
+            func.count(Product.id),
+        )
+        .group_by(*dimensions)
+        .all()
+    )
+
+    categories, regions, organic_counts, buckets = Counter(), Counter(), Counter(), Counter()
+    total = 0
+    for cat, reg, is_organic, bucket, p_ok, r_ok, count in rows:
+        cat_ok = not category_id or cat == category_id
+        org_ok = not organic or bool(is_organic)
+        if p_ok and r_ok and org_ok:
+            categories[cat] += count
+        if cat_ok and p_ok and org_ok and reg:
+            regions[reg] += count
+        if cat_ok and p_ok and r_ok:
+            organic_counts['organic' if is_organic else 'conventional'] += count
+        if cat_ok and r_ok and org_ok:
+            buckets[bucket] += count
+        if cat_ok and p_ok and r_ok and org_ok:
+            total += count
+
+    return {
+        'total': total,
+        'categories': dict(categories),
+        'regions': dict(sorted(regions.items(), key=lambda kv: -kv[1])),
+        'organic': {'organic': organic_counts['organic'],
+                    'conventional': organic_counts['conventional']},
+        'price_buckets': [
+            {'label': label, 'min': lower, 'max': upper, 'count': buckets[idx]}
+            for idx, (label, lower, upper) in enumerate(PRICE_BUCKETS)
+        ],
+    }
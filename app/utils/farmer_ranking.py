@@ -0,0 +1,221 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, case, insert, bindparam, text
+from sqlalchemy.orm import Session
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# ─── Farmer Ranking ───────────────────────────────────────────────────────────
+#
+# farmer_rankings holds one scored row per active farmer, so "top farmers" and
+# the farmer directory are a single read of the score index. The score blends
+#
+#   rating      average rating shrunk toward RATING_PRIOR_MEAN (few reviews
+#               can't outrank many)
+#   delivered   delivered orders, log-scaled up to DELIVERED_SATURATION
+#   sales       sales of the last SALES_WINDOW_DAYS, log-scaled
+#   stock       share of the farmer's products that can be bought now
+#
+# Commits that touch these inputs mark their farmers dirty; a background
+# thread re-scores dirty farmers every FARMER_RANKING_INTERVAL seconds and
+# everyone every FARMER_RANKING_FULL_INTERVAL seconds, which also ages the
+# sales window. `flask refresh-farmer-rankings` does a full refresh by hand.
+
+WEIGHTS = {'rating': 0.4, 'delivered': 0.25, 'sales': 0.25, 'stock': 0.1}
+RATING_PRIOR_MEAN = 3.5
+RATING_PRIOR_COUNT = 5
+DELIVERED_SATURATION = 100
+SALES_SATURATION = 50000  # PHP
+SALES_WINDOW_DAYS = 30
+
+
+def _scaled(value, saturation):
+    return min(1.0, math.log1p(max(value, 0)) / math.log1p(saturation))
+
+
+def score(rating_sum, rating_count, delivered, sales, available, total):
+    """Return (score, shrunk rating) for one farmer's figures."""
+    rating = (rating_sum + RATING_PRIOR_MEAN * RATING_PRIOR_COUNT) / (rating_count + RATING_PRIOR_COUNT)
+    value = (WEIGHTS['rating'] * rating / 5
+             + WEIGHTS['delivered'] * _scaled(delivered, DELIVERED_SATURATION)
+             + WEIGHTS['sales'] * _scaled(sales, SALES_SATURATION)
+             + WEIGHTS['stock'] * (available / total if total else 0))
+    return round(value, 6), round(rating, 2)
+
+
+def refresh_rankings(farmer_ids=None):
+    """Recompute ranking rows for the given farmers (all when None); returns rows written."""
+    from app.models.user import User
+    from app.models.product import Product
+    from app.models.order import Order, OrderItem
+    from app.models.ranking import FarmerRanking
+
+    def scoped(query, column):
+        return query.filter(column.in_(farmer_ids)) if farmer_ids is not None else query
+
+    farmers = scoped(
+        db.session.query(User.id, User.rating_sum, User.rating_count)
+        .filter(User.role == 'farmer', User.is_active == True), User.id
+    ).all()
+    stock = dict((fid, (total, available)) for fid, total, available in scoped(
+        db.session.query(
+            Product.farmer_id, func.count(Product.id),
+            func.sum(case(((Product.is_available == True) & (Product.stock_quantity > 0), 1), else_=0)),
+        ), Product.farmer_id
+    ).group_by(Product.farmer_id))
+    sold = db.session.query(Product.farmer_id).select_from(OrderItem)\
+                     .join(Product, Product.id == OrderItem.product_id)\
+                     .join(Order, Order.id == OrderItem.order_id)
+    delivered = dict(scoped(
+        sold.add_columns(func.count(func.distinct(OrderItem.order_id)))
+            .filter(Order.status == 'delivered'), Product.farmer_id
+    ).group_by(Product.farmer_id).all())
+    since = datetime.utcnow() - timedelta(days=SALES_WINDOW_DAYS)
+    sales = dict(scoped(
+        sold.add_columns(func.sum(OrderItem.quantity * OrderItem.unit_price))
+            .filter(Order.created_at >= since, Order.status.notin_(('cancelled', 'refunded'))),
+        Product.farmer_id
+    ).group_by(Product.farmer_id).all())
+
+    now = datetime.utcnow()
+    rows = []
+    for fid, rating_sum, rating_count in farmers:
+        total, available = stock.get(fid, (0, 0))
+        value, rating = score(rating_sum or 0, rating_count or 0, delivered.get(fid, 0),
+                              sales.get(fid) or 0, available or 0, total)
+        rows.append({'farmer_id': fid, 'score': value, 'rating': rating,
+                     'delivered_orders': delivered.get(fid, 0), 'recent_sales': sales.get(fid) or 0,
+                     'available_products': available or 0, 'total_products': total,
+                     'refreshed_at': now})
+
+    scoped(db.session.query(FarmerRanking), FarmerRanking.farmer_id).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(insert(FarmerRanking), rows)
+    db.session.commit()
+    return len(rows)
+
+
+# ─── Background Refresher ─────────────────────────────────────────────────────
+
+class FarmerRanker:
+    def __init__(self):
+        self.app = None
+        self.interval = 60
+        self.full_interval = 3600
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_full = time.monotonic()
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('FARMER_RANKING_INTERVAL', 60)
+        self.full_interval = app.config.get('FARMER_RANKING_FULL_INTERVAL', 3600)
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='farmer-ranker', daemon=True)
+            self._thread.start()
+
+    def mark(self, farmer_ids):
+        with self._lock:
+            self._dirty.update(farmer_ids)
+
+    def refresh(self, full=False):
+        """Re-score dirty farmers, or everyone when ``full``; returns rows written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not full and not dirty:
+            return 0
+        try:
+            with self.app.app_context():
+                return refresh_rankings(None if full else sorted(dirty))
+        except Exception:
+            logger.exception('Refreshing farmer rankings failed; will retry')
+            self.mark(dirty)
+            return 0
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            full = time.monotonic() - self._last_full >= self.full_interval
+            if full:
+                self._last_full = time.monotonic()
+            self.refresh(full=full)
+
+
+farmer_ranker = FarmerRanker()
+
+
+def init_farmer_rankings():
+    """Fill the table on first start when there are farmers to rank."""
+    from app.models.ranking import FarmerRanking
+    from app.models.user import User
+    if not db.session.query(FarmerRanking.farmer_id).first() and \
+            db.session.query(User.id).filter_by(role='farmer').first():
+        refresh_rankings()
+
+
+# ─── Dirty Tracking ───────────────────────────────────────────────────────────
+
+_PRODUCT_FIELDS = ('stock_quantity', 'is_available', 'farmer_id')
+
+_FARMERS_OF_PRODUCTS = text(
+    "SELECT DISTINCT farmer_id FROM products WHERE id IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+
+_FARMERS_OF_ORDERS = text(
+    "SELECT DISTINCT p.farmer_id FROM order_items oi JOIN products p ON p.id = oi.product_id "
+    "WHERE oi.order_id IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_dirty_farmers(session, flush_context):
+    from app.models.user import User
+    from app.models.product import Product
+    from app.models.review import Review
+    from app.models.order import Order, OrderItem
+
+    farmers, product_ids, order_ids = set(), set(), set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Product):
+            farmers.add(obj.farmer_id)
+        elif isinstance(obj, (Review, OrderItem)):
+            product_ids.add(obj.product_id)
+        elif isinstance(obj, User) and obj.role == 'farmer':
+            farmers.add(obj.id)
+    for obj in session.dirty:
+        state = db.inspect(obj)
+        if isinstance(obj, Product) and any(state.attrs[f].history.has_changes() for f in _PRODUCT_FIELDS):
+            farmers.add(obj.farmer_id)
+        elif isinstance(obj, Review) and state.attrs.rating.history.has_changes():
+            product_ids.add(obj.product_id)
+        elif isinstance(obj, Order) and state.attrs.status.history.has_changes():
+            order_ids.add(obj.id)
+        elif isinstance(obj, User) and \
+                (state.attrs.is_active.history.has_changes() or state.attrs.role.history.has_changes()):
+            farmers.add(obj.id)
+
+    conn = session.connection() if product_ids or order_ids else None
+    if product_ids:
+        farmers.update(fid for (fid,) in conn.execute(_FARMERS_OF_PRODUCTS, {'ids': list(product_ids)}))
+    if order_ids:
+        farmers.update(fid for (fid,) in conn.execute(_FARMERS_OF_ORDERS, {'ids': list(order_ids)}))
+    farmers.discard(None)
+    if farmers:
+        session.info.setdefault('ranking_dirty', set()).update(farmers)
+
+
+@event.listens_for(Session, 'after_commit')
+def _mark_dirty_farmers(session):
+    farmers = session.info.pop('ranking_dirty', None)
+    if farmers:
+        farmer_ranker.mark(farmers)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_dirty_farmers(session):
+    session.info.pop('ranking_dirty', None)
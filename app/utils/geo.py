@@ -0,0 +1,221 @@
+import csv
+import math
+import os
+import unicodedata
+from functools import lru_cache
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models.geo import GRID_DEGREES
+
+# ─── Geo Search ───────────────────────────────────────────────────────────────
+#
+# Farmers and products carry a latitude/longitude taken from an offline table
+# of PH regions, provinces and towns (app/data/ph_places.csv), so no request
+# ever calls out to a geocoding service. Each point is also filed under a
+# GRID_DEGREES grid cell. A radius query first narrows to the cells covering
+# the circle's bounding box (an index seek per grid row) and only then
+# checks the distance, in plain arithmetic SQL that works on any backend.
+
+PLACES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'ph_places.csv')
+KM_PER_DEGREE = 111.32
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 200
+RADIUS_CHOICES = (5, 10, 25, 50, 100)
+
+
+# ─── Place Lookup ─────────────────────────────────────────────────────────────
+
+def _key(text):
+    """Lower-case, accent-free, single-spaced form of a place name."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.lower().replace('.', ' ').replace('-', ' ').split())
+
+
+@lru_cache(maxsize=1)
+def _places():
+    """Map every place name and alias to its candidate (lat, lng, province, region) rows."""
+    index = {}
+    with open(PLACES_FILE, encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            place = (float(row['lat']), float(row['lng']), _key(row['province']), _key(row['region']))
+            names = [row['name']] + [a for a in row['aliases'].split('|') if a]
+            for name in names:
+                index.setdefault(_key(name), []).append(place)
+    return index
+
+
+def _candidates(part):
+    index = _places()
+    for key in (part, part[:-5] if part.endswith(' city') else None,
+                part[8:] if part.startswith('city of ') else None):
+        if key and key in index:
+            return index[key]
+    # Free-form text ("Brgy. 5, La Trinidad Benguet"): longest known run of words.
+    words = part.split()
+    for size in range(min(len(words), 4), 0, -1):
+        for start in range(len(words) - size + 1):
+            key = ' '.join(words[start:start + size])
+            if key in index:
+                return index[key]
+    return None
+
+
+@lru_cache(maxsize=4096)
+def geocode(text):
+    """(lat, lng) for a free-text PH location, or None if no known place is named.
+
+    Comma-separated parts are tried from the most specific (first) one, and a
+    town name shared by several provinces is settled by the other parts.
+    """
+    if not text:
+        return None
+    parts = [_key(p) for p in str(text).split(',')]
+    parts = [p for p in parts if p]
+    for i, part in enumerate(parts):
+        found = _candidates(part)
+        if not found:
+            continue
+        if len(found) > 1:
+            context = parts[:i] + parts[i + 1:]
+            found = [p for p in found if p[2] in context or p[3] in context] or found[:1]
+        return found[0][:2]
+    return None
+
+
+def parse_origin(value):
+    """Read a search origin given as "lat,lng" (from the browser) or a place name."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        lat, lng = (float(v) for v in value.split(','))
+    except ValueError:
+        return geocode(value)
+    if -90 <= lat <= 90 and -180 <= lng <= 180:
+        return lat, lng
+    return None
+
+
+def distance_km(origin, point):
+    """Great-circle distance between two (lat, lng) points."""
+    if origin is None or point is None:
+        return None
+    lat1, lng1, lat2, lng2 = map(math.radians, (*origin, *point))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+# ─── Radius Queries ───────────────────────────────────────────────────────────
+
+def _squared_distance(model, origin):
+    """Squared equirectangular distance in km² as a SQL expression (fine below a few hundred km)."""
+    lat0, lng0 = origin
+    scale = math.cos(math.radians(lat0))
+    dy = (model.latitude - lat0) * KM_PER_DEGREE
+    dx = (model.longitude - lng0) * (KM_PER_DEGREE * scale)
+    return dy * dy + dx * dx
+
+
+def clamp_radius(radius_km):
+    """A usable radius: missing or non-finite values fall back to the default."""
+    if radius_km is None or not math.isfinite(radius_km):
+        return DEFAULT_RADIUS_KM
+    return min(max(radius_km, 1), MAX_RADIUS_KM)
+
+
+def within(query, model, origin, radius_km):
+    """Restrict a query to rows of ``model`` within ``radius_km`` of ``origin``."""
+    lat0, lng0 = origin
+    radius_km = clamp_radius(radius_km)
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat0)), 0.01))
+    rows = range(math.floor((lat0 - dlat) / GRID_DEGREES), math.floor((lat0 + dlat) / GRID_DEGREES) + 1)
+    return query.filter(
+        model.grid_lat.in_(list(rows)),
+        model.grid_lng.between(math.floor((lng0 - dlng) / GRID_DEGREES),
+                               math.floor((lng0 + dlng) / GRID_DEGREES)),
+        _squared_distance(model, origin) <= radius_km * radius_km,
+    )
+
+
+def nearest_first(model, origin):
+    """ORDER BY expression putting the rows closest to ``origin`` first."""
+    return _squared_distance(model, origin).asc()
+
+
+# ─── Keeping Points Current ───────────────────────────────────────────────────
+#
+# A product is placed by its own location text, else at its farmer's point;
+# a user by their address, else their region. When a farmer moves, products
+# still sitting on the farmer's old point move along.
+
+def _changed(obj, *fields):
+    state = db.inspect(obj)
+    return state.transient or state.pending or \
+        any(state.attrs[f].history.has_changes() for f in fields)
+
+
+def locate_product(product):
+    point = geocode(product.location)
+    if point is None and product.farmer is not None:
+        point = product.farmer.point
+    product.set_point(point)
+
+
+def locate_user(user):
+    user.set_point(geocode(user.address) or geocode(user.region))
+
+
+def _locate_before_flush(session, flush_context, instances):
+    from app.models.product import Product
+    from app.models.user import User
+
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, User) and _changed(obj, 'address', 'region'):
+                old = obj.point
+                locate_user(obj)
+                if obj.id is not None and obj.role == 'farmer' and obj.point != old:
+                    old_lat, old_lng = old or (None, None)
+                    for product in session.query(Product).filter(Product.farmer_id == obj.id,
+                                                                 Product.latitude == old_lat,
+                                                                 Product.longitude == old_lng):
+                        if geocode(product.location) is None:
+                            product.set_point(obj.point)
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Product) and _changed(obj, 'location', 'farmer_id'):
+                locate_product(obj)
+
+
+def locate_missing(everything=False, chunk_size=500):
+    """Fill in points for users and products that have none (or all rows); returns (users, products)."""
+    from app.models.product import Product
+    from app.models.user import User
+
+    counts = []
+    for model, locate in ((User, locate_user), (Product, locate_product)):
+        query = model.query.order_by(model.id)
+        if not everything:
+            query = query.filter(model.latitude.is_(None))
+        placed, last_id = 0, 0
+        while True:
+            batch = query.filter(model.id > last_id).limit(chunk_size).all()
+            if not batch:
+                break
+            for obj in batch:
+                locate(obj)
+                placed += obj.latitude is not None
+            last_id = batch[-1].id
+            db.session.commit()
+        counts.append(placed)
+    return tuple(counts)
+
+
+def init_geo_index():
+    """Hook up point tracking. Rows written before it existed are placed by `flask geocode-locations`."""
+    if not event.contains(Session, 'before_flush', _locate_before_flush):
+        event.listen(Session, 'before_flush', _locate_before_flush)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import uuid
 from flask import current_app
@@ -9,12 +10,23 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 def save_image(file, subfolder='products'):
+    """Store an upload under the SHA-256 of its content; identical files are kept once."""
     if file and allowed_file(file.filename):
         ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4().hex}.{ext}"
         upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
         os.makedirs(upload_path, exist_ok=True)
-        file.save(os.path.join(upload_path, filename))
+        tmp_path = os.path.join(upload_path, f".{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        with open(tmp_path, 'wb') as out:
+            for chunk in iter(lambda: file.stream.read(64 * 1024), b''):
+                digest.update(chunk)
+                out.write(chunk)
+        filename = f"{digest.hexdigest()}.{ext}"
+        target = os.path.join(upload_path, filename)
+        if os.path.exists(target):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, target)
         return f"{subfolder}/{filename}"
     return None
 
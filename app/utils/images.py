@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+from functools import lru_cache
+from flask import current_app, url_for
+from app.utils.constants import IMAGE_VARIANTS
+
+logger = logging.getLogger(__name__)
+
+# ─── Image Derivatives ────────────────────────────────────────────────────────
+#
+# Uploads are kept as-is, and each IMAGE_VARIANTS size is written beside the
+# original as `<name>.<variant>.jpg` and `<name>.<variant>.webp`. The widths
+# actually produced are stored as JSON on the owning row (image_variants), so
+# templates only emit a srcset for images that have one. Pillow is optional:
+# without it uploads are stored unchanged and pages fall back to the original.
+# Images over MAX_IMAGE_PIXELS are refused before decoding (ImageTooLarge): a
+# small file can claim enormous dimensions and exhaust memory when resized.
+
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 78, 'method': 4}),
+}
+
+
+class ImageTooLarge(Exception):
+    """Raised by make_variants() for images with more pixels than MAX_IMAGE_PIXELS."""
+
+    def __init__(self, path, pixels=None):
+        super().__init__(f'{path} is too large to process' + (f' ({pixels} pixels)' if pixels else ''))
+        self.path = path
+
+
+def variant_path(path, variant, fmt='jpg'):
+    """Relative path of one derivative, e.g. products/ab12.card.webp."""
+    base = path.rsplit('.', 1)[0]
+    return f'{base}.{variant}.{fmt}'
+
+
+def make_variants(path):
+    """Write every derivative of an uploaded image; returns the JSON to store, or None.
+
+    Raises ImageTooLarge instead of decoding an image over MAX_IMAGE_PIXELS.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        logger.warning('Pillow is not installed; skipping image derivatives for %s', path)
+        return None
+
+    root = current_app.config['UPLOAD_FOLDER']
+    max_pixels = current_app.config.get('MAX_IMAGE_PIXELS', 40_000_000)
+    try:
+        with Image.open(os.path.join(root, path)) as original:
+            # open() only reads the header, so this costs nothing for a bomb
+            if original.width * original.height > max_pixels:
+                raise ImageTooLarge(path, original.width * original.height)
+            image = ImageOps.exif_transpose(original)
+            if image.mode != 'RGB':
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.convert('RGBA').getchannel('A'))
+                image = background
+            widths = {}
+            for variant, edge in IMAGE_VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((edge, edge), Image.LANCZOS)
+                for fmt, (format_name, options) in FORMATS.items():
+                    target = os.path.join(root, variant_path(path, variant, fmt))
+                    if not os.path.exists(target):  # content-addressed: already made
+                        resized.save(target, format_name, **options)
+                widths[variant] = resized.width
+    except Image.DecompressionBombError:  # past Pillow's own limit, refused by open()
+        raise ImageTooLarge(path) from None
+    except (OSError, ValueError):
+        logger.exception('Could not generate derivatives for %s', path)
+        return None
+    return json.dumps(widths)
+
+
+# ─── Template Helpers ─────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=4096)
+def _parse(variants):
+    try:
+        return tuple(sorted(json.loads(variants).items(), key=lambda kv: kv[1]))
+    except (TypeError, ValueError):
+        return ()
+
+
+def _url(path):
+    return url_for('media.serve', filename=path)
+
+
+def image_url(path, variants=None, variant=None, fmt='jpg'):
+    """URL of a derivative when it exists, otherwise of the original upload."""
+    if variant and variant in dict(_parse(variants)):
+        return _url(variant_path(path, variant, fmt))
+    return _url(path)
+
+
+def image_srcset(path, variants=None, fmt='jpg'):
+    """`url 120w, url 480w, ...` over the stored derivatives; empty if there are none."""
+    # Small originals yield several variants of the same width; list each once.
+    by_width = {}
+    for variant, width in _parse(variants):
+        by_width.setdefault(width, variant)
+    return ', '.join(f'{_url(variant_path(path, variant, fmt))} {width}w'
+                     for width, variant in by_width.items())
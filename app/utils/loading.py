@@ -0,0 +1,49 @@
+from functools import lru_cache
+from sqlalchemy.orm import joinedload, selectinload
+
+# ─── Eager-Loading Profiles ───────────────────────────────────────────────────
+#
+# Named sets of loader options, one per kind of page, matching what its
+# templates touch. Applying a profile keeps the query count of a page fixed no
+# matter how many rows it renders:
+#
+#   product_card    _card.html: category and farmer (ratings are columns)
+#   product_detail  card + reviews with their reviewers
+#   cart_product    cart.html: product farmer
+#   order_items     order pages: items and their products
+#   farmer_order    farmer order lists: buyer (the farmer's own lines load separately)
+#   conversation    inbox: both participants
+
+
+@lru_cache(maxsize=None)
+def _profiles():
+    from app.models.product import Product
+    from app.models.review import Review
+    from app.models.order import Order, OrderItem
+    from app.models.message import Conversation
+
+    product_card = (
+        joinedload(Product.category),
+        joinedload(Product.farmer),
+    )
+    order_items = (
+        selectinload(Order.items).joinedload(OrderItem.product),
+    )
+    return {
+        'product_card': product_card,
+        'product_detail': product_card + (
+            selectinload(Product.reviews).joinedload(Review.reviewer),
+        ),
+        'cart_product': (joinedload(Product.farmer),),
+        'order_items': order_items,
+        'farmer_order': (joinedload(Order.buyer),),
+        'conversation': (
+            joinedload(Conversation.buyer),
+            joinedload(Conversation.farmer),
+        ),
+    }
+
+
+def loading_profile(name):
+    """Loader options for a named profile, for use as ``query.options(*loading_profile(name))``."""
+    return _profiles()[name]
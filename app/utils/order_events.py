@@ -0,0 +1,81 @@
+import logging
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from app import db, socketio
+
+logger = logging.getLogger(__name__)
+
+# ─── Live Order Events ────────────────────────────────────────────────────────
+#
+# Every logged-in Socket.IO client joins its user's room (user_<id>). Order
+# changes are pushed there instead of buyers reloading the order page:
+#
+#   order_updated   {order_id, status, payment_status} to the buyer and the
+#                   farmers with lines in the order
+#   new_order       {order_id, items, amount} to each farmer in a new order,
+#                   counting only that farmer's lines
+#
+# Events are collected while the transaction runs (status and payment changes
+# made through the ORM by the flush hook, bulk UPDATEs by calling
+# order_changed()) and emitted after commit, so nobody hears about a change
+# that was rolled back.
+
+_ORDER_SQL = text("SELECT buyer_id, status, payment_status FROM orders WHERE id = :id")
+_FARMERS_SQL = text(
+    "SELECT DISTINCT farmer_id FROM order_items WHERE order_id = :id AND farmer_id IS NOT NULL"
+)
+
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+
+def order_changed(order_id, session=None):
+    """Queue an order_updated event with the order's current state, sent when the transaction commits."""
+    session = session or db.session
+    conn = session.connection()
+    order = conn.execute(_ORDER_SQL, {'id': order_id}).first()
+    if order is None:
+        return
+    farmers = [farmer_id for (farmer_id,) in conn.execute(_FARMERS_SQL, {'id': order_id})]
+    session.info.setdefault('order_events', {})[('order_updated', order_id)] = (
+        [order.buyer_id] + farmers,
+        {'order_id': order_id, 'status': order.status, 'payment_status': order.payment_status},
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_events(session, flush_context):
+    from app.models.order import Order, OrderItem
+
+    for obj in session.new:
+        if isinstance(obj, OrderItem) and obj.farmer_id is not None:
+            _, payload = session.info.setdefault('order_events', {}).setdefault(
+                ('new_order', obj.order_id, obj.farmer_id),
+                ([obj.farmer_id], {'order_id': obj.order_id, 'items': 0, 'amount': 0.0}),
+            )
+            payload['items'] += 1
+            payload['amount'] = round(payload['amount'] + obj.quantity * obj.unit_price, 2)
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = db.inspect(obj)
+            if state.attrs.status.history.has_changes() or state.attrs.payment_status.history.has_changes():
+                order_changed(obj.id, session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _emit_events(session):
+    events = session.info.pop('order_events', None)
+    if not events:
+        return
+    for (name, *_), (user_ids, payload) in events.items():
+        for user_id in set(user_ids):
+            try:
+                socketio.emit(name, payload, to=user_room(user_id))
+            except Exception:
+                logger.exception('Could not push %s for order %s', name, payload['order_id'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_events(session):
+    session.info.pop('order_events', None)
@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from app import db
+
+# ─── Order History Export ─────────────────────────────────────────────────────
+#
+# Buyers and farmers download their order history, one row per order line,
+# as CSV or JSON Lines. Rows are produced by a generator and streamed out as
+# they are read, EXPORT_CHUNK_ORDERS orders at a time: each chunk is a keyset
+# query on the order id followed by one query for those orders' lines, and the
+# read transaction ends between chunks, so a long download neither grows in
+# memory nor holds SQLite's lock against writers while the client reads.
+
+BUYER_FIELDS = ('order_id', 'placed_at', 'status', 'payment_method', 'payment_status', 'farmer',
+                'product_id', 'product', 'quantity', 'unit_price', 'subtotal', 'delivery_fee', 'order_total')
+FARMER_FIELDS = ('order_id', 'placed_at', 'status', 'payment_method', 'payment_status', 'buyer',
+                 'shipping_address', 'product_id', 'product', 'quantity', 'unit_price', 'subtotal')
+EXPORT_CHUNK_ORDERS = 500
+
+
+def _order_ids(user_id, as_farmer, after, limit):
+    from app.models.order import Order, OrderItem
+    if as_farmer:
+        query = db.session.query(OrderItem.order_id).filter(OrderItem.farmer_id == user_id)\
+                          .filter(OrderItem.order_id > after).distinct().order_by(OrderItem.order_id)
+    else:
+        query = db.session.query(Order.id).filter(Order.buyer_id == user_id, Order.id > after)\
+                          .order_by(Order.id)
+    return [oid for (oid,) in query.limit(limit)]
+
+
+def _lines(user_id, as_farmer, order_ids):
+    from app.models.order import Order, OrderItem
+    from app.models.product import Product
+    from app.models.user import User
+    other = aliased(User)
+    name = func.coalesce(other.full_name, other.username)
+    columns = [Order.id, Order.created_at, Order.status, Order.payment_method, Order.payment_status, name]
+    if as_farmer:
+        columns.append(Order.shipping_address)
+    columns += [OrderItem.product_id, Product.name, OrderItem.quantity, OrderItem.unit_price]
+    query = db.session.query(*columns).select_from(OrderItem)\
+                      .join(Order, Order.id == OrderItem.order_id)\
+                      .outerjoin(Product, Product.id == OrderItem.product_id)\
+                      .outerjoin(other, other.id == (Order.buyer_id if as_farmer else OrderItem.farmer_id))\
+                      .filter(OrderItem.order_id.in_(order_ids))
+    if as_farmer:
+        query = query.filter(OrderItem.farmer_id == user_id)
+    else:
+        query = query.add_columns(Order.delivery_fee, Order.total_amount)
+    return query.order_by(OrderItem.order_id, OrderItem.id).all()
+
+
+def export_rows(user_id, as_farmer=False, chunk_orders=EXPORT_CHUNK_ORDERS):
+    """Yield a buyer's (or a farmer's) order lines as dicts, oldest order first."""
+    fields = FARMER_FIELDS if as_farmer else BUYER_FIELDS
+    selected = [f for f in fields if f != 'subtotal']
+    after = 0
+    while True:
+        order_ids = _order_ids(user_id, as_farmer, after, chunk_orders)
+        if not order_ids:
+            return
+        rows = _lines(user_id, as_farmer, order_ids)
+        db.session.rollback()  # read-only: just end the transaction before handing rows out
+        for row in rows:
+            values = dict(zip(selected, row))
+            values['placed_at'] = values['placed_at'].isoformat(sep=' ', timespec='seconds')
+            values['subtotal'] = round(values['quantity'] * values['unit_price'], 2)
+            yield {f: values[f] for f in fields}
+        after = order_ids[-1]
+
+
+def export_csv(user_id, as_farmer=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FARMER_FIELDS if as_farmer else BUYER_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()  # the header goes out before the first query
+    buffer.seek(0)
+    buffer.truncate()
+    for record in export_rows(user_id, as_farmer):
+        writer.writerow(record)
+        if buffer.tell() > 16 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_jsonl(user_id, as_farmer=False):
+    for record in export_rows(user_id, as_farmer):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
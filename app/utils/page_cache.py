@@ -0,0 +1,119 @@
+import time
+from functools import wraps
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.cache import LRUCache
+
+# ─── Anonymous Full-Page Cache ────────────────────────────────────────────────
+#
+# Public pages look the same to every logged-out visitor in a given language,
+# so their rendered HTML is kept per (path, query string, lang) for a
+# per-route TTL. Logged-in users always get a fresh render because the navbar
+# carries their cart and unread-message badges. A commit that changes
+# products, categories, reviews or what the public sees of a farmer drops
+# every cached page. Stock levels and view counts change with every order and
+# page view, so for those the pages just wait out their TTL.
+
+cache = LRUCache()
+
+_FARMER_FIELDS = ('username', 'full_name', 'region', 'bio', 'role', 'is_active', 'is_verified')
+_LAGGING_PRODUCT_FIELDS = ('stock_quantity', 'views', 'updated_at')
+
+
+def configure(app):
+    cache.maxsize = app.config.get('PAGE_CACHE_SIZE', 1024)
+
+
+def _cacheable():
+    return (
+        current_app.config.get('PAGE_CACHE_ENABLED', True)
+        and request.method == 'GET'
+        and not current_user.is_authenticated
+        and '_flashes' not in session
+        and not session.get('cart_count')  # the navbar shows this visitor's cart
+    )
+
+
+def cache_page(ttl, on_hit=None):
+    """Serve a view from the page cache for anonymous GETs.
+
+    ``on_hit`` is called with the view arguments when a cached copy is served,
+    for side effects the view would otherwise perform (e.g. counting a view).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable():
+                return view(*args, **kwargs)
+
+            key = (request.path, request.query_string, session.get('lang', 'en'))
+            entry = cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                if on_hit:
+                    on_hit(*args, **kwargs)
+                response = current_app.response_class(entry[1], status=200, mimetype=entry[2])
+                response.headers['X-Page-Cache'] = 'HIT'
+                return response
+            if entry:
+                cache.pop(key)
+
+            response = make_response(view(*args, **kwargs))
+            # A view that flashed a message rendered something meant for
+            # this visitor only.
+            if response.status_code == 200 and '_flashes' not in session:
+                cache.set(key, (time.monotonic() + ttl, response.get_data(), response.mimetype))
+            response.headers['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _shows_change(session, obj):
+    from app.models.product import Product
+    from app.models.category import Category
+    from app.models.review import Review
+    from app.models.user import User
+
+    if isinstance(obj, (Category, Review)):
+        return session.is_modified(obj)
+    state = db.inspect(obj)
+    if isinstance(obj, Product):
+        return any(attr.history.has_changes() for attr in state.attrs
+                   if attr.key not in _LAGGING_PRODUCT_FIELDS)
+    if isinstance(obj, User):
+        return (obj.role == 'farmer' or state.attrs.role.history.has_changes()) and \
+            any(state.attrs[f].history.has_changes() for f in _FARMER_FIELDS)
+    return False
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_changes(session, flush_context):
+    from app.models.product import Product
+    from app.models.category import Category
+    from app.models.review import Review
+    from app.models.user import User
+
+    if session.info.get('page_cache_stale'):
+        return
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Product, Category, Review)) or (isinstance(obj, User) and obj.role == 'farmer'):
+            session.info['page_cache_stale'] = True
+            return
+    for obj in session.dirty:
+        if _shows_change(session, obj):
+            session.info['page_cache_stale'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate(session):
+    if session.info.pop('page_cache_stale', False):
+        cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget(session):
+    session.info.pop('page_cache_stale', None)
@@ -0,0 +1,192 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from flask import current_app, request, url_for
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+
+# ─── Keyset (Cursor) Pagination ───────────────────────────────────────────────
+#
+# Pages are addressed by the (sort value, id) of the last row shown instead of
+# an OFFSET, so page 500 costs the same as page 1. Cursors are opaque
+# url-safe tokens that also record which sort they belong to.
+
+
+def encode_cursor(sort, value, row_id):
+    if isinstance(value, datetime):
+        value = {'dt': value.isoformat()}
+    raw = json.dumps([sort, value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, sort, dated=False):
+    """Return (value, id) from a cursor token, or None if it is missing/invalid.
+
+    Tokens come back from the client, so anything but a number value (or, for
+    a ``dated`` sort, the ``{'dt': ...}`` form) and an integer id is rejected.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        cursor_sort, value, row_id = json.loads(raw)
+        if dated:
+            value = datetime.fromisoformat(value['dt'])
+        elif not _is_number(value):
+            return None
+        if not isinstance(row_id, int) or isinstance(row_id, bool):
+            return None
+    except (ValueError, TypeError, KeyError):
+        return None
+    if cursor_sort != sort:
+        return None
+    return value, row_id
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query; mirrors the Pagination attributes templates use."""
+
+    is_keyset = True
+
+    def __init__(self, items, per_page, next_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.total = total
+        self.pages = 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def keyset_paginate(query, sort, column, id_column, descending=True, cursor=None,
+                    per_page=12, total=None):
+    """Fetch the page after ``cursor`` ordered by (column, id)."""
+    position = decode_cursor(cursor, sort, dated=column.type.python_type is datetime)
+    if position is not None:
+        value, last_id = position
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, id_column < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, id_column > last_id)))
+
+    if descending:
+        query = query.order_by(None).order_by(column.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(column.asc(), id_column.asc())
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), getattr(last, id_column.key))
+    return KeysetPage(items, per_page, next_cursor, total=total)
+
+
+def product_sort_key(sort):
+    """(column, descending) for a product listing ``sort`` value."""
+    from app.models.product import Product
+    return {
+        'price_asc': (Product.price, False),
+        'price_desc': (Product.price, True),
+        'popular': (Product.views, True),
+    }.get(sort, (Product.created_at, True))
+
+
+def wants_keyset():
+    """Cursor mode is used whenever the request carries a ``cursor`` argument (even empty)."""
+    return 'cursor' in request.args
+
+
+def url_with(**changes):
+    """URL for the current endpoint with some query arguments replaced."""
+    args = request.args.to_dict()
+    args.update(changes)
+    args = {k: v for k, v in args.items() if v is not None}
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+# ─── Cached Totals ────────────────────────────────────────────────────────────
+#
+# "N products found" does not need to be exact to the row, so totals are kept
+# per filter combination for COUNT_CACHE_TTL seconds and recounted lazily on
+# the first request after they expire. A commit that adds or deletes products
+# (a new listing, a catalog import) drops them all at once, so a bulk change
+# is not hidden behind a minute of old totals; a new or deleted order drops
+# just its buyer's and farmers' order totals.
+
+_counts = {}
+_counts_lock = threading.Lock()
+
+
+def cached_count(key, query):
+    ttl = current_app.config.get('COUNT_CACHE_TTL', 60)
+    max_entries = current_app.config.get('COUNT_CACHE_MAX_ENTRIES', 2048)
+    now = time.monotonic()
+    with _counts_lock:
+        hit = _counts.get(key)
+    if hit and now - hit[1] < ttl:
+        return hit[0]
+
+    total = query.order_by(None).count()
+    with _counts_lock:
+        if len(_counts) >= max_entries:
+            oldest = min(_counts, key=lambda k: _counts[k][1])
+            _counts.pop(oldest, None)
+        _counts[key] = (total, now)
+    return total
+
+
+def clear_count_cache():
+    with _counts_lock:
+        _counts.clear()
+
+
+def forget_counts(keys):
+    with _counts_lock:
+        for key in keys:
+            _counts.pop(key, None)
+
+
+@event.listens_for(Session, 'after_flush')
+def _note_new_rows(session, flush_context):
+    from app.models.product import Product
+    from app.models.order import Order, OrderItem
+    stale = session.info.setdefault('stale_counts', set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Product):
+            session.info['count_cache_stale'] = True
+        elif isinstance(obj, Order):
+            stale.add(('orders', obj.buyer_id))
+        elif isinstance(obj, OrderItem):
+            stale.add(('farmer_orders', obj.farmer_id))
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_counts(session):
+    stale = session.info.pop('stale_counts', None)
+    if session.info.pop('count_cache_stale', False):
+        clear_count_cache()
+    elif stale:
+        forget_counts(stale)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_counts(session):
+    session.info.pop('count_cache_stale', None)
+    session.info.pop('stale_counts', None)
+
+
+def paginate(query, page, per_page, count_key):
+    """Offset pagination whose total comes from the count cache instead of a COUNT per view."""
+    pagination = query.paginate(page=page, per_page=per_page, count=False)
+    pagination.total = cached_count(count_key, query)
+    return pagination
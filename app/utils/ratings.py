@@ -0,0 +1,147 @@
+from collections import defaultdict
+from sqlalchemy import event, text, func, case, select, update
+from sqlalchemy.orm import Session
+from app import db
+
+# ─── Rating Aggregates ────────────────────────────────────────────────────────
+#
+# Product and farmer rows carry rating_sum / rating_count and a 1-5 histogram
+# (see RatingStats). Review inserts, edits and deletes are turned into
+# relative UPDATEs issued inside the same flush, so the aggregates commit or
+# roll back together with the review itself.
+
+RATING_FIELDS = ('rating_sum', 'rating_count', 'rating_1', 'rating_2',
+                 'rating_3', 'rating_4', 'rating_5')
+
+
+def _valid(rating):
+    return isinstance(rating, int) and 1 <= rating <= 5
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_review_deltas(session, flush_context, instances):
+    from app.models.review import Review
+    from app.models.product import Product
+
+    # product -> {'sum': int, 'count': int, 1: int, ... 5: int}
+    deltas = session.info.setdefault('rating_deltas', {})
+
+    def bump(product, rating, sign):
+        if product is None or not _valid(rating):
+            return
+        d = deltas.setdefault(product, defaultdict(int))
+        d['sum'] += sign * rating
+        d['count'] += sign
+        d[rating] += sign
+
+    def product_for(review, product_id):
+        if review.product is not None and (product_id is None or review.product.id == product_id):
+            return review.product
+        return session.get(Product, product_id) if product_id else None
+
+    for obj in session.new:
+        if isinstance(obj, Review):
+            bump(product_for(obj, obj.product_id), obj.rating, +1)
+    for obj in session.deleted:
+        if isinstance(obj, Review):
+            bump(product_for(obj, obj.product_id), obj.rating, -1)
+    for obj in session.dirty:
+        if not isinstance(obj, Review):
+            continue
+        state = db.inspect(obj)
+        rating_hist = state.attrs.rating.history
+        product_hist = state.attrs.product_id.history
+        if not (rating_hist.has_changes() or product_hist.has_changes()):
+            continue
+        # The row still holds the pre-edit values; history alone misses them
+        # when the attribute was expired before being reassigned.
+        old_product_id, old_rating = session.execute(
+            select(Review.product_id, Review.rating).where(Review.id == obj.id)
+        ).one()
+        bump(session.get(Product, old_product_id) if old_product_id else None, old_rating, -1)
+        bump(product_for(obj, obj.product_id), obj.rating, +1)
+
+
+def _update_sql(table):
+    return text(
+        f"UPDATE {table} SET rating_sum = rating_sum + :sum, rating_count = rating_count + :count, "
+        "rating_1 = rating_1 + :r1, rating_2 = rating_2 + :r2, rating_3 = rating_3 + :r3, "
+        "rating_4 = rating_4 + :r4, rating_5 = rating_5 + :r5 WHERE id = :id"
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_review_deltas(session, flush_context):
+    deltas = session.info.pop('rating_deltas', None)
+    if not deltas:
+        return
+    per_product, per_farmer = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
+    for product, d in deltas.items():
+        for key, value in d.items():
+            per_product[product.id][key] += value
+            per_farmer[product.farmer_id][key] += value
+
+    conn = session.connection()
+    for table, rows in (('products', per_product), ('users', per_farmer)):
+        params = [
+            {'id': row_id, 'sum': d['sum'], 'count': d['count'],
+             'r1': d[1], 'r2': d[2], 'r3': d[3], 'r4': d[4], 'r5': d[5]}
+            for row_id, d in rows.items() if any(d.values())
+        ]
+        if params:
+            conn.execute(_update_sql(table), params)
+
+    session.info['rating_stale'] = (set(per_product), set(per_farmer))
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_stale_aggregates(session, flush_context):
+    from app.models.product import Product
+    from app.models.user import User
+    stale = session.info.pop('rating_stale', None)
+    if not stale:
+        return
+    product_ids, farmer_ids = stale
+    for model, ids in ((Product, product_ids), (User, farmer_ids)):
+        for row_id in ids:
+            obj = session.identity_map.get(db.inspect(model).identity_key_from_primary_key((row_id,)))
+            if obj is not None:
+                session.expire(obj, list(RATING_FIELDS))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_review_deltas(session):
+    session.info.pop('rating_deltas', None)
+    session.info.pop('rating_stale', None)
+
+
+# ─── Backfill ─────────────────────────────────────────────────────────────────
+
+def backfill_ratings():
+    """Recompute every product and farmer aggregate from the reviews table."""
+    from app.models.review import Review
+    from app.models.product import Product
+    from app.models.user import User
+
+    columns = [func.coalesce(func.sum(Review.rating), 0), func.count(Review.id)] + [
+        func.coalesce(func.sum(case((Review.rating == n, 1), else_=0)), 0) for n in range(1, 6)
+    ]
+
+    db.session.query(Product).update({f: 0 for f in RATING_FIELDS}, synchronize_session=False)
+    db.session.query(User).update({f: 0 for f in RATING_FIELDS}, synchronize_session=False)
+
+    product_rows = db.session.query(Review.product_id, *columns).group_by(Review.product_id).all()
+    farmer_rows = (
+        db.session.query(Product.farmer_id, *columns)
+        .join(Review, Review.product_id == Product.id)
+        .group_by(Product.farmer_id)
+        .all()
+    )
+    for model, rows in ((Product, product_rows), (User, farmer_rows)):
+        if rows:
+            db.session.execute(
+                update(model),
+                [dict(zip(('id',) + RATING_FIELDS, row)) for row in rows],
+            )
+    db.session.commit()
+    return len(product_rows), len(farmer_rows)
@@ -0,0 +1,221 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, text, bindparam
+from sqlalchemy.orm import Session
+from app import db
+
+# ─── Daily Sales Rollup ───────────────────────────────────────────────────────
+#
+# sales_daily holds units, revenue, orders and cancellations per (farmer,
+# product, day), so farmer analytics never read orders or order_items. Being
+# per product, `orders` and `cancellations` count order lines: a cancelled
+# three-product order is three cancelled lines.
+#
+#   new order lines       add their units, revenue and one order line each,
+#                         inside the flush that writes them
+#   cancel / refund       order_status_changed() takes the order's lines back
+#                         out and counts each as a cancelled line (and puts
+#                         them back if the order is revived)
+#
+# Figures land on the day the order was placed. Status changes made through
+# the ORM are picked up by the flush hook; the bulk UPDATEs of the order
+# routes call order_status_changed() themselves. `flask rebuild-sales-rollup`
+# recomputes the table from orders.
+
+UNCOUNTED_STATUSES = ('cancelled', 'refunded')
+RANGES = (7, 30, 365)
+
+_UPSERT_SQL = text(
+    "INSERT INTO sales_daily (farmer_id, product_id, day, units, revenue, orders, cancellations) "
+    "VALUES (:farmer_id, :product_id, :day, :units, :revenue, :orders, :cancellations) "
+    "ON CONFLICT (farmer_id, product_id, day) DO UPDATE SET "
+    "units = units + excluded.units, revenue = revenue + excluded.revenue, "
+    "orders = orders + excluded.orders, cancellations = cancellations + excluded.cancellations"
+)
+
+_ORDER_LINES_SQL = text(
+    "SELECT oi.farmer_id, oi.product_id, oi.quantity, oi.unit_price, o.created_at "
+    "FROM order_items oi JOIN orders o ON o.id = oi.order_id WHERE oi.order_id = :order_id"
+)
+
+_PRODUCT_FARMERS_SQL = text(
+    "SELECT id, farmer_id FROM products WHERE id IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+
+
+def counted(status):
+    return status not in UNCOUNTED_STATUSES
+
+
+def _day(created_at):
+    if isinstance(created_at, str):  # raw SQLite rows come back as text
+        created_at = datetime.fromisoformat(created_at)
+    return (created_at or datetime.utcnow()).date()
+
+
+def _apply(conn, deltas):
+    """Add {(farmer, product, day): [units, revenue, orders, cancellations]} to the rollup."""
+    if deltas:
+        conn.execute(_UPSERT_SQL, [
+            {'farmer_id': farmer_id, 'product_id': product_id, 'day': day.isoformat(),
+             'units': units, 'revenue': revenue, 'orders': orders, 'cancellations': cancellations}
+            for (farmer_id, product_id, day), (units, revenue, orders, cancellations) in deltas.items()
+        ])
+
+
+def order_status_changed(order_id, old_status, new_status, session=None):
+    """Move an order's lines in or out of the rollup when its status crosses cancelled/refunded.
+
+    Also flags the order's farmers for re-ranking, since a bulk UPDATE skips
+    the ranking's own flush hook. Works in the caller's transaction.
+    """
+    session = session or db.session
+    conn = session.connection()
+    lines = conn.execute(_ORDER_LINES_SQL, {'order_id': order_id}).all()
+    session.info.setdefault('ranking_dirty', set()).update(l.farmer_id for l in lines if l.farmer_id)
+    if counted(old_status) == counted(new_status):
+        return
+    sign = 1 if counted(new_status) else -1
+    deltas = {}
+    for farmer_id, product_id, quantity, unit_price, created_at in lines:
+        if farmer_id is None:
+            continue
+        row = deltas.setdefault((farmer_id, product_id, _day(created_at)), [0, 0.0, 0, 0])
+        row[0] += sign * quantity
+        row[1] += sign * quantity * unit_price
+        row[2] += sign
+        row[3] -= sign
+    _apply(conn, deltas)
+
+
+# ─── Incremental Sync ─────────────────────────────────────────────────────────
+
+@event.listens_for(Session, 'after_flush')
+def _sync_after_flush(session, flush_context):
+    from app.models.order import Order, OrderItem
+
+    new_items = [obj for obj in session.new if isinstance(obj, OrderItem)]
+    status_changes = []
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            history = db.inspect(obj).attrs.status.history
+            if history.deleted and history.added:
+                status_changes.append((obj.id, history.deleted[0], history.added[0]))
+    if not new_items and not status_changes:
+        return
+
+    conn = session.connection()
+    if new_items:
+        missing = {i.product_id for i in new_items if i.farmer_id is None}
+        farmers = dict(conn.execute(_PRODUCT_FARMERS_SQL, {'ids': list(missing)}).all()) if missing else {}
+        deltas = {}
+        for item in new_items:
+            order = session.get(Order, item.order_id)
+            farmer_id = item.farmer_id or farmers.get(item.product_id)
+            if order is None or farmer_id is None:
+                continue
+            row = deltas.setdefault((farmer_id, item.product_id, _day(order.created_at)), [0, 0.0, 0, 0])
+            if counted(order.status):
+                row[0] += item.quantity
+                row[1] += item.quantity * item.unit_price
+                row[2] += 1
+            else:
+                row[3] += 1
+        _apply(conn, deltas)
+    for order_id, old_status, new_status in status_changes:
+        order_status_changed(order_id, old_status, new_status, session)
+
+
+# ─── Reading ──────────────────────────────────────────────────────────────────
+
+def _today():
+    return datetime.utcnow().date()
+
+
+def _since(days):
+    return _today() - timedelta(days=days - 1)
+
+
+def sales_summary(farmer_id, days=None):
+    """Totals for a farmer over the last ``days`` days (all time when None)."""
+    from app.models.sales import SalesDaily
+    query = db.session.query(
+        func.coalesce(func.sum(SalesDaily.units), 0), func.coalesce(func.sum(SalesDaily.revenue), 0),
+        func.coalesce(func.sum(SalesDaily.orders), 0), func.coalesce(func.sum(SalesDaily.cancellations), 0),
+    ).filter(SalesDaily.farmer_id == farmer_id)
+    if days:
+        query = query.filter(SalesDaily.day >= _since(days))
+    units, revenue, orders, cancellations = query.one()
+    return {'units': units, 'revenue': revenue, 'orders': orders, 'cancellations': cancellations}
+
+
+def sales_series(farmer_id, days):
+    """Chart buckets for the last ``days`` days: daily up to a month, monthly beyond.
+
+    Returns a list of dicts with label, revenue, units, orders and cancellations,
+    oldest first, with empty buckets included.
+    """
+    from app.models.sales import SalesDaily
+    since = _since(days)
+    monthly = days > 31
+    if monthly:
+        since = since.replace(day=1)
+    buckets, cursor = {}, since
+    while cursor <= _today():
+        key = cursor.replace(day=1) if monthly else cursor
+        buckets.setdefault(key, {'label': key.strftime('%b %Y' if monthly else '%b %d'),
+                                 'revenue': 0.0, 'units': 0, 'orders': 0, 'cancellations': 0})
+        cursor += timedelta(days=1)
+    for day, units, revenue, orders, cancellations in db.session.query(
+        SalesDaily.day, func.sum(SalesDaily.units), func.sum(SalesDaily.revenue),
+        func.sum(SalesDaily.orders), func.sum(SalesDaily.cancellations),
+    ).filter(SalesDaily.farmer_id == farmer_id, SalesDaily.day >= since).group_by(SalesDaily.day):
+        bucket = buckets.get(day.replace(day=1) if monthly else day)
+        if bucket is None:
+            continue
+        bucket['revenue'] += revenue
+        bucket['units'] += units
+        bucket['orders'] += orders
+        bucket['cancellations'] += cancellations
+    return list(buckets.values())
+
+
+def top_products(farmer_id, days, limit=5):
+    """(product name, units, revenue) of a farmer's best sellers over the last ``days`` days."""
+    from app.models.sales import SalesDaily
+    from app.models.product import Product
+    revenue = func.sum(SalesDaily.revenue)
+    return db.session.query(Product.name, func.sum(SalesDaily.units), revenue)\
+        .join(Product, Product.id == SalesDaily.product_id)\
+        .filter(SalesDaily.farmer_id == farmer_id, SalesDaily.day >= _since(days))\
+        .group_by(SalesDaily.product_id, Product.name).having(revenue > 0)\
+        .order_by(revenue.desc()).limit(limit).all()
+
+
+# ─── Maintenance ──────────────────────────────────────────────────────────────
+
+def rebuild_sales_rollup():
+    """Recompute sales_daily from every order line; returns rows written."""
+    conn = db.session.connection()
+    conn.execute(text("DELETE FROM sales_daily"))
+    statuses = ', '.join(f"'{s}'" for s in UNCOUNTED_STATUSES)
+    written = conn.execute(text(f"""
+        INSERT INTO sales_daily (farmer_id, product_id, day, units, revenue, orders, cancellations)
+        SELECT oi.farmer_id, oi.product_id, DATE(o.created_at),
+               SUM(CASE WHEN o.status IN ({statuses}) THEN 0 ELSE oi.quantity END),
+               SUM(CASE WHEN o.status IN ({statuses}) THEN 0 ELSE oi.quantity * oi.unit_price END),
+               SUM(CASE WHEN o.status IN ({statuses}) THEN 0 ELSE 1 END),
+               SUM(CASE WHEN o.status IN ({statuses}) THEN 1 ELSE 0 END)
+        FROM order_items oi JOIN orders o ON o.id = oi.order_id
+        WHERE oi.farmer_id IS NOT NULL
+        GROUP BY oi.farmer_id, oi.product_id, DATE(o.created_at)
+    """)).rowcount
+    db.session.commit()
+    return written
+
+
+def init_sales_rollup():
+    """Build the rollup on first start if orders exist."""
+    from app.models.order import OrderItem
+    from app.models.sales import SalesDaily
+    if not db.session.query(SalesDaily.farmer_id).first() and db.session.query(OrderItem.id).first():
+        rebuild_sales_rollup()
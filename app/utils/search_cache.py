@@ -0,0 +1,125 @@
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.autocomplete import normalize
+from app.utils.cache import LRUCache
+from app.utils.pagination import KeysetPage
+
+# ─── Search Result Cache ──────────────────────────────────────────────────────
+#
+# Maps normalized search parameters to the product ids of one result page
+# (plus total, facets and any did-you-mean suggestion). Entries are dropped
+# wholesale after a commit that changes something a search can filter or sort
+# on; view counts are deliberately ignored so "popular" results may lag a
+# little behind the live counter.
+
+_PRODUCT_FIELDS = ('name', 'description', 'price', 'stock_quantity', 'is_available',
+                   'is_organic', 'category_id', 'location', 'latitude', 'longitude')
+_CATEGORY_FIELDS = ('name', 'name_tl')
+_USER_FIELDS = ('region', 'is_active')
+
+
+cache = LRUCache()
+
+
+def configure(app):
+    cache.maxsize = app.config.get('SEARCH_CACHE_SIZE', 512)
+
+
+def make_key(params, cursor=None):
+    """Cache key from search parameters, with the text lower-cased and whitespace-collapsed."""
+    return (
+        ' '.join(normalize(params['q']).split()),
+        params['category_id'],
+        params['min_price'],
+        params['max_price'],
+        params['price_below'],
+        params['region'].strip().lower(),
+        params['organic'] == '1',
+        params['near'].lower(),
+        params['radius'],
+        params['sort'],
+        params['page'],
+        cursor,
+    )
+
+
+# ─── Entries ──────────────────────────────────────────────────────────────────
+
+class CachedPagination(Pagination):
+    """A Pagination rebuilt from cached ids, with no query behind it."""
+
+    def __init__(self, items, total, page, per_page):
+        self._cached_items = items
+        self._cached_total = total
+        super().__init__(page=page, per_page=per_page, error_out=False)
+
+    def _query_items(self):
+        return self._cached_items
+
+    def _query_count(self):
+        return self._cached_total
+
+
+def freeze(results):
+    """Reduce a result page to plain data for storage."""
+    return {
+        'ids': [p.id for p in results.items],
+        'total': results.total,
+        'per_page': results.per_page,
+        'page': getattr(results, 'page', 1),
+        'next_cursor': getattr(results, 'next_cursor', None),
+        'keyset': getattr(results, 'is_keyset', False),
+    }
+
+
+def thaw(entry):
+    """Rebuild a result page from a cache entry with one primary-key IN query."""
+    from app.models.product import Product
+    from app.utils.loading import loading_profile
+    ids = entry['ids']
+    by_id = {
+        p.id: p for p in Product.query.options(*loading_profile('product_card'))
+                                      .filter(Product.id.in_(ids)).all()
+    } if ids else {}
+    items = [by_id[i] for i in ids if i in by_id]
+    if entry['keyset']:
+        return KeysetPage(items, entry['per_page'], entry['next_cursor'], total=entry['total'])
+    return CachedPagination(items, entry['total'], entry['page'], entry['per_page'])
+
+
+# ─── Invalidation ─────────────────────────────────────────────────────────────
+
+@event.listens_for(Session, 'after_flush')
+def _note_changes(session, flush_context):
+    from app.models.product import Product
+    from app.models.category import Category
+    from app.models.user import User
+
+    if session.info.get('search_cache_stale'):
+        return
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Product, Category)):
+            session.info['search_cache_stale'] = True
+            return
+    for obj in session.dirty:
+        fields = (_PRODUCT_FIELDS if isinstance(obj, Product) else
+                  _CATEGORY_FIELDS if isinstance(obj, Category) else
+                  _USER_FIELDS if isinstance(obj, User) else None)
+        if fields:
+            state = db.inspect(obj)
+            if any(state.attrs[f].history.has_changes() for f in fields):
+                session.info['search_cache_stale'] = True
+                return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate(session):
+    if session.info.pop('search_cache_stale', False):
+        cache.clear()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget(session):
+    session.info.pop('search_cache_stale', None)
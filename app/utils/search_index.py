@@ -0,0 +1,155 @@
+import re
+from sqlalchemy import event, text, bindparam, table, column, literal_column
+from sqlalchemy.orm import Session
+from app import db
+
+# ─── Full-Text Product Index ──────────────────────────────────────────────────
+#
+# SQLite FTS5 shadow table keyed by product id (rowid). It is kept in sync
+# from the ORM flush, inside the same transaction as the product write, so a
+# rolled-back edit never leaves the index ahead of the products table.
+
+FTS_TABLE = 'products_fts'
+
+# BM25 column weights: name, description, location, category
+RANK_WEIGHTS = (10.0, 1.0, 2.0, 4.0)
+
+products_fts = table(FTS_TABLE, column('rowid'), column('rank'))
+
+_enabled = False
+
+_REINDEX_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, description, location, category)
+    SELECT p.id, p.name, COALESCE(p.description, ''), COALESCE(p.location, ''),
+           COALESCE(c.name, '') || ' ' || COALESCE(c.name_tl, '')
+    FROM products p LEFT JOIN categories c ON c.id = p.category_id
+"""
+
+_INDEXED_PRODUCT_FIELDS = ('name', 'description', 'location', 'category_id')
+_INDEXED_CATEGORY_FIELDS = ('name', 'name_tl')
+
+
+def is_enabled():
+    return _enabled
+
+
+def init_search_index():
+    """Create the FTS table if needed and register the sync hook (SQLite only)."""
+    global _enabled
+    if db.engine.dialect.name != 'sqlite':
+        return
+    with db.engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"),
+            {'n': FTS_TABLE},
+        ).first()
+        if not exists:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "name, description, location, category, "
+                "tokenize = 'unicode61 remove_diacritics 2')"
+            ))
+            weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', 'bm25({weights})')"
+            ))
+        indexed = conn.execute(text(f"SELECT COUNT(*) FROM {FTS_TABLE}")).scalar()
+        total = conn.execute(text("SELECT COUNT(*) FROM products")).scalar()
+        if indexed != total:
+            _rebuild(conn)
+    if not event.contains(Session, 'after_flush', _sync_after_flush):
+        event.listen(Session, 'after_flush', _sync_after_flush)
+    _enabled = True
+
+
+def rebuild_search_index():
+    """Drop and repopulate every row of the index; returns the rows indexed."""
+    with db.engine.begin() as conn:
+        _rebuild(conn)
+        return conn.execute(text(f"SELECT COUNT(*) FROM {FTS_TABLE}")).scalar()
+
+
+def _rebuild(conn):
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    conn.execute(text(_REINDEX_SQL))
+
+
+# ─── Query Helpers ────────────────────────────────────────────────────────────
+
+def match_expression(q):
+    """Turn a sanitized search string into an FTS5 prefix query (all terms required)."""
+    terms = re.findall(r'\w+', q or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def apply_search(query, q):
+    """Restrict a Product query to rows matching ``q`` via the FTS index."""
+    from app.models.product import Product
+    return query.join(products_fts, products_fts.c.rowid == Product.id)\
+                .filter(literal_column(FTS_TABLE).op('MATCH')(match_expression(q)))
+
+
+def relevance_order():
+    """BM25 rank of the joined FTS row; lower is more relevant."""
+    return products_fts.c.rank.asc()
+
+
+# ─── ORM Sync ─────────────────────────────────────────────────────────────────
+
+def _changed(obj, fields):
+    state = db.inspect(obj)
+    return any(state.attrs[f].history.has_changes() for f in fields)
+
+
+def _sync_after_flush(session, flush_context):
+    from app.models.product import Product
+    from app.models.category import Category
+
+    if not _enabled:
+        return
+
+    product_ids = set()
+    removed_ids = set()
+    category_ids = set()
+
+    for obj in session.new:
+        if isinstance(obj, Product):
+            product_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Product) and _changed(obj, _INDEXED_PRODUCT_FIELDS):
+            product_ids.add(obj.id)
+        elif isinstance(obj, Category) and _changed(obj, _INDEXED_CATEGORY_FIELDS):
+            category_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            removed_ids.add(obj.id)
+
+    if not (product_ids or removed_ids or category_ids):
+        return
+
+    conn = session.connection()
+    stale = product_ids | removed_ids
+    if stale:
+        conn.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(stale)},
+        )
+    if product_ids:
+        conn.execute(
+            text(_REINDEX_SQL + " WHERE p.id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(product_ids)},
+        )
+    if category_ids:
+        conn.execute(
+            text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+                 "(SELECT id FROM products WHERE category_id IN :ids)")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(category_ids)},
+        )
+        conn.execute(
+            text(_REINDEX_SQL + " WHERE p.category_id IN :ids")
+            .bindparams(bindparam('ids', expanding=True)),
+            {'ids': list(category_ids)},
+        )
@@ -0,0 +1,219 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# ─── Stock Engine ─────────────────────────────────────────────────────────────
+#
+# Stock only changes through conditional UPDATEs, so the availability check and
+# the decrement are one statement and two concurrent checkouts can never both
+# take the last units:
+#
+#   UPDATE products SET stock_quantity = stock_quantity - :qty
+#   WHERE id = :id AND is_available AND stock_quantity >= :qty
+#
+# No row back means "not enough" and the caller rolls back. No rows are
+# locked ahead of time. When STOCK_RESERVATION_MINUTES is set, a buyer can
+# start checkout from the cart (a POST), which takes their quantities into
+# stock_reservations for that many minutes; checkout turns them into the
+# order. A hold is never extended: asking again only tops up the quantities
+# under the original deadline. Lapsed holds give their units back from a
+# background sweep every RESERVATION_SWEEP_INTERVAL seconds, on the next
+# reserve or checkout, or via `flask release-expired-reservations`.
+
+_TAKE_SQL = text(
+    "UPDATE products SET stock_quantity = stock_quantity - :qty "
+    "WHERE id = :id AND is_available AND stock_quantity >= :qty "
+    "RETURNING farmer_id"
+)
+
+_RELEASE_SQL = text(
+    "UPDATE products SET stock_quantity = stock_quantity + :qty WHERE id = :id "
+    "RETURNING farmer_id"
+)
+
+
+class OutOfStock(Exception):
+    """Raised when some products can't cover the requested quantities."""
+
+    def __init__(self, product_ids):
+        super().__init__(f'not enough stock for products {sorted(product_ids)}')
+        self.product_ids = set(product_ids)
+
+
+def _note_change(product_ids, farmer_ids):
+    # Raw UPDATEs skip the ORM, so flag the caches that follow product stock
+    # the same way their own flush hooks would. The catalog snapshot only
+    # needs these products' stock re-read, not a rebuild; the page cache
+    # lets stock lag by its TTL.
+    info = db.session.info
+    info['search_cache_stale'] = True
+    info.setdefault('catalog_restock', set()).update(product_ids)
+    info.setdefault('ranking_dirty', set()).update(farmer_ids)
+
+
+def _expire_loaded(product_ids):
+    """Make loaded Product instances re-read the stock we just changed in SQL."""
+    from app.models.product import Product
+    for product_id in product_ids:
+        product = db.session.identity_map.get(db.inspect(Product).identity_key_from_primary_key((product_id,)))
+        if product is not None:
+            db.session.expire(product, ['stock_quantity'])
+
+
+def take(quantities):
+    """Atomically subtract {product id: qty} from stock in the current transaction.
+
+    Raises OutOfStock naming every product that fell short; the caller must
+    roll back, which also undoes the products that did succeed.
+    """
+    conn = db.session.connection()
+    short, farmers = set(), set()
+    for product_id, qty in quantities.items():
+        if qty <= 0:
+            continue
+        farmer_id = conn.execute(_TAKE_SQL, {'id': product_id, 'qty': qty}).scalar()
+        if farmer_id is None:
+            short.add(product_id)
+        else:
+            farmers.add(farmer_id)
+    if short:
+        raise OutOfStock(short)
+    _expire_loaded(quantities)
+    _note_change(quantities, farmers)
+
+
+def release(quantities):
+    """Put {product id: qty} back on the shelf in the current transaction."""
+    conn = db.session.connection()
+    farmers = set()
+    for product_id, qty in quantities.items():
+        if qty > 0:
+            farmers.update(conn.execute(_RELEASE_SQL, {'id': product_id, 'qty': qty}).scalars())
+    _expire_loaded(quantities)
+    _note_change(quantities, farmers)
+
+
+# ─── Reservations ─────────────────────────────────────────────────────────────
+
+def reservation_minutes():
+    return current_app.config.get('STOCK_RESERVATION_MINUTES', 0)
+
+
+def reserved_for(user_id):
+    from app.models.cart import StockReservation
+    now = datetime.utcnow()
+    return dict(db.session.query(StockReservation.product_id, StockReservation.quantity)
+                .filter(StockReservation.user_id == user_id, StockReservation.expires_at > now))
+
+
+def reserve(user_id, cart):
+    """Write operation: hold the cart's quantities for the buyer; returns product ids that couldn't be held in full.
+
+    Existing holds are topped up or trimmed to the cart and keep their
+    deadline, which new lines share. Products short on stock keep whatever
+    was already held for them.
+    """
+    from app.models.cart import StockReservation
+    release_expired()
+    held = {r.product_id: r for r in StockReservation.query.filter_by(user_id=user_id)}
+    expires = min((r.expires_at for r in held.values()),
+                  default=datetime.utcnow() + timedelta(minutes=reservation_minutes()))
+    short = set()
+    for product_id, qty in cart.items():
+        current = held.pop(product_id, None)
+        delta = qty - (current.quantity if current else 0)
+        if delta > 0:
+            try:
+                take({product_id: delta})  # a single failed UPDATE changes nothing
+            except OutOfStock:
+                short.add(product_id)
+                delta = 0
+        elif delta < 0:
+            release({product_id: -delta})
+        if current is None and delta > 0:
+            db.session.add(StockReservation(user_id=user_id, product_id=product_id,
+                                            quantity=delta, expires_at=expires))
+        elif current is not None:
+            current.quantity += delta
+    for leftover in held.values():
+        release({leftover.product_id: leftover.quantity})
+        db.session.delete(leftover)
+    return short
+
+
+def claim(user_id, cart):
+    """Take the cart's stock for an order, using the buyer's reservations first.
+
+    Raises OutOfStock like take(); reservations are consumed either way once
+    the caller commits.
+    """
+    from app.models.cart import StockReservation
+    release_expired()
+    held = reserved_for(user_id)
+    StockReservation.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    surplus = {pid: qty - cart.get(pid, 0) for pid, qty in held.items() if qty > cart.get(pid, 0)}
+    if surplus:
+        release(surplus)
+    take({pid: qty - held.get(pid, 0) for pid, qty in cart.items()})
+
+
+def release_expired(now=None):
+    """Return the units of lapsed reservations to stock; returns reservations released."""
+    from app.models.cart import StockReservation
+    now = now or datetime.utcnow()
+    released = 0
+    for user_id, product_id, qty in db.session.query(
+        StockReservation.user_id, StockReservation.product_id, StockReservation.quantity
+    ).filter(StockReservation.expires_at <= now).all():
+        # Delete first: only the request whose DELETE hits the row gives the units back.
+        gone = StockReservation.query.filter(
+            StockReservation.user_id == user_id, StockReservation.product_id == product_id,
+            StockReservation.expires_at <= now,
+        ).delete(synchronize_session=False)
+        if gone:
+            release({product_id: qty})
+            released += 1
+    return released
+
+
+# ─── Background Sweep ─────────────────────────────────────────────────────────
+
+class ReservationSweeper:
+    def __init__(self):
+        self.app = None
+        self.interval = 60
+        self._thread = None
+        self.released = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('RESERVATION_SWEEP_INTERVAL', 60)
+        if self.interval and app.config.get('STOCK_RESERVATION_MINUTES') and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='reservation-sweeper', daemon=True)
+            self._thread.start()
+
+    def sweep(self):
+        """Release lapsed holds through the writer; returns reservations released."""
+        from app.utils.write_queue import write
+        try:
+            with self.app.app_context():
+                released = write(release_expired)
+        except Exception:
+            logger.exception('Releasing expired stock reservations failed; will retry')
+            return 0
+        self.released += released
+        return released
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.sweep()
+
+
+reservation_sweeper = ReservationSweeper()
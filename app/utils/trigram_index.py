@@ -0,0 +1,186 @@
+from collections import Counter
+from sqlalchemy import event, text, bindparam
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.autocomplete import normalize, tokenize
+
+# ─── Trigram Vocabulary Index ─────────────────────────────────────────────────
+#
+# Every distinct word of a product or category name (English and Tagalog) is a
+# SearchTerm, and each of its padded trigrams a SearchTrigram row. Misspelled
+# query words are matched by looking up their own trigrams through the
+# (gram, term_id) primary key and scoring candidates by trigram similarity
+# (shared / union), the same measure pg_trgm uses.
+
+SIMILARITY_THRESHOLD = 0.3
+MIN_TERM_LENGTH = 3
+
+_NAME_FIELDS = {'Product': ('name',), 'Category': ('name', 'name_tl')}
+
+
+def trigrams(word):
+    padded = f'  {normalize(word)} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(grams_a, grams_b):
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared) if shared else 0.0
+
+
+def name_terms(*names):
+    return [t for t in tokenize(*names) if len(t) >= MIN_TERM_LENGTH]
+
+
+# ─── Lookup ───────────────────────────────────────────────────────────────────
+
+_CANDIDATES_SQL = text("""
+    SELECT t.term, t.gram_count, t.refs, COUNT(*) AS shared
+    FROM search_trigrams g JOIN search_terms t ON t.id = g.term_id
+    WHERE g.gram IN :grams
+    GROUP BY t.id
+    HAVING COUNT(*) >= :min_shared
+    ORDER BY shared DESC, t.refs DESC
+    LIMIT 25
+""").bindparams(bindparam('grams', expanding=True))
+
+
+def similar_terms(word, limit=5, threshold=SIMILARITY_THRESHOLD):
+    """Vocabulary words similar to ``word`` as (term, score), best first."""
+    grams = trigrams(word)
+    if not grams:
+        return []
+    # A candidate below this many shared grams cannot reach the threshold.
+    min_shared = max(1, int(threshold * len(grams)))
+    rows = db.session.execute(_CANDIDATES_SQL, {'grams': list(grams), 'min_shared': min_shared})
+    scored = []
+    for term, gram_count, refs, shared in rows:
+        score = shared / (len(grams) + gram_count - shared)
+        if score >= threshold:
+            scored.append((term, round(score, 3), refs))
+    scored.sort(key=lambda s: (-s[1], -s[2]))
+    return [(term, score) for term, score, _ in scored[:limit]]
+
+
+def did_you_mean(q):
+    """Return ``q`` with unknown words replaced by their closest vocabulary word, or None."""
+    words = normalize(q).split()
+    if not words:
+        return None
+    known = {
+        row[0] for row in db.session.execute(
+            text("SELECT term FROM search_terms WHERE term IN :terms")
+            .bindparams(bindparam('terms', expanding=True)),
+            {'terms': words},
+        )
+    }
+    corrected, changed = [], False
+    for word in words:
+        if word in known or len(word) < MIN_TERM_LENGTH:
+            corrected.append(word)
+            continue
+        matches = similar_terms(word, limit=1)
+        if matches:
+            corrected.append(matches[0][0])
+            changed = True
+        else:
+            corrected.append(word)
+    return ' '.join(corrected) if changed else None
+
+
+# ─── Maintenance ──────────────────────────────────────────────────────────────
+
+def _add_terms(conn, counts):
+    if not counts:
+        return
+    conn.execute(text(
+        "INSERT INTO search_terms (term, gram_count, refs) VALUES (:term, :grams, :n) "
+        "ON CONFLICT (term) DO UPDATE SET refs = refs + :n"
+    ), [{'term': term, 'grams': len(trigrams(term)), 'n': n} for term, n in counts.items()])
+    ids = dict(conn.execute(
+        text("SELECT term, id FROM search_terms WHERE term IN :terms")
+        .bindparams(bindparam('terms', expanding=True)),
+        {'terms': list(counts)},
+    ).all())
+    rows = [{'gram': g, 'term_id': ids[term]} for term in counts for g in trigrams(term)]
+    conn.execute(text(
+        "INSERT INTO search_trigrams (gram, term_id) VALUES (:gram, :term_id) "
+        "ON CONFLICT DO NOTHING"
+    ), rows)
+
+
+def _remove_terms(conn, counts):
+    if counts:
+        conn.execute(text("UPDATE search_terms SET refs = refs - :n WHERE term = :term"),
+                     [{'term': term, 'n': n} for term, n in counts.items()])
+        conn.execute(text(
+            "DELETE FROM search_trigrams WHERE term_id IN "
+            "(SELECT id FROM search_terms WHERE refs <= 0)"
+        ))
+        conn.execute(text("DELETE FROM search_terms WHERE refs <= 0"))
+
+
+def rebuild_trigram_index():
+    """Recompute the whole vocabulary from current product and category names."""
+    from app.models.product import Product
+    from app.models.category import Category
+    counts = Counter()
+    for (name,) in db.session.query(Product.name):
+        counts.update(name_terms(name))
+    for name, name_tl in db.session.query(Category.name, Category.name_tl):
+        counts.update(name_terms(name, name_tl))
+    conn = db.session.connection()
+    conn.execute(text("DELETE FROM search_trigrams"))
+    conn.execute(text("DELETE FROM search_terms"))
+    _add_terms(conn, counts)
+    db.session.commit()
+
+
+def init_trigram_index():
+    """Populate the vocabulary on first start and hook up incremental sync."""
+    from app.models.search import SearchTerm
+    if not db.session.query(SearchTerm.id).first():
+        rebuild_trigram_index()
+    if not event.contains(Session, 'after_flush', _sync_after_flush):
+        event.listen(Session, 'after_flush', _sync_after_flush)
+
+
+def _names(obj, fields, which):
+    """Current ('new') or pre-flush ('old') name values of an instance."""
+    state = db.inspect(obj)
+    values = []
+    for field in fields:
+        history = state.attrs[field].history
+        if which == 'new':
+            values += list(history.added or history.unchanged or ())
+        else:
+            values += list(history.deleted or history.unchanged or ())
+    return [v for v in values if v]
+
+
+def _sync_after_flush(session, flush_context):
+    added, removed = Counter(), Counter()
+    for obj in session.new:
+        fields = _NAME_FIELDS.get(type(obj).__name__)
+        if fields:
+            added.update(name_terms(*_names(obj, fields, 'new')))
+    for obj in session.dirty:
+        fields = _NAME_FIELDS.get(type(obj).__name__)
+        if not fields:
+            continue
+        state = db.inspect(obj)
+        if any(state.attrs[f].history.has_changes() for f in fields):
+            removed.update(name_terms(*_names(obj, fields, 'old')))
+            added.update(name_terms(*_names(obj, fields, 'new')))
+    for obj in session.deleted:
+        fields = _NAME_FIELDS.get(type(obj).__name__)
+        if fields:
+            removed.update(name_terms(*_names(obj, fields, 'old')))
+
+    # Words present both before and after an edit cancel out.
+    common = added & removed
+    added, removed = added - common, removed - common
+    if added or removed:
+        conn = session.connection()
+        _add_terms(conn, added)
+        _remove_terms(conn, removed)
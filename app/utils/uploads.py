@@ -0,0 +1,99 @@
+import logging
+import os
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app import db
+from app.utils.constants import IMAGE_VARIANTS
+from app.utils.images import FORMATS, ImageTooLarge, make_variants, variant_path
+
+logger = logging.getLogger(__name__)
+
+# ─── Upload Reference Counting ────────────────────────────────────────────────
+#
+# Uploads are content-addressed (see helpers.save_image), so one file can back
+# several products and profiles. When a commit deletes a row or replaces its
+# image, the old paths are counted against every column that can point at an
+# upload; those left with no references are removed with their derivatives.
+
+_REFERENCES = {
+    'Product': ('image',),
+    'User': ('profile_image',),
+}
+
+
+def _columns():
+    from app.models.product import Product
+    from app.models.user import User
+    return (Product.image, User.profile_image)
+
+
+def _is_upload(path):
+    return bool(path) and '/' in path
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_released(session, flush_context):
+    released = session.info.setdefault('released_uploads', set())
+    for obj in session.deleted:
+        for attr in _REFERENCES.get(type(obj).__name__, ()):
+            released.add(getattr(obj, attr))
+    for obj in session.dirty:
+        attrs = _REFERENCES.get(type(obj).__name__)
+        if not attrs:
+            continue
+        state = db.inspect(obj)
+        for attr in attrs:
+            released.update(state.attrs[attr].history.deleted)
+
+
+@event.listens_for(Session, 'after_commit')
+def _remove_released(session):
+    released = {p for p in session.info.pop('released_uploads', ()) if _is_upload(p)}
+    if released and has_app_context():
+        remove_unreferenced(released)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _keep_released(session):
+    session.info.pop('released_uploads', None)
+
+
+def reference_count(path, conn):
+    return sum(conn.execute(select(func.count()).where(column == path)).scalar()
+               for column in _columns())
+
+
+def remove_unreferenced(paths):
+    """Delete uploads (and their derivatives) that no row refers to any more."""
+    root = current_app.config['UPLOAD_FOLDER']
+    removed = []
+    with db.engine.connect() as conn:
+        for path in paths:
+            if reference_count(path, conn):
+                continue
+            files = [path] + [variant_path(path, variant, fmt)
+                              for variant in IMAGE_VARIANTS for fmt in FORMATS]
+            for name in files:
+                try:
+                    os.remove(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    logger.exception('Could not remove upload %s', name)
+            removed.append(path)
+    return removed
+
+
+def process_upload(path):
+    """Make a fresh upload's derivatives; returns (path, variants JSON).
+
+    An image too large to use comes back as (None, None), its file already
+    removed unless some row shares it.
+    """
+    try:
+        return path, make_variants(path)
+    except ImageTooLarge:
+        logger.warning('Refused oversized image %s', path)
+        remove_unreferenced([path])
+        return None, None
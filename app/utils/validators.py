@@ -1,3 +1,4 @@
+import math
 import re
 
 def validate_phone(phone):
@@ -16,7 +17,7 @@ def validate_password_strength(password):
 def validate_price(price):
     try:
         p = float(price)
-        return p > 0
+        return math.isfinite(p) and p > 0
     except (ValueError, TypeError):
         return False
 
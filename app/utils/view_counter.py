@@ -0,0 +1,100 @@
+import atexit
+import logging
+import threading
+import time
+from sqlalchemy import text
+from app import db
+from app.utils.write_queue import WritePending, write
+
+logger = logging.getLogger(__name__)
+
+# ─── Buffered Product View Counter ────────────────────────────────────────────
+#
+# Product page views are counted in memory and written as one batched
+# `views = views + n` UPDATE per flush, so a page view no longer takes the
+# SQLite write lock. A flush happens every VIEW_FLUSH_INTERVAL seconds from a
+# background thread, as soon as VIEW_FLUSH_THRESHOLD views are pending, and
+# at interpreter exit. A hard crash loses at most what was pending; set the
+# interval to 0 to write every view through immediately. The UPDATE goes
+# through the write queue, so with WRITE_QUEUE_ENABLED it shares a group
+# commit with whatever else is being written.
+
+_UPDATE_SQL = text("UPDATE products SET views = COALESCE(views, 0) + :n WHERE id = :id")
+
+
+def _add_views(batch):
+    db.session.connection().execute(_UPDATE_SQL, [{'id': pid, 'n': n} for pid, n in batch.items()])
+
+
+class ViewCounter:
+    def __init__(self):
+        self.app = None
+        self.interval = 10
+        self.threshold = 200
+        self._pending = {}
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self.flushed = 0
+        self.flushes = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('VIEW_FLUSH_INTERVAL', 10)
+        self.threshold = app.config.get('VIEW_FLUSH_THRESHOLD', 200)
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def record(self, product_id, n=1):
+        with self._lock:
+            self._pending[product_id] = self._pending.get(product_id, 0) + n
+            self._pending_total += n
+            due = not self.interval or self._pending_total >= self.threshold
+        if due:
+            self.flush()
+
+    def pending(self, product_id):
+        """Views recorded for a product but not yet written to the database."""
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def flush(self):
+        """Write all pending increments in one transaction; returns views written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._pending_total = self._pending, {}, 0
+            if not batch:
+                return 0
+            try:
+                with self.app.app_context():
+                    write(_add_views, batch)
+            except WritePending as e:
+                # Still queued: put the views back only if it ends up failing,
+                # or they would be counted twice.
+                e.future.add_done_callback(lambda f: f.exception() and self._restore(batch))
+                return 0
+            except Exception:
+                logger.exception('Flushing %d product views failed; will retry', sum(batch.values()))
+                self._restore(batch)
+                return 0
+            written = sum(batch.values())
+            self.flushed += written
+            self.flushes += 1
+            return written
+
+    def _restore(self, batch):
+        with self._lock:
+            for pid, n in batch.items():
+                self._pending[pid] = self._pending.get(pid, 0) + n
+                self._pending_total += n
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,171 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# ─── Group-Commit Writer ──────────────────────────────────────────────────────
+#
+# SQLite lets one connection write at a time, and every commit is a journal
+# sync. With WRITE_QUEUE_ENABLED, write operations are handed to one writer
+# thread instead of committing from each request. The writer drains up to
+# WRITE_QUEUE_MAX_BATCH queued operations (whatever piled up during the last
+# commit, plus anything arriving within WRITE_QUEUE_MAX_WAIT_MS), runs each
+# inside its own SAVEPOINT so a failing one only fails itself, and commits the
+# lot once. Callers get a
+# Future that resolves after that commit, so `write()` returns only once the
+# change is durable.
+#
+# An operation is a plain function of plain arguments (ids, strings) that
+# works on `db.session` and does not commit. It runs on the writer's thread,
+# so it must not touch request objects (current_user, the Flask session or
+# instances loaded by the request), and it should return plain data.
+# When the queue is disabled `write()` runs the operation inline and commits,
+# so call sites are the same either way. Either way the caller's own session
+# is committed at that point, as the request would have done itself.
+#
+# A caller waits at most WRITE_QUEUE_TIMEOUT seconds. Running out of time does
+# not cancel anything: the operation stays queued (or is already inside the
+# writer's transaction) and may still commit. `write()` raises WritePending
+# then, so a caller never mistakes "not known yet" for "failed" and retries a
+# write that has in fact gone through.
+
+
+class WritePending(Exception):
+    """Raised when a queued write did not finish in time; it may still commit.
+
+    ``future`` resolves with the real outcome once the writer gets to it.
+    """
+
+    def __init__(self, future):
+        super().__init__('write still queued; it may yet commit')
+        self.future = future
+
+
+class WriteQueue:
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.max_batch = 64
+        self.max_wait = 0
+        self.timeout = 10
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self.batches = 0
+        self.operations = 0
+        self.timeouts = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('WRITE_QUEUE_ENABLED', False)
+        self.max_batch = app.config.get('WRITE_QUEUE_MAX_BATCH', 64)
+        self.max_wait = app.config.get('WRITE_QUEUE_MAX_WAIT_MS', 0) / 1000
+        self.timeout = app.config.get('WRITE_QUEUE_TIMEOUT', 10)
+        if self.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+            self._thread.start()
+
+    def submit(self, operation, *args, **kwargs):
+        """Queue an operation; the Future resolves with its return value after the group commit."""
+        future = Future()
+        self._queue.put((operation, args, kwargs, future))
+        return future
+
+    def write(self, operation, *args, **kwargs):
+        """Run an operation and commit it, through the writer when enabled; returns its result.
+
+        Raises WritePending if the writer hasn't committed it within the
+        timeout; the operation is not cancelled and may still take effect.
+        """
+        if not self.enabled:
+            try:
+                result = operation(*args, **kwargs)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            return result
+        # End the caller's own transaction first: a reader still holding its
+        # SQLite lock while it waits would keep the writer from committing.
+        db.session.commit()
+        future = self.submit(operation, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            if future.done():  # the operation itself raised it
+                raise
+            self.timeouts += 1
+            raise WritePending(future) from None
+
+    def stats(self):
+        return {'enabled': self.enabled, 'batches': self.batches, 'operations': self.operations,
+                'timeouts': self.timeouts, 'queued': self._queue.qsize()}
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            # A fresh context per batch, so the writer follows init_app() onto
+            # a new app (and its database) instead of the one it started with.
+            try:
+                with self.app.app_context():
+                    self._commit(batch)
+            except Exception as e:
+                # Outside _commit's own handling (the context, the session
+                # teardown): fail what is left of the batch, keep the thread.
+                logger.exception('Write queue batch of %d writes failed', len(batch))
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _commit(self, batch):
+        session = db.session
+        done = []
+        try:
+            if db.engine.dialect.name == 'sqlite':
+                # Take the write lock up front; upgrading a read lock later can
+                # deadlock against a request committing at the same moment.
+                session.connection().exec_driver_sql('BEGIN IMMEDIATE')
+            for operation, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        done.append((future, operation(*args, **kwargs), None))
+                except Exception as e:
+                    done.append((future, None, e))
+            session.commit()
+        except Exception as e:
+            logger.exception('Group commit of %d writes failed', len(batch))
+            session.rollback()
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            try:
+                db.session.remove()
+            except Exception:  # the batch's outcome is already settled
+                logger.exception('Closing the write queue session failed')
+        self.batches += 1
+        self.operations += len(done)
+        for future, result, error in done:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+write_queue = WriteQueue()
+
+
+def write(operation, *args, **kwargs):
+    return write_queue.write(operation, *args, **kwargs)
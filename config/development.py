@@ -35,6 +35,10 @@ class DevelopmentConfig:
     UPLOAD_FOLDER = os.path.join(project_root, 'data', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
+    MAX_IMAGE_PIXELS = 40_000_000  # larger images are refused rather than resized
+    # Let the front-end server (nginx X-Accel / Apache mod_xsendfile) send
+    # files served from /media instead of streaming them through Python
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'
 
     # Stripe
     STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_PUBLIC_KEY', '')
@@ -43,6 +47,46 @@ class DevelopmentConfig:
     # Pagination
     PRODUCTS_PER_PAGE = 12
     ORDERS_PER_PAGE = 10
+    FARMERS_PER_PAGE = 24
+    COUNT_CACHE_TTL = 60  # seconds a cached "N results" total is reused
+
+    # Search result cache (entries, LRU)
+    SEARCH_CACHE_SIZE = 512
+
+    # In-process catalog snapshot behind the shop listing and homepage: rebuilt
+    # after catalog commits, and at least this often (seconds) for view counts
+    CATALOG_SNAPSHOT_MAX_AGE = 300
+
+    # Starting checkout holds the cart's stock for this many minutes (0 = no
+    # holds); lapsed holds are swept back onto the shelf every N seconds
+    STOCK_RESERVATION_MINUTES = 0
+    RESERVATION_SWEEP_INTERVAL = 60
+
+    # Product view counter: buffered in memory, flushed every N seconds or
+    # once this many views are pending (0 interval = write every view)
+    VIEW_FLUSH_INTERVAL = 10
+    VIEW_FLUSH_THRESHOLD = 200
+
+    # Group-commit writer: queue message, order and view writes to one thread
+    # that commits up to MAX_BATCH of them at once, optionally waiting MAX_WAIT_MS
+    # for a batch to fill (off = every request commits its own writes)
+    WRITE_QUEUE_ENABLED = False
+    WRITE_QUEUE_MAX_BATCH = 64
+    WRITE_QUEUE_MAX_WAIT_MS = 0
+    WRITE_QUEUE_TIMEOUT = 10
+
+    # Fingerprinted static assets: rebuild static/dist at startup (production
+    # runs `flask build-assets` at deploy time and leaves this off)
+    ASSETS_BUILD_ON_STARTUP = True
+
+    # Farmer ranking: re-score farmers touched by recent commits every N
+    # seconds, and everyone every FULL_INTERVAL seconds (0 = manual only)
+    FARMER_RANKING_INTERVAL = 60
+    FARMER_RANKING_FULL_INTERVAL = 3600
+
+    # Full-page cache for logged-out visitors (TTLs are set per route)
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_SIZE = 1024
 
 # --- Safety Check: Create folders if they don't exist ---
 os.makedirs(os.path.join(project_root, 'data'), exist_ok=True)
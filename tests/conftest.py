@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from config.development import DevelopmentConfig
+from app import create_app, db
+from app.models import User, Product, Category
+from app.utils.pagination import clear_count_cache
+
+PASSWORD = 'Passw0rd!'
+
+
+def make_app(path):
+    """An app over a fresh SQLite database and upload folder under ``path``."""
+    class TestConfig(DevelopmentConfig):
+        TESTING = True
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path / 'test.db'}"
+        UPLOAD_FOLDER = str(path / 'uploads')
+        ASSETS_BUILD_ON_STARTUP = False
+        PAGE_CACHE_ENABLED = False
+        FARMER_RANKING_INTERVAL = 0
+        VIEW_FLUSH_INTERVAL = 0
+        RESERVATION_SWEEP_INTERVAL = 0
+
+    path.mkdir(parents=True, exist_ok=True)
+    clear_count_cache()  # cached totals are per process, not per app
+    return create_app(TestConfig)
+
+
+def close_app(app):
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    close_app(app)
+
+
+def add_user(username, role='buyer', password_hash=None, **fields):
+    """Add a user who logs in as <username>@example.com; pass another user's hash to skip bcrypt."""
+    user = User(username=username, email=f'{username}@example.com', role=role, **fields)
+    if password_hash:
+        user.password_hash = password_hash
+    else:
+        user.set_password(PASSWORD)
+    db.session.add(user)
+    return user
+
+
+def add_product(farmer, name, price=50.0, stock=100, category='Vegetables', **fields):
+    category = Category.query.filter_by(name=category).first()
+    product = Product(farmer_id=farmer.id, category_id=category.id, name=name, price=price,
+                      stock_quantity=stock, description=f'Fresh {name}', location='Nueva Ecija', **fields)
+    db.session.add(product)
+    return product
+
+
+def login(client, username):
+    client.post('/auth/login', data={'email': f'{username}@example.com', 'password': PASSWORD})
+    return client
+
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
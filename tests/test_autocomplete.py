@@ -0,0 +1,37 @@
+import random
+from app.utils.autocomplete import PrefixIndex, KIND_ORDER, TOP_K, tokenize
+
+WORDS = ['rice', 'red', 'ripe', 'kamatis', 'mango', 'mangga', 'talong', 'eggs', 'sweet', 'sitaw']
+
+
+def row(ref_id, name):
+    return 'product', ref_id, name, tokenize(name), None
+
+
+def brute_force(rows, text, limit=8):
+    words = tokenize(text)
+    found = [(kind, ref_id, label) for kind, ref_id, label, terms, _ in rows
+             if all(any(t.startswith(w) for t in terms) for w in words)]
+    found.sort(key=lambda f: (KIND_ORDER[f[0]], len(f[2]), f[2]))
+    return [label for _, _, label in found[:limit]]
+
+
+def test_search_matches_a_full_scan_through_upserts_and_removals():
+    rng = random.Random(7)
+    rows = {i: row(i, ' '.join(rng.sample(WORDS, 2)) + f' {i}') for i in range(TOP_K * 12)}
+    index = PrefixIndex()
+    index.load(rows.values())
+    queries = ['r', 'ri', 'ma', 'mang', 'sweet', 'e s', 'rice 1', 'x']
+    for query in queries:  # fills the per-prefix lists
+        assert [e['label'] for e in index.search(query)] == brute_force(rows.values(), query)
+
+    for step in range(300):
+        ref_id = rng.randrange(len(rows) + 50)
+        if ref_id in rows and rng.random() < 0.4:
+            del rows[ref_id]
+            index.remove('product', ref_id)
+        else:
+            rows[ref_id] = row(ref_id, ' '.join(rng.sample(WORDS, rng.randint(1, 3))) + f' {step}')
+            index.upsert(*rows[ref_id])
+        query = rng.choice(queries)
+        assert [e['label'] for e in index.search(query)] == brute_force(rows.values(), query)
@@ -0,0 +1,59 @@
+from app import db
+from app.models.cart import CartItem
+from app.utils.cart_store import priced_lines
+from tests.conftest import add_user, add_product, login, count_queries
+
+
+def cart_of(app, key):
+    with app.app_context():
+        return dict(db.session.query(CartItem.product_id, CartItem.quantity).filter_by(cart_key=key))
+
+
+def setup_shop(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        add_user('buyer', address='Manila')
+        db.session.commit()
+        add_product(farmer, 'Kamatis', stock=5)
+        add_product(farmer, 'Talong', stock=5)
+        add_product(farmer, 'Sili', stock=0)
+        db.session.commit()
+
+
+def test_login_merges_the_visitor_cart_up_to_the_stock(app):
+    setup_shop(app)
+    buyer = login(app.test_client(), 'buyer')
+    buyer.post('/cart/add/1', data={'quantity': 4})
+    buyer.get('/auth/logout')
+
+    buyer.post('/cart/add/1', data={'quantity': 3})
+    buyer.post('/cart/add/2', data={'quantity': 2})
+    with buyer.session_transaction() as session:
+        visitor_key = f"s:{session['cart_id']}"
+    login(buyer, 'buyer')
+
+    assert cart_of(app, 'u:2') == {1: 5, 2: 2}
+    assert cart_of(app, visitor_key) == {}
+    with buyer.session_transaction() as session:
+        assert session['cart_count'] == 7
+
+
+def test_cookie_cart_of_earlier_versions_is_adopted(app):
+    setup_shop(app)
+    buyer = login(app.test_client(), 'buyer')
+    with buyer.session_transaction() as session:
+        session['cart'] = {'1': 2, '2': 'many', '999': 1}
+    buyer.get('/cart/')
+    assert cart_of(app, 'u:2') == {1: 2}
+    with buyer.session_transaction() as session:
+        assert 'cart' not in session
+
+
+def test_cart_products_are_priced_with_one_query(app):
+    setup_shop(app)
+    with app.app_context():
+        for size in (1, 2):
+            with count_queries(db.engine) as statements:
+                lines, total = priced_lines({pid: 1 for pid in range(1, size + 1)})
+            assert len(lines) == size and total == 50.0 * size
+            assert len(statements) == 1
@@ -0,0 +1,52 @@
+import io
+import json
+from app import db
+from app.models import Product
+from tests.conftest import add_user, login
+
+
+def upload(app, filename, body):
+    with app.app_context():
+        add_user('farmer', role='farmer', region='Region III')
+        db.session.commit()
+    client = login(app.test_client(), 'farmer')
+    return client.post('/products/import', data={'catalog': (io.BytesIO(body), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_non_utf8_csv_is_reported(app):
+    body = 'name,category,price\nKamatis,Vegetables,50\nJalapeño,Vegetables,80\n'.encode('cp1252')
+    response = upload(app, 'catalog.csv', body)
+    assert response.status_code == 200
+    assert b'not UTF-8' in response.data
+    with app.app_context():
+        assert Product.query.count() == 0  # the file is decoded in blocks, so none of it is read
+
+
+def test_broken_csv_is_reported(app):
+    body = b'name,category,price\nKamatis,Vegetables,50\n"' + b'x' * 200_000 + b'",Vegetables,80\n'
+    response = upload(app, 'catalog.csv', body)
+    assert response.status_code == 200
+    assert b'could not be read' in response.data
+    with app.app_context():
+        assert [p.name for p in Product.query] == ['Kamatis']
+
+
+def test_boolean_price_is_rejected(app):
+    rows = [{'name': 'Kamatis', 'category': 'Vegetables', 'price': True},
+            {'name': 'Talong', 'category': 'Vegetables', 'price': 45}]
+    body = '\n'.join(json.dumps(row) for row in rows).encode()
+    response = upload(app, 'catalog.jsonl', body)
+    assert response.status_code == 200
+    assert b'price: must be a number above 0' in response.data
+    with app.app_context():
+        assert [p.name for p in Product.query] == ['Talong']
+
+
+def test_infinite_price_is_rejected(app):
+    body = b'name,category,price\nKamatis,Vegetables,inf\nTalong,Vegetables,Infinity\nSili,Vegetables,nan\nPechay,Vegetables,45\n'
+    response = upload(app, 'catalog.csv', body)
+    assert response.status_code == 200
+    assert response.data.count(b'price: must be a number above 0') == 3
+    with app.app_context():
+        assert [p.name for p in Product.query] == ['Pechay']
@@ -0,0 +1,33 @@
+from app import db
+from app.models import Product
+from app.utils.catalog_snapshot import catalog
+from tests.conftest import add_user, add_product, login
+
+
+def test_stock_changes_patch_the_snapshot_instead_of_rebuilding(app):
+    app.config['STOCK_RESERVATION_MINUTES'] = 15
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        buyer = add_user('buyer', address='Manila')
+        db.session.commit()
+        products = [add_product(farmer, f'Kamatis {i}', stock=20) for i in range(5)]
+        db.session.commit()
+        product_id = products[2].id
+    client = login(app.test_client(), 'buyer')
+    client.post(f'/cart/add/{product_id}', data={'quantity': 3})
+
+    with app.app_context():
+        snapshot = catalog.get()
+        builds = catalog.builds
+        client.post('/cart/hold')
+        client.post('/cart/checkout', data={'shipping_address': 'Manila', 'payment_method': 'cod'})
+        assert catalog.builds == builds
+        patched = catalog.get()
+        assert patched.by_id[product_id].stock_quantity == 17
+        assert snapshot.by_id[product_id].stock_quantity == 20  # readers of the old copy are unaffected
+        assert [p.id for p in patched.top('newest', 5)] == [p.id for p in snapshot.top('newest', 5)]
+
+        db.session.get(Product, product_id).price = 99
+        db.session.commit()
+        catalog.get()
+        assert catalog.builds == builds + 1
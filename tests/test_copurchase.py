@@ -0,0 +1,39 @@
+from app import db
+from app.models import Product
+from app.models.recommendation import CoPurchase
+from app.utils.copurchase import refresh_related
+from tests.conftest import add_user, add_product
+
+
+def seed(app):
+    """Kamatis bought together with Talong and Sili."""
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        for name in ('Kamatis', 'Talong', 'Sili', 'Pechay'):
+            add_product(farmer, name, category='Vegetables')
+        db.session.commit()
+        for a, b in ((1, 2), (2, 1), (1, 3), (3, 1)):
+            db.session.add(CoPurchase(product_id=a, other_id=b, orders=1))
+        db.session.flush()
+        refresh_related(db.session.connection(), [1, 2, 3])
+        db.session.commit()
+
+
+def test_unavailable_partners_fall_back_to_the_same_category(app):
+    seed(app)
+    with app.app_context():
+        for product_id in (2, 3):
+            db.session.get(Product, product_id).is_available = False
+        db.session.commit()
+    page = app.test_client().get('/products/1').get_data(as_text=True)
+    assert 'Frequently Bought Together' not in page
+    assert 'You Might Also Like' in page and 'Pechay' in page
+
+
+def test_deleting_a_product_drops_it_from_its_partners_lists(app):
+    seed(app)
+    with app.app_context():
+        db.session.delete(db.session.get(Product, 3))
+        db.session.commit()
+        assert db.session.get(Product, 1).related_ids == '2'
@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.mark.parametrize('url', [
+    '/search/?q=kamatis&near=Manila&radius=nan',
+    '/search/?q=kamatis&near=14.6,121.0&radius=nan',
+    '/search/?q=kamatis&near=14.6,121.0&radius=inf',
+    '/search/facets?q=kamatis&near=Manila&radius=nan',
+])
+def test_non_finite_radius_falls_back_to_the_default(app, url):
+    assert app.test_client().get(url).status_code == 200
@@ -0,0 +1,88 @@
+import io
+import os
+import pytest
+from PIL import Image
+from werkzeug.exceptions import NotFound
+from app import db
+from app.models import Product, User
+from app.routes.media import serve
+from tests.conftest import add_user, add_product, login
+
+
+def png(size):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def uploads(app, subfolder):
+    folder = os.path.join(app.config['UPLOAD_FOLDER'], subfolder)
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+
+@pytest.fixture
+def farmer(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer', region='Region III')
+        db.session.commit()
+        add_product(farmer, 'Kamatis')
+        db.session.commit()
+    return login(app.test_client(), 'farmer')
+
+
+def product_form(image):
+    return {'name': 'Talong', 'category_id': '1', 'price': '45', 'stock_quantity': '10',
+            'unit': 'kg', 'image': (image, 'talong.png')}
+
+
+def test_normal_upload_gets_variants(app, farmer):
+    farmer.post('/products/add', data=product_form(png((640, 480))), content_type='multipart/form-data')
+    with app.app_context():
+        product = Product.query.filter_by(name='Talong').one()
+        assert product.image.startswith('products/') and product.image_variants
+    assert len(uploads(app, 'products')) == 7  # original + 3 variants in 2 formats
+
+
+def test_oversized_product_image_is_refused(app, farmer):
+    app.config['MAX_IMAGE_PIXELS'] = 100_000
+    response = farmer.post('/products/add', data=product_form(png((640, 480))),
+                           content_type='multipart/form-data', follow_redirects=True)
+    assert response.status_code == 200
+    assert b'too large to use' in response.data
+    with app.app_context():
+        product = Product.query.filter_by(name='Talong').one()
+        assert product.image == 'default_product.jpg'
+    assert uploads(app, 'products') == []
+
+    response = farmer.post('/products/1/edit', data=product_form(png((640, 480))),
+                           content_type='multipart/form-data', follow_redirects=True)
+    assert b'too large to use' in response.data
+    with app.app_context():
+        assert db.session.get(Product, 1).image == 'default_product.jpg'
+    assert uploads(app, 'products') == []
+
+
+def test_decompression_bomb_profile_image_is_refused(app, farmer, monkeypatch):
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 50_000)  # Pillow refuses over twice this
+    response = farmer.post('/users/profile', data={
+        'full_name': 'Juan Dela Cruz', 'region': 'Region III', 'profile_image': (png((640, 480)), 'me.png'),
+    }, content_type='multipart/form-data', follow_redirects=True)
+    assert response.status_code == 200
+    assert b'too large to use' in response.data
+    with app.app_context():
+        user = User.query.filter_by(username='farmer').one()
+        assert user.full_name == 'Juan Dela Cruz'
+        assert not (user.profile_image or '').startswith('profiles/')
+    assert uploads(app, 'profiles') == []
+
+
+@pytest.mark.parametrize('name', ['products/.5f2b9c.part', '.hidden.png', 'products/abc.png.part'])
+def test_in_progress_and_hidden_uploads_are_not_served(app, name):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'partial')
+    with app.test_request_context(f'/media/{name}'):
+        with pytest.raises(NotFound):
+            serve(name)
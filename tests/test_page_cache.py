@@ -0,0 +1,40 @@
+from app import db
+from app.models import Product, User
+from app.utils import page_cache
+from tests.conftest import add_user, add_product, login
+
+
+def test_only_publicly_visible_changes_drop_cached_pages(app):
+    app.config['PAGE_CACHE_ENABLED'] = True
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        add_user('buyer', address='Manila')
+        db.session.commit()
+        add_product(farmer, 'Kamatis', stock=20)
+        db.session.commit()
+    page_cache.cache.clear()
+    visitor = app.test_client()
+    shopper = login(app.test_client(), 'buyer')
+
+    def cached():
+        return visitor.get('/products/1').headers['X-Page-Cache'] == 'HIT'
+
+    assert not cached() and cached()
+
+    with app.app_context():
+        add_user('newcomer')
+        db.session.get(User, 2).address = 'Quezon City'
+        db.session.commit()
+    shopper.post('/cart/add/1', data={'quantity': 2})
+    shopper.post('/cart/checkout', data={'shipping_address': 'Manila', 'payment_method': 'cod'})
+    assert cached()
+
+    with app.app_context():
+        db.session.get(User, 1).bio = 'Fresh from Benguet'
+        db.session.commit()
+    assert not cached() and cached()
+
+    with app.app_context():
+        db.session.get(Product, 1).price = 60
+        db.session.commit()
+    assert not cached()
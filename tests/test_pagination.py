@@ -0,0 +1,98 @@
+import base64
+import json
+import re
+import pytest
+from datetime import datetime
+from app import db
+from app.models import User
+from app.utils.pagination import encode_cursor, decode_cursor
+from tests.conftest import add_user, add_product, login
+
+
+def token(*parts):
+    return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode().rstrip('=')
+
+
+@pytest.fixture
+def catalog(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        for i in range(15):
+            add_product(farmer, f'Dinorado Rice {i}', price=40 + i, category='Rice & Grains')
+        db.session.commit()
+    return app.test_client()
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('newest', token('newest', None, 'x')),
+    ('newest', token('newest', 'yesterday', 3)),
+    ('newest', token('newest', {'dt': 5}, 3)),
+    ('price_asc', token('price_asc', [1], 3)),
+    ('price_asc', token('price_asc', True, 3)),
+    ('price_asc', token('price_asc', 45, 'x')),
+    ('price_asc', 'not-base64!'),
+])
+def test_tampered_search_cursor_starts_over(catalog, sort, cursor):
+    response = catalog.get('/search/', query_string={'q': 'rice', 'sort': sort, 'cursor': cursor})
+    assert response.status_code == 200
+    assert b'Dinorado Rice' in response.data
+
+
+def test_cursor_round_trip():
+    added = datetime(2024, 5, 1, 8, 30)
+    assert decode_cursor(encode_cursor('newest', added, 7), 'newest', dated=True) == (added, 7)
+    assert decode_cursor(encode_cursor('price_asc', 45.5, 7), 'price_asc') == (45.5, 7)
+    assert decode_cursor(encode_cursor('price_asc', 45.5, 7), 'price_desc') is None
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('newest', token('newest', 'yesterday', 3)),
+    ('newest', token('newest', [2024], 3)),
+    ('newest', token('newest', {'dt': '2024-05-01T08:30:00'}, 'x')),
+    ('popular', token('popular', 'many', 3)),
+    ('price_desc', token('price_desc', 45, 2.5)),
+])
+def test_tampered_listing_cursor_starts_over(catalog, sort, cursor):
+    response = catalog.get('/products/', query_string={'sort': sort, 'cursor': cursor})
+    assert response.status_code == 200
+    assert b'Dinorado Rice' in response.data
+
+
+@pytest.mark.parametrize('sort', ['newest', 'popular', 'price_asc', 'price_desc'])
+def test_listing_cursor_walks_every_product_once(catalog, sort):
+    seen, cursor = [], ''
+    while cursor is not None:
+        response = catalog.get('/products/', query_string={'sort': sort, 'cursor': cursor})
+        page = response.get_data(as_text=True)
+        seen += [int(i) for i in re.findall(r'/cart/add/(\d+)', page)]
+        match = re.search(r'cursor=([\w-]+)', page)
+        cursor = match.group(1) if match else None
+    assert sorted(seen) == list(range(1, 16))
+
+
+def test_search_total_follows_new_products(catalog, app):
+    assert '15 products found' in catalog.get('/search/?q=rice').get_data(as_text=True)
+    with app.app_context():
+        add_product(User.query.filter_by(username='farmer').one(), 'Dinorado Rice 15', category='Rice & Grains')
+        db.session.commit()
+    assert '16 products found' in catalog.get('/search/?q=rice').get_data(as_text=True)
+
+
+def test_order_totals_follow_new_orders(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        add_user('buyer', address='Manila')
+        db.session.commit()
+        add_product(farmer, 'Kamatis', stock=100)
+        db.session.commit()
+    buyer = login(app.test_client(), 'buyer')
+    farmer = login(app.test_client(), 'farmer')
+    assert 'page=2' not in buyer.get('/orders/').get_data(as_text=True)
+    assert 'page=2' not in farmer.get('/orders/farmer/manage').get_data(as_text=True)
+
+    for _ in range(12):
+        buyer.post('/cart/add/1', data={'quantity': 1})
+        buyer.post('/cart/checkout', data={'shipping_address': 'Manila', 'payment_method': 'cod'})
+    assert 'page=2' in buyer.get('/orders/').get_data(as_text=True)
+    assert 'page=2' in farmer.get('/orders/farmer/manage').get_data(as_text=True)
@@ -0,0 +1,27 @@
+import html
+import re
+
+from app import db
+from tests.conftest import add_user, add_product
+
+
+def test_bucket_link_shows_the_products_the_bucket_counted(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        add_product(farmer, 'Kamatis Cherry', price=30)
+        add_product(farmer, 'Kamatis Roma', price=50)  # on the edge: belongs to ₱50 – ₱100
+        db.session.commit()
+    client = app.test_client()
+
+    buckets = client.get('/search/facets?q=kamatis').get_json()['price_buckets']
+    assert [b['count'] for b in buckets[:2]] == [1, 1]
+
+    page = client.get('/search/?q=kamatis').get_data(as_text=True)
+    links = [html.unescape(href) for href in re.findall(r'href="([^"]*price_below=[^"]*)"', page)]
+    under_50 = next(href for href in links if 'price_below=50' in href and 'min_price' not in href)
+    assert 'max_price' not in under_50
+
+    page = client.get(under_50).get_data(as_text=True)
+    assert 'Kamatis Cherry' in page
+    assert 'Kamatis Roma' not in page
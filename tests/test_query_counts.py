@@ -0,0 +1,79 @@
+import pytest
+from app import db
+from app.models import Order, OrderItem, Review, Conversation, Message
+from tests.conftest import add_user, add_product, login, count_queries
+
+# Pages must cost a fixed number of queries however much data is behind them:
+# each page is rendered over a small and a large data set and must issue
+# exactly its expected count both times, which catches N+1 loads. Pages are
+# counted on their first hit, in order, so caches filled by an earlier page
+# (the listing shares the homepage's catalog snapshot) stay filled.
+
+PAGES = {
+    # name: (URL, who is logged in, queries)
+    'home': ('/', None, 4),
+    'listing': ('/products/', None, 0),
+    'detail': ('/products/1', None, 3),
+    'search': ('/search/?q=Kamatis', None, 4),
+    'cart': ('/cart/', 'buyer0', 4),
+    'orders': ('/orders/', 'buyer0', 5),
+    'farmer orders': ('/orders/farmer/manage', 'farmer0', 6),
+    'inbox': ('/messages/', 'buyer0', 5),
+}
+SIZES = (2, 12)
+
+
+def seed(size):
+    """`size` farmers and buyers, with products, reviews, orders and conversations to match."""
+    farmers = [add_user(f'farmer{i}', role='farmer') for i in range(size)]
+    db.session.commit()
+    password_hash = farmers[0].password_hash
+    buyers = [add_user(f'buyer{i}', address='Manila', password_hash=password_hash) for i in range(size)]
+    products = [add_product(farmers[i % size], f'Kamatis {i}', price=40 + i) for i in range(size * 3)]
+    db.session.commit()
+    for i, product in enumerate(products):
+        db.session.add(Review(product_id=product.id, reviewer_id=buyers[i % size].id, rating=i % 5 + 1,
+                              comment='Fresh'))
+    for i in range(size * 2):
+        order = Order(buyer_id=buyers[0].id, total_amount=0, shipping_address='Manila',
+                      status='pending', payment_status='pending')
+        db.session.add(order)
+        db.session.flush()
+        for product in products[i % size::size][:3]:
+            db.session.add(OrderItem(order_id=order.id, product_id=product.id, farmer_id=product.farmer_id,
+                                     quantity=1, unit_price=product.price))
+            order.total_amount += product.price
+    for farmer in farmers:
+        conversation = Conversation(buyer_id=buyers[0].id, farmer_id=farmer.id)
+        db.session.add(conversation)
+        db.session.flush()
+        for sender in (buyers[0], farmer, farmer):
+            db.session.add(Message(conversation_id=conversation.id, sender_id=sender.id, message='Hello'))
+    db.session.commit()
+    return [p.id for p in products[:3]]
+
+
+def page_costs(app, size):
+    with app.app_context():
+        cart_products = seed(size)
+        engine = db.engine
+    clients = {}
+    for name in ('buyer0', 'farmer0'):
+        clients[name] = login(app.test_client(), name)
+    for product_id in cart_products:
+        clients['buyer0'].post(f'/cart/add/{product_id}', data={'quantity': 1})
+    clients[None] = app.test_client()
+
+    costs = {}
+    for page, (url, user, _) in PAGES.items():
+        with count_queries(engine) as statements:
+            response = clients[user].get(url)
+        assert response.status_code == 200, page
+        costs[page] = len(statements)
+    return costs
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_page_query_counts(app, size):
+    costs = page_costs(app, size)
+    assert costs == {page: expected for page, (_, _, expected) in PAGES.items()}
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db
+from app.models import Product
+from app.models.cart import StockReservation
+from app.utils.stock import reservation_sweeper
+from tests.conftest import add_user, add_product, login
+
+
+@pytest.fixture
+def shop(app):
+    app.config['STOCK_RESERVATION_MINUTES'] = 15
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        add_user('alice', address='Manila')
+        add_user('bob', address='Manila')
+        db.session.commit()
+        add_product(farmer, 'Kamatis', stock=5)
+        db.session.commit()
+    alice = login(app.test_client(), 'alice')
+    alice.post('/cart/add/1', data={'quantity': 5})
+    return alice
+
+
+def stock_and_expiry(app):
+    with app.app_context():
+        hold = StockReservation.query.first()
+        return db.session.get(Product, 1).stock_quantity, hold and hold.expires_at
+
+
+def test_only_starting_checkout_holds_stock_and_never_extends_it(app, shop):
+    shop.get('/cart/')
+    assert stock_and_expiry(app) == (5, None)
+
+    shop.post('/cart/hold')
+    left, expires = stock_and_expiry(app)
+    assert left == 0
+    shop.get('/cart/')
+    shop.post('/cart/hold')
+    assert stock_and_expiry(app) == (0, expires)
+
+
+def test_lapsed_hold_is_swept_back_onto_the_shelf(app, shop):
+    shop.post('/cart/hold')
+    with app.app_context():
+        StockReservation.query.update({'expires_at': datetime.utcnow() - timedelta(hours=3)})
+        db.session.commit()
+
+    reservation_sweeper.init_app(app)
+    assert reservation_sweeper.sweep() == 1
+    assert stock_and_expiry(app) == (5, None)
+    bob = login(app.test_client(), 'bob')
+    response = bob.post('/cart/add/1', data={'quantity': 5}, follow_redirects=True)
+    assert 'added to cart' in response.get_data(as_text=True)
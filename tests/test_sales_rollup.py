@@ -0,0 +1,23 @@
+from app import db
+from app.utils.sales_rollup import sales_summary
+from tests.conftest import add_user, add_product, login
+
+
+def test_a_cancelled_order_counts_one_cancelled_line_per_product(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        add_user('buyer', address='Manila')
+        db.session.commit()
+        for name in ('Kamatis', 'Talong', 'Sili'):
+            add_product(farmer, name)
+        db.session.commit()
+    buyer = login(app.test_client(), 'buyer')
+    for product_id in (1, 2, 3):
+        buyer.post(f'/cart/add/{product_id}', data={'quantity': 1})
+    buyer.post('/cart/checkout', data={'shipping_address': 'Manila', 'payment_method': 'cod'})
+    buyer.post('/orders/1/cancel')
+
+    with app.app_context():
+        assert sales_summary(1, 7) == {'units': 0, 'revenue': 0, 'orders': 0, 'cancellations': 3}
+    page = login(app.test_client(), 'farmer').get('/users/dashboard?range=7').get_data(as_text=True)
+    assert 'Cancelled lines' in page
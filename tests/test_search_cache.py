@@ -0,0 +1,40 @@
+from app import db
+from app.models import Product
+from app.routes import search as search_routes
+from app.utils import search_cache
+from tests.conftest import add_user, add_product, login
+
+
+def test_result_computed_across_an_invalidating_commit_is_not_cached(app, monkeypatch):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        add_product(farmer, 'Kamatis', price=50)
+        db.session.commit()
+    search_cache.cache.clear()
+
+    facets_for = search_routes.facets_for
+
+    def facets_then_commit(params):
+        # Another request changes the catalog while this search is being computed.
+        with app.app_context():
+            db.session.get(Product, 1).price = 80
+            db.session.commit()
+        return facets_for(params)
+
+    monkeypatch.setattr(search_routes, 'facets_for', facets_then_commit)
+    client = app.test_client()
+    client.get('/search/?q=kamatis')
+    assert search_cache.cache.stats()['size'] == 0
+
+    monkeypatch.setattr(search_routes, 'facets_for', facets_for)
+    client.get('/search/?q=kamatis')
+    assert search_cache.cache.stats()['size'] == 1
+
+
+def test_cache_stats_need_a_login(app):
+    with app.app_context():
+        add_user('buyer')
+        db.session.commit()
+    assert app.test_client().get('/search/cache-stats').status_code == 302
+    assert 'hits' in login(app.test_client(), 'buyer').get('/search/cache-stats').get_json()
@@ -0,0 +1,21 @@
+from sqlalchemy import text
+from app import db
+from app.utils.search_index import FTS_TABLE
+from tests.conftest import add_user, add_product
+
+
+def test_rebuild_search_index_command_restores_a_lost_index(app):
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        add_product(farmer, 'Kamatis')
+        db.session.commit()
+        db.session.execute(text(f'DELETE FROM {FTS_TABLE}'))
+        db.session.commit()
+    client = app.test_client()
+    assert 'Kamatis' not in client.get('/search/?q=kamatis').get_data(as_text=True)
+
+    result = app.test_cli_runner().invoke(args=['rebuild-search-index'])
+    assert result.exit_code == 0, result.output
+    assert 'rebuilt: 1 products' in result.output
+    assert 'Kamatis' in client.get('/search/?q=kamatis').get_data(as_text=True)
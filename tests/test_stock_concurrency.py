@@ -0,0 +1,64 @@
+import re
+import threading
+import pytest
+from app import db
+from app.models import Order, OrderItem, Product
+from app.utils.write_queue import write_queue
+from tests.conftest import add_user, add_product, login
+
+BUYERS = 40
+STOCK = 10
+
+
+@pytest.mark.parametrize('queued', [False, True], ids=['direct', 'write-queue'])
+@pytest.mark.parametrize('hold_minutes', [0, 15], ids=['no-holds', 'holds'])
+def test_concurrent_checkouts_never_oversell(app, queued, hold_minutes):
+    app.config['STOCK_RESERVATION_MINUTES'] = hold_minutes
+    app.config['WRITE_QUEUE_ENABLED'] = queued
+    app.config['WRITE_QUEUE_TIMEOUT'] = 120  # 40 checkouts at once on a busy test machine
+    write_queue.init_app(app)
+
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        product = add_product(farmer, 'Kamatis', stock=STOCK)
+        db.session.commit()
+        product_id = product.id
+        password_hash = farmer.password_hash
+        for i in range(BUYERS):
+            add_user(f'buyer{i}', address='Manila', password_hash=password_hash)
+        db.session.commit()
+
+    clients = []
+    for i in range(BUYERS):
+        client = login(app.test_client(), f'buyer{i}')
+        client.post(f'/cart/add/{product_id}', data={'quantity': 1})
+        clients.append(client)
+
+    barrier = threading.Barrier(BUYERS)
+    placed, errors = [], []
+
+    def checkout(client):
+        barrier.wait()
+        try:
+            if hold_minutes:
+                client.post('/cart/hold')
+            response = client.post('/cart/checkout', data={'shipping_address': 'Manila',
+                                                           'payment_method': 'cod'})
+            placed.append(re.search(r'/orders/\d+$', response.location or '') is not None)
+        except Exception as exc:  # a crashed checkout must not pass as "refused"
+            errors.append(exc)
+
+    threads = [threading.Thread(target=checkout, args=(c,)) for c in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    with app.app_context():
+        assert placed.count(True) == STOCK
+        assert Order.query.count() == STOCK
+        assert db.session.query(db.func.sum(OrderItem.quantity))\
+                         .filter_by(product_id=product_id).scalar() == STOCK
+        assert db.session.get(Product, product_id).stock_quantity == 0
@@ -0,0 +1,58 @@
+import threading
+import pytest
+from app import db
+from app.models import Product
+from app.utils.write_queue import WritePending, write, write_queue
+from tests.conftest import add_user, add_product
+
+
+def _set_price(product_id, price, started, release):
+    started.set()
+    release.wait()
+    db.session.get(Product, product_id).price = price
+
+
+def test_timed_out_write_is_reported_pending_and_still_commits(app):
+    app.config['WRITE_QUEUE_ENABLED'] = True
+    app.config['WRITE_QUEUE_TIMEOUT'] = 0.2
+    write_queue.init_app(app)
+    before = write_queue.stats()['timeouts']
+
+    with app.app_context():
+        farmer = add_user('farmer', role='farmer')
+        db.session.commit()
+        add_product(farmer, 'Kamatis', price=50)
+        db.session.commit()
+        product_id = Product.query.one().id
+    started, release = threading.Event(), threading.Event()
+
+    with app.app_context():
+        with pytest.raises(WritePending) as pending:
+            write(_set_price, product_id, 80, started, release)
+    assert started.is_set()
+    release.set()
+    pending.value.future.result(timeout=10)
+
+    with app.app_context():
+        assert db.session.get(Product, product_id).price == 80
+    stats = app.test_client().get('/write-queue-stats').get_json()
+    assert stats['enabled'] and stats['timeouts'] == before + 1
+
+
+def test_writer_survives_a_batch_failing_outside_the_commit(app):
+    app.config['WRITE_QUEUE_ENABLED'] = True
+    app.config['WRITE_QUEUE_TIMEOUT'] = 10
+    write_queue.init_app(app)
+
+    class Broken:
+        def app_context(self):
+            raise RuntimeError('no context')
+
+    write_queue.app = Broken()
+    try:
+        with pytest.raises(RuntimeError):
+            write_queue.submit(lambda: None).result(timeout=10)
+    finally:
+        write_queue.app = app
+    with app.app_context():
+        assert write(lambda: 42) == 42